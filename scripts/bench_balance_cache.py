@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark de CONSULTAR_CUENTA en el NodoWorker con y sin la caché de
+saldos: consultas/seg y tasa de aciertos con un acceso sesgado (unas pocas
+cuentas concentran la mayoría de las consultas, como en los dashboards).
+
+Llama directamente a `_handle_query` del worker, sin pasar por RabbitMQ.
+Requiere PostgreSQL con bd1_banco cargada.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.nodo_trabajador import nodo_worker
+
+# --- Configuración de la Prueba ---
+CONSULTAS_POR_HILO = 5000
+NIVELES_HILOS = [1, 4]
+SESGO = 1.2  # Exponente tipo Zipf del reparto de consultas entre cuentas
+
+
+def generar_consultas(cuentas, total, seed=42):
+    rng = random.Random(seed)
+    pesos = [1 / (rank ** SESGO) for rank in range(1, len(cuentas) + 1)]
+    return rng.choices(cuentas, weights=pesos, k=total)
+
+
+def correr(worker, consultas_por_hilo):
+    """Ejecuta las consultas repartidas entre hilos y devuelve consultas/seg."""
+    def hilo(consultas):
+        for acc in consultas:
+            worker._handle_query({"account": acc})
+
+    threads = [threading.Thread(target=hilo, args=(c,)) for c in consultas_por_hilo]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return sum(len(c) for c in consultas_por_hilo) / elapsed
+
+
+def crear_worker(cache):
+    # async_mode evita abrir la conexión a RabbitMQ en el constructor
+    return nodo_worker.NodoWorker(
+        0, async_mode=True, threads=max(NIVELES_HILOS), balance_cache=cache
+    )
+
+
+if __name__ == "__main__":
+    sin_cache = crear_worker(False)
+    with sin_cache._get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id_cuenta FROM Cuentas ORDER BY id_cuenta")
+            cuentas = [row[0] for row in cursor.fetchall()]
+    if not cuentas:
+        print("No hay cuentas en bd1_banco.")
+        sys.exit(1)
+    con_cache = crear_worker(True)
+
+    print("--- Benchmark de CONSULTAR_CUENTA con caché de saldos ---")
+    print(
+        f"Cuentas: {len(cuentas)} | Consultas por hilo: {CONSULTAS_POR_HILO} | "
+        f"TTL: {nodo_worker.BALANCE_CACHE_TTL}s"
+    )
+    print("hilos,modo,consultas_seg,hit_ratio")
+    for num_hilos in NIVELES_HILOS:
+        consultas = [
+            generar_consultas(cuentas, CONSULTAS_POR_HILO, seed=i) for i in range(num_hilos)
+        ]
+        qps = correr(sin_cache, consultas)
+        print(f"{num_hilos},sin_cache,{qps:.0f},-")
+        qps = correr(con_cache, consultas)
+        print(f"{num_hilos},con_cache,{qps:.0f},{con_cache.balance_cache.stats()['hit_ratio']}")
+
+    stats = con_cache.balance_cache.stats()
+    print(
+        f"\nCaché: hits={stats['hits']} misses={stats['misses']} "
+        f"evictions={stats['evictions']} expirations={stats['expirations']}"
+    )
+    for worker in (sin_cache, con_cache):
+        worker.executor.shutdown()
+        worker.db_pool.close()
+        worker.log.close()
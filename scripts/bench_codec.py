@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de los codecs de mensajes (common/codec.py): tiempo de
+codificar y decodificar y tamaño en bytes de cargas típicas del sistema.
+
+Mide los codecs cuya librería esté instalada (json siempre; orjson y
+msgpack si están disponibles). No necesita RabbitMQ ni bases de datos.
+"""
+import os
+import random
+import sys
+import time
+import uuid
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.common import codec
+
+# --- Configuración de la Prueba ---
+ITERACIONES = 20000
+
+
+def cargas():
+    rng = random.Random(42)
+    historial = {
+        "status": "OK",
+        "data": {
+            "transacciones": [
+                {
+                    "id": 100000 + i,
+                    "tipo": rng.choice(["DEBITO", "CREDITO", "PRESTAMO"]),
+                    "monto": round(rng.uniform(-500, 500), 2),
+                    "fecha": f"2025-11-{1 + i % 28:02d} 10:{i % 60:02d}:00.0",
+                }
+                for i in range(20)
+            ]
+        },
+    }
+    persona = {
+        "status": "OK",
+        "data": {
+            "dni": "45678912",
+            "apellido_paterno": "Quispe",
+            "apellido_materno": "Huamán",
+            "nombres": "María Fernanda",
+            "fecha_nacimiento": "1990-05-14",
+            "sexo": "F",
+            "direccion": "Av. Túpac Amaru 1234, Lima",
+        },
+    }
+    prepare = {
+        "type": "PREPARE_TRANSFER",
+        "tx_id": str(uuid.uuid4()),
+        "from": 1002,
+        "to": 1001,
+        "amount": 150.0,
+    }
+    saldos = {
+        "status": "OK",
+        "balances": {1000 + i: round(rng.uniform(0, 10000), 2) for i in range(1000)},
+        "missing": [],
+    }
+    return [
+        ("historial_20", historial),
+        ("validar_dni", persona),
+        ("prepare_transfer", prepare),
+        ("saldos_batch_1000", saldos),
+    ]
+
+
+def medir(c, carga, iteraciones):
+    body = c.encode(carga)
+    start = time.perf_counter()
+    for _ in range(iteraciones):
+        c.encode(carga)
+    enc_us = (time.perf_counter() - start) / iteraciones * 1e6
+    start = time.perf_counter()
+    for _ in range(iteraciones):
+        c.decode(body)
+    dec_us = (time.perf_counter() - start) / iteraciones * 1e6
+    return enc_us, dec_us, len(body)
+
+
+if __name__ == "__main__":
+    codecs = [codec.STDLIB_JSON, codec.ORJSON, codec.MSGPACK]
+    disponibles = [c for c in codecs if c is not None]
+    faltan = [n for n, c in zip(("json", "orjson", "msgpack"), codecs) if c is None]
+
+    print("--- Microbenchmark de codecs de mensajes ---")
+    print(f"Iteraciones: {ITERACIONES} | No instalados: {', '.join(faltan) or 'ninguno'}")
+    print("carga,codec,encode_us,decode_us,bytes")
+    for nombre, carga in cargas():
+        iteraciones = ITERACIONES // 20 if nombre.startswith("saldos") else ITERACIONES
+        for c in disponibles:
+            enc_us, dec_us, size = medir(c, carga, iteraciones)
+            print(f"{nombre},{c.name},{enc_us:.2f},{dec_us:.2f},{size}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark del prefetch adaptativo (common/adaptive_prefetch.py) vaciando
+una cola con un backlog de mensajes (100k por defecto).
+
+El consumidor imita el modo --concurrent del NodoWorker: un pool de hilos
+y un handler que usa una de POOL_CONEXIONES "conexiones de BD" durante
+HANDLER_MS. Se compara prefetch fijo 1, fijo alto y adaptativo (AIMD):
+rendimiento en mensajes/seg y latencia del handler (incluida la espera
+por una conexión libre).
+
+Requiere RabbitMQ en localhost. Uso: bench_prefetch.py [num_mensajes]
+"""
+import functools
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.common.adaptive_prefetch import AdaptivePrefetch
+
+# --- Configuración de la Prueba ---
+COLA = "bench_prefetch"
+HILOS = 16
+POOL_CONEXIONES = 4
+HANDLER_MS = 1.0
+PREFETCH_ALTO = 256
+LATENCIA_OBJETIVO_MS = 3 * HANDLER_MS
+INTERVALO_AJUSTE = 0.5
+
+
+def publicar(channel, total):
+    channel.queue_declare(queue=COLA, durable=False)
+    channel.queue_purge(queue=COLA)
+    body = b'{"type":"CONSULTAR_CUENTA","account":1002}'
+    for _ in range(total):
+        channel.basic_publish(exchange="", routing_key=COLA, body=body)
+
+
+class Consumidor:
+    def __init__(self, connection, channel, total, prefetch, control=None):
+        self.connection = connection
+        self.channel = channel
+        self.total = total
+        self.prefetch = prefetch
+        self.control = control
+        self.executor = ThreadPoolExecutor(max_workers=HILOS)
+        self.pool = threading.BoundedSemaphore(POOL_CONEXIONES)
+        self.en_uso = 0
+        self.procesados = 0
+        self.latencias = []
+        self.max_prefetch = prefetch
+
+    def handler(self, delivery_tag):
+        start = time.perf_counter()
+        with self.pool:
+            self.en_uso += 1
+            time.sleep(HANDLER_MS / 1000)
+            self.en_uso -= 1
+        latencia_ms = (time.perf_counter() - start) * 1000
+        self.latencias.append(latencia_ms)
+        if self.control:
+            self.control.observe(latencia_ms)
+        self.connection.add_callback_threadsafe(functools.partial(self.ack, delivery_tag))
+
+    def ack(self, delivery_tag):
+        self.channel.basic_ack(delivery_tag=delivery_tag)
+        self.procesados += 1
+        if self.procesados == self.total:
+            self.channel.stop_consuming()
+
+    def on_message(self, ch, method, props, body):
+        self.executor.submit(self.handler, method.delivery_tag)
+
+    def ajustar(self):
+        if self.procesados >= self.total:
+            return
+        nuevo = self.control.update(self.en_uso / POOL_CONEXIONES)
+        if nuevo is not None:
+            self.prefetch = nuevo
+            self.max_prefetch = max(self.max_prefetch, nuevo)
+            self.channel.basic_qos(prefetch_count=nuevo)
+        self.connection.call_later(INTERVALO_AJUSTE, self.ajustar)
+
+    def correr(self):
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        tag = self.channel.basic_consume(queue=COLA, on_message_callback=self.on_message)
+        if self.control:
+            self.connection.call_later(INTERVALO_AJUSTE, self.ajustar)
+        start = time.perf_counter()
+        self.channel.start_consuming()
+        elapsed = time.perf_counter() - start
+        self.channel.basic_cancel(tag)
+        self.executor.shutdown()
+        return self.total / elapsed
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host="localhost"))
+    channel = connection.channel()
+
+    modos = [
+        ("fijo_1", 1, None),
+        (f"fijo_{PREFETCH_ALTO}", PREFETCH_ALTO, None),
+        (
+            "adaptativo",
+            1,
+            lambda: AdaptivePrefetch(
+                1, maximum=PREFETCH_ALTO, target_latency_ms=LATENCIA_OBJETIVO_MS
+            ),
+        ),
+    ]
+
+    print("--- Benchmark de prefetch adaptativo ---")
+    print(
+        f"Backlog: {total} mensajes | Hilos: {HILOS} | Conexiones: {POOL_CONEXIONES} | "
+        f"Handler: {HANDLER_MS} ms | Objetivo: {LATENCIA_OBJETIVO_MS} ms"
+    )
+    print("modo,mensajes_seg,p50_ms,p99_ms,prefetch_final,prefetch_max")
+    for nombre, prefetch, crear_control in modos:
+        publicar(channel, total)
+        consumidor = Consumidor(
+            connection, channel, total, prefetch, crear_control() if crear_control else None
+        )
+        rate = consumidor.correr()
+        latencias = sorted(consumidor.latencias)
+        print(
+            f"{nombre},{rate:.0f},{statistics.median(latencias):.2f},"
+            f"{latencias[int(len(latencias) * 0.99)]:.2f},{consumidor.prefetch},"
+            f"{consumidor.max_prefetch}"
+        )
+
+    channel.queue_delete(queue=COLA)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark del log de PREPARE del NodoWorker: prepares/seg con el log
+activado y desactivado, con 1 y varios hilos (el fsync agrupado sólo se
+nota cuando hay varios PREPARE en vuelo).
+
+No necesita RabbitMQ ni PostgreSQL: mide únicamente el coste del log.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.nodo_trabajador.prepare_log import PrepareLog
+
+# --- Configuración de la Prueba ---
+PREPARES_POR_HILO = 2000
+NIVELES_HILOS = [1, 4, 16]
+
+
+def correr(num_hilos, log):
+    """Ejecuta PREPARE+COMMIT simulados y devuelve prepares/seg."""
+    prepared_ops = {}
+
+    def hilo():
+        for i in range(PREPARES_POR_HILO):
+            tx_id = str(uuid.uuid4())
+            ops = [("debit", 1000 + i, 10.0), ("credit", 2000 + i, 10.0)]
+            if log:
+                log.log_prepare(tx_id, ops)
+            prepared_ops[tx_id] = ops
+            prepared_ops.pop(tx_id, None)
+            if log:
+                log.log_resolved([tx_id], committed=True)
+
+    threads = [threading.Thread(target=hilo) for _ in range(num_hilos)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return (num_hilos * PREPARES_POR_HILO) / elapsed
+
+
+if __name__ == "__main__":
+    print("--- Benchmark del log de PREPARE ---")
+    print(f"PREPARE+COMMIT por hilo: {PREPARES_POR_HILO}")
+    print("hilos,log,prepares_por_seg,fsyncs")
+
+    for num_hilos in NIVELES_HILOS:
+        sin_log = correr(num_hilos, None)
+        print(f"{num_hilos},off,{sin_log:.0f},0")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            log = PrepareLog(os.path.join(tmp, "bench.wal"))
+            log.replay()
+            con_log = correr(num_hilos, log)
+            fsyncs = log.stats()["fsyncs"]
+            log.close()
+        print(f"{num_hilos},on,{con_log:.0f},{fsyncs}")
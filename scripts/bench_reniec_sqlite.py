@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las consultas de DNI del ReniecWorker sobre SQLite.
+
+Genera una tabla Personas sintética (10M filas por defecto, se reutiliza
+entre ejecuciones) y compara:
+  - por_consulta: una conexión nueva por VALIDAR_DNI (comportamiento anterior)
+  - persistente: una conexión mode=ro con mmap/cache_size (nodo_reniec/sqlite_readers.py)
+  - lectores_N: N conexiones persistentes, cada una en su hilo (--readers N)
+
+El 90% de los DNIs consultados existen. Uso:
+    bench_reniec_sqlite.py [filas] [consultas]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.nodo_reniec.reniec_worker import SQL_PERSONA
+from src.python.nodo_reniec.sqlite_readers import ReaderPool
+
+# --- Configuración de la Prueba ---
+LECTORES = 4
+PORCENTAJE_EXISTENTES = 0.9
+LOTE_INSERCION = 50000
+DNI_BASE = 10000000
+SEMILLA = 42
+
+
+def crear_bd(path, filas):
+    """Crea (o reutiliza) una BD con `filas` personas de DNI consecutivo."""
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            if conn.execute("SELECT COUNT(*) FROM Personas").fetchone()[0] == filas:
+                return
+        os.remove(path)
+
+    print(f"Generando {filas} personas en {path}...", flush=True)
+    start = time.perf_counter()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(
+        """
+        CREATE TABLE Personas (
+            dni TEXT PRIMARY KEY,
+            apellido_paterno TEXT,
+            apellido_materno TEXT,
+            nombres TEXT,
+            fecha_nacimiento TEXT,
+            sexo TEXT,
+            direccion TEXT
+        )
+        """
+    )
+    for desde in range(0, filas, LOTE_INSERCION):
+        conn.executemany(
+            "INSERT INTO Personas VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    str(DNI_BASE + i),
+                    "APELLIDO%d" % (i % 997),
+                    "MATERNO%d" % (i % 991),
+                    "NOMBRE%d" % (i % 983),
+                    "19%02d-%02d-%02d" % (i % 100, i % 12 + 1, i % 28 + 1),
+                    "MF"[i % 2],
+                    "Calle %d" % i,
+                )
+                for i in range(desde, min(desde + LOTE_INSERCION, filas))
+            ),
+        )
+        conn.commit()
+    conn.close()
+    print(f"BD generada en {time.perf_counter() - start:.1f} s", flush=True)
+
+
+def dnis_consulta(filas, consultas):
+    rnd = random.Random(SEMILLA)
+    return [
+        str(DNI_BASE + rnd.randrange(filas))
+        if rnd.random() < PORCENTAJE_EXISTENTES
+        else str(DNI_BASE + filas + rnd.randrange(filas))
+        for _ in range(consultas)
+    ]
+
+
+def por_consulta(path, dni):
+    with sqlite3.connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(SQL_PERSONA, (dni,)).fetchone()
+        return dict(row) if row else None
+
+
+def con_pool(pool, dni):
+    with pool.connection() as conn:
+        row = conn.execute(SQL_PERSONA, (dni,)).fetchone()
+    return dict(row) if row else None
+
+
+def medir(nombre, consulta, dnis, hilos=1):
+    latencias = []
+
+    def una(dni):
+        t0 = time.perf_counter()
+        consulta(dni)
+        latencias.append((time.perf_counter() - t0) * 1000)
+
+    start = time.perf_counter()
+    if hilos == 1:
+        for dni in dnis:
+            una(dni)
+    else:
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            list(executor.map(una, dnis, chunksize=256))
+    elapsed = time.perf_counter() - start
+
+    latencias.sort()
+    print(
+        f"{nombre},{len(dnis) / elapsed:.0f},{statistics.median(latencias):.4f},"
+        f"{latencias[int(len(latencias) * 0.99)]:.4f}"
+    )
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    path = os.path.join(tempfile.gettempdir(), f"bench_reniec_{filas}.db")
+    crear_bd(path, filas)
+    dnis = dnis_consulta(filas, consultas)
+
+    print("--- Benchmark de consultas RENIEC (SQLite) ---")
+    print(f"Personas: {filas} | Consultas: {consultas} | Lectores: {LECTORES}")
+    print("modo,consultas_seg,p50_ms,p99_ms")
+    # La conexión por consulta es mucho más lenta: basta una fracción
+    medir("por_consulta", lambda dni: por_consulta(path, dni), dnis[: max(1, consultas // 10)])
+
+    pool = ReaderPool(path, 1)
+    medir("persistente", lambda dni: con_pool(pool, dni), dnis)
+    pool.close()
+
+    pool = ReaderPool(path, LECTORES)
+    medir(f"lectores_{LECTORES}", lambda dni: con_pool(pool, dni), dnis, hilos=LECTORES)
+    print(f"Espera total por conexión: {pool.stats()['total_wait_ms']} ms")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark del RpcClient multiplexado (common/rpc_client.py) y del
+AsyncRpcClient (common/async_rpc_client.py).
+
+Un "servidor" eco en un hilo aparte responde cada petición tras
+LATENCIA_SERVIDOR_MS (simula ServidorCentral + workers). Se comparan:
+  - serializado: un RpcClient, cada llamada bajo un lock (lo que hacía ClienteProxy)
+  - concurrente: un RpcClient compartido por HILOS hilos, llamadas en vuelo a la vez
+  - asyncio: un AsyncRpcClient y todas las llamadas con asyncio.gather en un solo loop
+
+Requiere RabbitMQ en localhost. Uso: bench_rpc_client.py [num_llamadas]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.common.async_rpc_client import AsyncRpcClient
+from src.python.common.rpc_client import RpcClient
+
+# --- Configuración de la Prueba ---
+COLA = "bench_rpc_client"
+HILOS = 32
+LATENCIA_SERVIDOR_MS = 5.0
+
+
+def servidor_eco(listo, parar):
+    """Responde cada petición con el mismo cuerpo, LATENCIA_SERVIDOR_MS después."""
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host="localhost"))
+    channel = connection.channel()
+    channel.queue_declare(queue=COLA, durable=False)
+    channel.queue_purge(queue=COLA)
+
+    def on_message(ch, method, props, body):
+        def responder():
+            ch.basic_publish(
+                exchange="",
+                routing_key=props.reply_to,
+                properties=pika.BasicProperties(
+                    correlation_id=props.correlation_id, content_type=props.content_type
+                ),
+                body=body,
+            )
+
+        # La espera no bloquea al servidor: atiende peticiones en paralelo
+        connection.call_later(LATENCIA_SERVIDOR_MS / 1000, responder)
+
+    channel.basic_consume(queue=COLA, on_message_callback=on_message, auto_ack=True)
+    listo.set()
+    while not parar.is_set():
+        connection.process_data_events(time_limit=0.2)
+    channel.queue_delete(queue=COLA)
+    connection.close()
+
+
+def medir(nombre, client, total, lock=None):
+    latencias = []
+
+    def una(i):
+        t0 = time.perf_counter()
+        if lock is None:
+            respuesta = client.call({"type": "ECO", "i": i}, routing_key=COLA)
+        else:
+            with lock:
+                respuesta = client.call({"type": "ECO", "i": i}, routing_key=COLA)
+        assert respuesta["i"] == i
+        latencias.append((time.perf_counter() - t0) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=HILOS) as executor:
+        list(executor.map(una, range(total)))
+    elapsed = time.perf_counter() - start
+    latencias.sort()
+    print(
+        f"{nombre},{total / elapsed:.0f},{statistics.median(latencias):.2f},"
+        f"{latencias[int(len(latencias) * 0.99)]:.2f}"
+    )
+
+
+async def medir_asyncio(nombre, total):
+    latencias = []
+
+    async def una(client, i):
+        t0 = time.perf_counter()
+        respuesta = await client.call({"type": "ECO", "i": i}, routing_key=COLA)
+        assert respuesta["i"] == i
+        latencias.append((time.perf_counter() - t0) * 1000)
+
+    async with AsyncRpcClient() as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(una(client, i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    latencias.sort()
+    print(
+        f"{nombre},{total / elapsed:.0f},{statistics.median(latencias):.2f},"
+        f"{latencias[int(len(latencias) * 0.99)]:.2f}"
+    )
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    listo, parar = threading.Event(), threading.Event()
+    servidor = threading.Thread(target=servidor_eco, args=(listo, parar), daemon=True)
+    servidor.start()
+    listo.wait()
+
+    client = RpcClient()
+    client.connect()
+    print("--- Benchmark de RpcClient multiplexado ---")
+    print(f"Llamadas: {total} | Hilos: {HILOS} | Latencia del servidor: {LATENCIA_SERVIDOR_MS} ms")
+    print("modo,llamadas_seg,p50_ms,p99_ms")
+    # El modo serializado no pasa de 1000/LATENCIA llamadas/s: basta una fracción
+    medir("serializado", client, max(1, total // 10), lock=threading.Lock())
+    medir("concurrente", client, total)
+    client.close()
+    asyncio.run(medir_asyncio("asyncio", total))
+    parar.set()
+    servidor.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la capa SQL del NodoWorker (sql_banco) frente al SQL
+ad-hoc anterior: viajes a la BD y latencia de un PREPARE + COMMIT de
+transferencia.
+
+Cada iteración se hace dentro de una transacción que termina en ROLLBACK,
+así que no modifica los saldos. Requiere PostgreSQL con bd1_banco cargada.
+"""
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.nodo_trabajador import sql_banco
+
+DB_CONFIG = {
+    "dbname": "bd1_banco",
+    "user": "postgres",
+    "password": "mysecretpassword",
+    "host": "localhost",
+    "port": "5432",
+}
+
+ITERACIONES = 2000
+MONTO = 1.0
+
+
+class CursorContador(psycopg2.extensions.cursor):
+    """Cursor que cuenta cada execute como un viaje a la BD."""
+
+    viajes = 0
+
+    def execute(self, query, vars=None):
+        CursorContador.viajes += 1
+        return super().execute(query, vars)
+
+
+def transferencia_adhoc(cursor, from_acc, to_acc):
+    """SQL anterior: 2 SELECT en PREPARE y UPDATE+INSERT por op en COMMIT."""
+    cursor.execute("SELECT saldo FROM Cuentas WHERE id_cuenta = %s", (from_acc,))
+    cursor.fetchone()
+    cursor.execute("SELECT 1 FROM Cuentas WHERE id_cuenta = %s", (to_acc,))
+    cursor.fetchone()
+    cursor.execute(
+        "UPDATE Cuentas SET saldo = saldo - %s WHERE id_cuenta = %s", (MONTO, from_acc)
+    )
+    cursor.execute(
+        "INSERT INTO Transacciones(id_cuenta, tipo, monto) VALUES (%s, %s, %s)",
+        (from_acc, "DEBITO", -MONTO),
+    )
+    cursor.execute(
+        "UPDATE Cuentas SET saldo = saldo + %s WHERE id_cuenta = %s", (MONTO, to_acc)
+    )
+    cursor.execute(
+        "INSERT INTO Transacciones(id_cuenta, tipo, monto) VALUES (%s, %s, %s)",
+        (to_acc, "CREDITO", MONTO),
+    )
+
+
+def transferencia_sql_banco(cursor, from_acc, to_acc):
+    """Capa nueva: EXECUTE de sentencias preparadas, un viaje por fase."""
+    sql_banco.execute(cursor, "nw_prepare_transfer", (from_acc, to_acc))
+    cursor.fetchone()
+    sql_banco.aplicar_ops(cursor, [[("debit", from_acc, MONTO), ("credit", to_acc, MONTO)]])
+
+
+def medir(nombre, conn, fn, from_acc, to_acc):
+    latencias = []
+    with conn.cursor(cursor_factory=CursorContador) as cursor:
+        # Calentamiento: prepara las sentencias fuera de la medición
+        fn(cursor, from_acc, to_acc)
+        conn.rollback()
+        CursorContador.viajes = 0
+
+        for _ in range(ITERACIONES):
+            start = time.perf_counter()
+            fn(cursor, from_acc, to_acc)
+            latencias.append((time.perf_counter() - start) * 1000)
+            conn.rollback()
+        viajes = CursorContador.viajes / ITERACIONES
+
+    latencias.sort()
+    print(
+        f"{nombre},{viajes:.1f},{statistics.mean(latencias):.3f},"
+        f"{latencias[len(latencias) // 2]:.3f},{latencias[int(len(latencias) * 0.99)]:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(**DB_CONFIG, connection_factory=sql_banco.PreparedConnection)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id_cuenta FROM Cuentas ORDER BY saldo DESC LIMIT 2")
+        cuentas = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    if len(cuentas) < 2:
+        print("Se necesitan al menos 2 cuentas en bd1_banco.")
+        sys.exit(1)
+
+    print("--- Microbenchmark SQL del NodoWorker (PREPARE + COMMIT) ---")
+    print(f"Iteraciones: {ITERACIONES} | Cuentas: {cuentas[0]} -> {cuentas[1]}")
+    print("modo,viajes_por_tx,media_ms,p50_ms,p99_ms")
+    medir("adhoc", conn, transferencia_adhoc, *cuentas)
+    medir("sql_banco", conn, transferencia_sql_banco, *cuentas)
+    conn.close()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Carga masiva de personas en RENIEC (db_reniec/reniec.db) en memoria constante.
+
+Las personas se leen en streaming de un CSV (con cabecera con los nombres
+de columna de Personas), de un JSONL (un objeto por línea) o de un
+generador con semilla, y nunca se guardan todas en una lista. Durante la
+carga:
+  - journal_mode=OFF y synchronous=OFF: sin journal ni fsync (si la carga
+    se interrumpe hay que repetirla);
+  - transacciones grandes de --lote filas;
+  - el índice de la clave primaria se construye al final: las filas van a
+    una tabla sin restricciones en una BD auxiliar (<db>.carga, se borra
+    al terminar) y pasan a Personas ordenadas por DNI, así el B-tree se
+    llena en orden en vez de con inserciones aleatorias y reniec.db no
+    queda con páginas libres.
+Al terminar la BD vuelve a modo WAL (el que usa el ReniecWorker).
+
+Uso:
+    cargar_reniec.py --generar 10000000 [--semilla 42] [--dni-inicio 10000000]
+    cargar_reniec.py --csv personas.csv [--reemplazar]
+    cargar_reniec.py --jsonl personas.jsonl
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.common import codec
+
+DB_PATH = "db_reniec/reniec.db"
+COLUMNAS = (
+    "dni",
+    "apellido_paterno",
+    "apellido_materno",
+    "nombres",
+    "fecha_nacimiento",
+    "sexo",
+    "direccion",
+)
+TABLA_CARGA = "carga.Personas_carga"
+
+# --- Configuración de la carga ---
+LOTE = 500000  # Filas por transacción
+CACHE_SIZE_KIB = 512 * 1024
+
+APELLIDOS = (
+    "GARCÍA", "FLORES", "RAMÍREZ", "QUISPE", "TORRES", "MENDOZA", "CHÁVEZ",
+    "ROJAS", "PÉREZ", "VÁSQUEZ", "HUAMÁN", "MAMANI", "SÁNCHEZ", "DÍAZ",
+)
+NOMBRES = (
+    "MARÍA ELENA", "JUAN CARLOS", "LUIS ALBERTO", "ANA SOFÍA", "CARLOS JUAN",
+    "ROSA", "JOSÉ", "LUCÍA", "MIGUEL ÁNGEL", "CARMEN", "JORGE", "PATRICIA",
+)
+CALLES = ("Universitaria", "San Martín", "Sacsayhuamán", "Huancayo", "Las Palmeras")
+
+
+def leer_csv(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        cabecera = [c.strip().lower() for c in next(reader)]
+        faltan = set(COLUMNAS) - set(cabecera)
+        if faltan:
+            raise ValueError(f"Faltan columnas en el CSV: {sorted(faltan)}")
+        indices = [cabecera.index(c) for c in COLUMNAS]
+        for fila in reader:
+            if fila:
+                yield tuple(fila[i] for i in indices)
+
+
+def leer_jsonl(path):
+    with open(path, "rb") as f:
+        for linea in f:
+            if linea.strip():
+                persona = codec.JSON.decode(linea)
+                yield tuple(persona.get(c) for c in COLUMNAS)
+
+
+def generar(total, semilla, dni_inicio):
+    rnd = random.Random(semilla)
+    na, nn, nc = len(APELLIDOS), len(NOMBRES), len(CALLES)
+    for i in range(total):
+        # Un solo número aleatorio por persona: el generador no debe ser el cuello de botella
+        r = rnd.getrandbits(64)
+        yield (
+            "%08d" % (dni_inicio + i),
+            APELLIDOS[r % na],
+            APELLIDOS[(r >> 8) % na],
+            NOMBRES[(r >> 16) % nn],
+            "%04d-%02d-%02d" % (1930 + (r >> 24) % 77, 1 + (r >> 32) % 12, 1 + (r >> 36) % 28),
+            "MF"[(r >> 41) & 1],
+            "%s %d" % (CALLES[(r >> 42) % nc], 1 + (r >> 48) % 9999),
+        )
+
+
+def cargar(conn, personas, lote, reemplazar):
+    placeholders = ", ".join("?" * len(COLUMNAS))
+    conn.execute(f"CREATE TABLE {TABLA_CARGA} ({', '.join(COLUMNAS)})")
+
+    filas = 0
+    start = time.perf_counter()
+    while True:
+        bloque = list(itertools.islice(personas, lote))
+        if not bloque:
+            break
+        conn.execute("BEGIN")
+        conn.executemany(f"INSERT INTO {TABLA_CARGA} VALUES ({placeholders})", bloque)
+        conn.commit()
+        filas += len(bloque)
+        elapsed = time.perf_counter() - start
+        print(f"  {filas} filas leídas ({filas / elapsed:,.0f} filas/s)", flush=True)
+    t_lectura = time.perf_counter() - start
+
+    print("Construyendo Personas ordenada por DNI...", flush=True)
+    t0 = time.perf_counter()
+    conn.execute("BEGIN")
+    if reemplazar:
+        conn.execute("DROP TABLE IF EXISTS main.Personas")
+    with open(os.path.join(ROOT_DIR, "db_reniec", "schema.sql"), encoding="utf-8") as f:
+        for sentencia in f.read().split(";"):
+            if sentencia.strip():
+                conn.execute(sentencia)
+    conn.execute(
+        f"INSERT OR REPLACE INTO main.Personas ({', '.join(COLUMNAS)}) "
+        f"SELECT {', '.join(COLUMNAS)} FROM {TABLA_CARGA} ORDER BY dni"
+    )
+    conn.commit()
+    return filas, t_lectura, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga masiva de personas en RENIEC.")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--csv", metavar="FICHERO", help="CSV con cabecera")
+    origen.add_argument("--jsonl", metavar="FICHERO", help="Un objeto JSON por línea")
+    origen.add_argument("--generar", type=int, metavar="N", help="Generar N personas sintéticas")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla del generador")
+    parser.add_argument(
+        "--dni-inicio", type=int, default=10000000, help="Primer DNI generado (por defecto 10000000)"
+    )
+    parser.add_argument("--db", default=DB_PATH, help=f"BD de destino (por defecto {DB_PATH})")
+    parser.add_argument(
+        "--lote", type=int, default=LOTE, help=f"Filas por transacción (por defecto {LOTE})"
+    )
+    parser.add_argument(
+        "--reemplazar",
+        action="store_true",
+        help="Vaciar Personas antes de cargar (por defecto se añaden/reemplazan por DNI)",
+    )
+    args = parser.parse_args()
+    if args.lote < 1:
+        parser.error("--lote debe ser al menos 1")
+
+    if args.csv:
+        personas = leer_csv(args.csv)
+    elif args.jsonl:
+        personas = leer_jsonl(args.jsonl)
+    else:
+        personas = generar(args.generar, args.semilla, args.dni_inicio)
+
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    # isolation_level=None: las transacciones se abren a mano con BEGIN
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    path_carga = args.db + ".carga"
+    if os.path.exists(path_carga):
+        os.remove(path_carga)  # Restos de una carga interrumpida
+    conn.execute("ATTACH DATABASE ? AS carga", (path_carga,))
+    try:
+        # Salir de WAL necesita que ningún otro proceso tenga la BD abierta; si
+        # hay un ReniecWorker leyendo se carga en WAL (más lento, pero seguro)
+        try:
+            modo = conn.execute("PRAGMA main.journal_mode = OFF").fetchone()[0]
+        except sqlite3.OperationalError:
+            modo = conn.execute("PRAGMA main.journal_mode").fetchone()[0]
+        if modo != "off":
+            print(f"⚠ La BD está en uso: se carga con journal_mode={modo}", flush=True)
+        conn.execute("PRAGMA carga.journal_mode = OFF")
+        conn.execute("PRAGMA main.synchronous = OFF")
+        conn.execute("PRAGMA carga.synchronous = OFF")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA temp_store = FILE")
+
+        print(f"Cargando personas en {args.db}...", flush=True)
+        start = time.perf_counter()
+        filas, t_lectura, t_indice = cargar(conn, personas, args.lote, args.reemplazar)
+        total = time.perf_counter() - start
+
+        conn.execute("DETACH DATABASE carga")
+        conn.execute("PRAGMA main.journal_mode = WAL")
+        conn.execute("PRAGMA main.synchronous = NORMAL")
+        personas_total = conn.execute("SELECT COUNT(*) FROM Personas").fetchone()[0]
+    finally:
+        conn.close()
+        if os.path.exists(path_carga):
+            os.remove(path_carga)
+
+    print(f"✓ {filas} filas cargadas en {total:.1f} s ({filas / total:,.0f} filas/s)")
+    print(f"  lectura: {t_lectura:.1f} s | orden e índice: {t_indice:.1f} s")
+    print(f"  Personas tiene ahora {personas_total} filas")
+
+
+if __name__ == "__main__":
+    main()
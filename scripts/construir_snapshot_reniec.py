@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Construye el snapshot binario de RENIEC (nodo_reniec/dni_snapshot.py) a
+partir de db_reniec/reniec.db, para arrancar el ReniecWorker con
+--dni-snapshot.
+
+El fichero se reemplaza de forma atómica: los workers en marcha siguen
+con el snapshot anterior hasta que detectan el nuevo. Volver a ejecutarlo
+después de repoblar la BD.
+
+Uso: construir_snapshot_reniec.py [--db RUTA] [--out RUTA]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Añadir el directorio raíz del proyecto al path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+
+from src.python.nodo_reniec.dni_snapshot import SNAPSHOT_PATH, build_snapshot
+from src.python.nodo_reniec.reniec_worker import DB_PATH
+from src.python.nodo_reniec.sqlite_readers import connect_readonly
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el snapshot binario de RENIEC.")
+    parser.add_argument("--db", default=DB_PATH, help=f"BD de origen (por defecto {DB_PATH})")
+    parser.add_argument(
+        "--out", default=SNAPSHOT_PATH, help=f"Snapshot a generar (por defecto {SNAPSHOT_PATH})"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = connect_readonly(args.db)
+    try:
+        persons, skipped = build_snapshot(conn, args.out)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+
+    size_mib = os.path.getsize(args.out) / (1024 * 1024)
+    print(f"✓ Snapshot {args.out}: {persons} personas, {size_mib:.1f} MiB en {elapsed:.1f} s")
+    if skipped:
+        print(f"⚠ {skipped} DNIs omitidos por no tener 8 dígitos (con --dni-snapshot no se encontrarán)")
+
+
+if __name__ == "__main__":
+    main()
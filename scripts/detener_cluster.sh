@@ -19,6 +19,8 @@ echo "  -> NodosWorker de Java detenidos."
 # Detener los workers de Python
 pkill -f "reniec_worker.py"
 echo "  -> ReniecWorker detenido."
+# Primero los supervisores, para que no relancen a sus hijos
+pkill -f "nodo_trabajador/supervisor.py"
 pkill -f "nodo_trabajador/nodo_worker.py"
 echo "  -> NodosWorker de Python detenidos."
 
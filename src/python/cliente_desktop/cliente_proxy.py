@@ -20,6 +20,7 @@ import qrcode
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
 sys.path.append(ROOT_DIR)
 
+from src.python.common import codec
 from src.python.common.rpc_client import RpcClient
 
 # Configuración
@@ -36,7 +37,8 @@ class ClienteProxy:
         self.server_socket = None
         self.running = False
         self.log_lock = threading.Lock()
-        self.rabbitmq_lock = threading.Lock()  # Lock para operaciones RabbitMQ
+        # Sólo serializa la reconexión: RpcClient admite llamadas concurrentes
+        self.rabbitmq_lock = threading.Lock()
 
     def log(self, mensaje, nivel="INFO"):
         """Log thread-safe con timestamp"""
@@ -59,6 +61,9 @@ class ClienteProxy:
     def reconectar_rabbitmq(self):
         """Reconecta a RabbitMQ si la conexión se perdió"""
         with self.rabbitmq_lock:
+            # Otro hilo pudo reconectar mientras se esperaba el lock
+            if self.verificar_conexion_rabbitmq():
+                return True
             try:
                 # Cerrar conexión anterior si existe
                 if self.rpc_client:
@@ -113,7 +118,7 @@ class ClienteProxy:
                     break
 
                 try:
-                    mensaje = json.loads(data.decode("utf-8"))
+                    mensaje = codec.JSON.decode(data)
                     tipo_operacion = mensaje.get("operacion", "DESCONOCIDO")
                     self.log(f"← Recibido de {cliente_id}: {tipo_operacion}")
 
@@ -160,12 +165,10 @@ class ClienteProxy:
                             and "amount" in mensaje
                         ):
                             mensaje["monto"] = mensaje.pop("amount")
-                        # Enviar a RabbitMQ con lock para thread-safety
-                        with self.rabbitmq_lock:
-                            respuesta = self.rpc_client.call(mensaje)
+                        # RpcClient es thread-safe: las GUIs no esperan unas por otras
+                        respuesta = self.rpc_client.call(mensaje)
 
-                    respuesta_json = json.dumps(respuesta) + "\n"
-                    client_socket.sendall(respuesta_json.encode("utf-8"))
+                    client_socket.sendall(codec.JSON.encode(respuesta) + b"\n")
 
                     estado = respuesta.get("status", "UNKNOWN")
                     self.log(
@@ -173,19 +176,15 @@ class ClienteProxy:
                         "SUCCESS" if estado == "OK" else "WARNING",
                     )
 
-                except json.JSONDecodeError as e:
+                except codec.CodecError as e:
                     self.log(f"Error decodificando JSON de {cliente_id}: {e}", "ERROR")
                     error_resp = {"status": "ERROR", "error": "JSON inválido"}
-                    client_socket.sendall(
-                        (json.dumps(error_resp) + "\n").encode("utf-8")
-                    )
+                    client_socket.sendall(codec.JSON.encode(error_resp) + b"\n")
 
                 except Exception as e:
                     self.log(f"Error procesando mensaje de {cliente_id}: {e}", "ERROR")
                     error_resp = {"status": "ERROR", "error": str(e)}
-                    client_socket.sendall(
-                        (json.dumps(error_resp) + "\n").encode("utf-8")
-                    )
+                    client_socket.sendall(codec.JSON.encode(error_resp) + b"\n")
 
         except Exception as e:
             self.log(f"Error en conexión con {cliente_id}: {e}", "ERROR")
@@ -0,0 +1,96 @@
+import threading
+
+
+class AdaptivePrefetch:
+    """Control AIMD del prefetch de un consumidor de RabbitMQ.
+
+    Los handlers informan su latencia con `observe()` y el hilo dueño del
+    canal llama a `update()` periódicamente (opcionalmente con la
+    saturación del pool de BD, 0-1):
+
+    - Si la latencia media (suavizada) supera `target_latency_ms` o el pool
+      está por encima de `high_saturation`, el prefetch se multiplica por
+      `decrease` (reducción multiplicativa): hay más mensajes en vuelo de
+      los que el worker puede atender y sólo añaden espera.
+    - Si hubo mensajes y la latencia está por debajo del objetivo, se suma
+      `increase` (aumento aditivo) para aprovechar la capacidad libre.
+    - Sin mensajes en el intervalo no hay nada que medir y no se cambia.
+
+    `update()` devuelve el nuevo prefetch, o None si no cambia, y quien lo
+    llama aplica `basic_qos` desde el hilo del canal.
+    """
+
+    def __init__(
+        self,
+        initial,
+        minimum=1,
+        maximum=256,
+        target_latency_ms=50.0,
+        high_saturation=0.9,
+        increase=4,
+        decrease=0.5,
+        smoothing=0.3,
+    ):
+        if not 1 <= minimum <= maximum:
+            raise ValueError("Límites de prefetch inválidos")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency_ms = target_latency_ms
+        self.high_saturation = high_saturation
+        self.increase = increase
+        self.decrease = decrease
+        self.smoothing = smoothing
+        self.prefetch = min(max(initial, minimum), maximum)
+
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total_ms = 0.0
+        self._latency_ms = None  # Media móvil exponencial de la latencia
+        self._increases = 0
+        self._decreases = 0
+
+    def observe(self, latency_ms):
+        with self._lock:
+            self._count += 1
+            self._total_ms += latency_ms
+
+    def update(self, saturation=None):
+        with self._lock:
+            count, total_ms = self._count, self._total_ms
+            self._count, self._total_ms = 0, 0.0
+            if count:
+                mean = total_ms / count
+                self._latency_ms = (
+                    mean
+                    if self._latency_ms is None
+                    else self.smoothing * mean + (1 - self.smoothing) * self._latency_ms
+                )
+
+            overloaded = (
+                saturation is not None and saturation >= self.high_saturation
+            ) or (count and self._latency_ms > self.target_latency_ms)
+            if overloaded:
+                new = max(self.minimum, int(self.prefetch * self.decrease))
+                self._decreases += new != self.prefetch
+            elif count:
+                new = min(self.maximum, self.prefetch + self.increase)
+                self._increases += new != self.prefetch
+            else:
+                return None
+
+            if new == self.prefetch:
+                return None
+            self.prefetch = new
+            return new
+
+    def stats(self):
+        with self._lock:
+            return {
+                "prefetch": self.prefetch,
+                "minimum": self.minimum,
+                "maximum": self.maximum,
+                "target_latency_ms": self.target_latency_ms,
+                "latency_ms": round(self._latency_ms, 3) if self._latency_ms is not None else None,
+                "increases": self._increases,
+                "decreases": self._decreases,
+            }
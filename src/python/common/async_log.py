@@ -0,0 +1,123 @@
+import atexit
+import queue
+import random
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+_LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+_STOP = object()
+
+
+class AsyncLogger:
+    """Logger con escritor en segundo plano para el camino caliente de los workers.
+
+    - `log()` sólo encola la tupla (tiempo, nivel, mensaje, campos): el
+      formateo y la escritura a stdout los hace un hilo aparte. Si la cola
+      está llena el registro se descarta (y se cuenta) en vez de bloquear.
+    - Los campos estructurados (tx_id, worker_id, latency_ms, ...) se pasan
+      como kwargs y se escriben como `clave=valor`. Si un valor ya está
+      serializado (p. ej. el cuerpo JSON de una respuesta) se escribe tal
+      cual, sin volver a serializarlo.
+    - Las llamadas con `sampled=True` se registran sólo con probabilidad
+      `sample_rate`; los WARNING y ERROR no se muestrean nunca.
+    """
+
+    def __init__(self, name, level=INFO, sample_rate=1.0, max_queue=10000, stream=None):
+        self.name = name
+        self.level = level
+        self.sample_rate = sample_rate
+        self.stream = stream or sys.stdout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dropped = 0
+        self._sampled_out = 0
+        self._written = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"log-{name}", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, msg, sampled=False, **fields):
+        if level < self.level:
+            return
+        if sampled and level < WARNING and self.sample_rate < 1.0:
+            if random.random() >= self.sample_rate:
+                self._sampled_out += 1
+                return
+        try:
+            self._queue.put_nowait((time.time(), level, msg, fields))
+        except queue.Full:
+            self._dropped += 1
+
+    def debug(self, msg, **fields):
+        self.log(DEBUG, msg, **fields)
+
+    def info(self, msg, **fields):
+        self.log(INFO, msg, **fields)
+
+    def warning(self, msg, **fields):
+        self.log(WARNING, msg, **fields)
+
+    def error(self, msg, **fields):
+        self.log(ERROR, msg, **fields)
+
+    def _format(self, ts, level, msg, fields):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        line = f"[{timestamp}] [{self.name}] [{_LEVEL_NAMES.get(level, level)}] {msg}"
+        for key, value in fields.items():
+            if value is None:
+                continue
+            if isinstance(value, (bytes, bytearray)):
+                value = value.decode("utf-8", errors="replace")
+            elif isinstance(value, float):
+                value = f"{value:.3f}"
+            line += f" {key}={value}"
+        return line + "\n"
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                self.stream.flush()
+                return
+            try:
+                self.stream.write(self._format(*record))
+                self._written += 1
+                # Vaciar el buffer sólo cuando no queda nada pendiente
+                if self._queue.empty():
+                    self.stream.flush()
+            except Exception:
+                pass
+
+    def close(self, timeout=2.0):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "level": _LEVEL_NAMES.get(self.level, self.level),
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            "written": self._written,
+            "dropped": self._dropped,
+            "sampled_out": self._sampled_out,
+        }
@@ -0,0 +1,175 @@
+import asyncio
+import uuid
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from src.python.common import codec
+from src.python.common.rpc_client import decode_response
+
+
+class AsyncRpcClient:
+    """Cliente RPC para RabbitMQ sobre el adaptador asyncio de pika.
+
+    Versión asyncio de RpcClient: una sola conexión y una cola de
+    respuestas exclusiva por cliente, reutilizadas por todas las llamadas.
+    Cada `await call(...)` publica su petición y espera un future del loop
+    indexado por correlation_id, así que miles de llamadas concurrentes
+    (`asyncio.gather`) comparten la conexión sin hilos. La conexión se abre
+    en la primera llamada (o con `connect()`) y, si se pierde, las llamadas
+    pendientes fallan con ConnectionError y la siguiente reconecta.
+
+        async with AsyncRpcClient() as client:
+            saldos = await asyncio.gather(
+                *(client.call({"type": "CONSULTAR_CUENTA", "account": acc}) for acc in cuentas)
+            )
+
+    Todos los métodos deben usarse desde el mismo event loop.
+    """
+
+    def __init__(self, codec_name="orjson", host="localhost"):
+        self.codec = codec.get_codec(codec_name)
+        self.host = host
+        self.loop = None
+        self.connection = None
+        self.channel = None
+        self.callback_queue = None
+        self._pending = {}  # correlation_id -> asyncio.Future
+        self._connect_lock = None
+        self._closed = None  # Future que se completa al cerrarse la conexión
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def is_open(self):
+        return (
+            self.connection is not None
+            and self.connection.is_open
+            and self.channel is not None
+            and self.channel.is_open
+        )
+
+    async def connect(self):
+        """Abre la conexión, el canal y la cola de respuestas si no están abiertos."""
+        if self.is_open:
+            return
+        if self._connect_lock is None:
+            self.loop = asyncio.get_running_loop()
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            # Otra corrutina pudo conectar mientras se esperaba el lock
+            if self.is_open:
+                return
+            await self._open()
+
+    async def _open(self):
+        loop = self.loop
+        opened = loop.create_future()
+        self._closed = loop.create_future()
+
+        def on_open_error(_connection, error):
+            if not opened.done():
+                opened.set_exception(
+                    ConnectionError(f"No se pudo conectar a RabbitMQ: {error!r}")
+                )
+
+        print("[AsyncRpcClient] Conectando a RabbitMQ...", flush=True)
+        self.connection = AsyncioConnection(
+            pika.ConnectionParameters(host=self.host, connection_attempts=3, retry_delay=2),
+            on_open_callback=opened.set_result,
+            on_open_error_callback=on_open_error,
+            on_close_callback=self._on_connection_closed,
+            custom_ioloop=loop,
+        )
+        await opened
+
+        channel_open = loop.create_future()
+        self.connection.channel(on_open_callback=channel_open.set_result)
+        channel = await channel_open
+        channel.add_on_close_callback(self._on_channel_closed)
+
+        declared = loop.create_future()
+        channel.queue_declare(queue="", exclusive=True, callback=declared.set_result)
+        self.callback_queue = (await declared).method.queue
+
+        consuming = loop.create_future()
+        channel.basic_consume(
+            queue=self.callback_queue,
+            on_message_callback=self._on_response,
+            auto_ack=True,
+            callback=consuming.set_result,
+        )
+        await consuming
+        self.channel = channel
+        print(
+            f"[AsyncRpcClient] ✓ Conectado. Cola de respuesta: {self.callback_queue}",
+            flush=True,
+        )
+
+    def _on_response(self, _channel, _method, props, body):
+        future = self._pending.pop(props.correlation_id, None)
+        # Sin llamada pendiente: expiró o la respuesta llegó duplicada
+        if future is not None and not future.done():
+            future.set_result(decode_response(body, props.content_type))
+
+    def _fail_pending(self, error):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _on_channel_closed(self, _channel, reason):
+        self._fail_pending(ConnectionError(f"Canal de RabbitMQ cerrado: {reason!r}"))
+        # Sin canal la conexión no sirve: cerrarla para reconectar en la próxima llamada
+        if self.connection is not None and not (
+            self.connection.is_closing or self.connection.is_closed
+        ):
+            self.connection.close()
+
+    def _on_connection_closed(self, _connection, reason):
+        self._fail_pending(ConnectionError(f"Conexión con RabbitMQ cerrada: {reason!r}"))
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(reason)
+
+    async def call(self, message, routing_key="client_requests_queue", timeout=30):
+        """Envía un mensaje RPC y espera la respuesta (TimeoutError si no llega)."""
+        await self.connect()
+        corr_id = str(uuid.uuid4())
+        future = self.loop.create_future()
+        self._pending[corr_id] = future
+        try:
+            self.channel.basic_publish(
+                exchange="",
+                routing_key=routing_key,
+                properties=pika.BasicProperties(
+                    reply_to=self.callback_queue,
+                    correlation_id=corr_id,
+                    content_type=self.codec.content_type,
+                ),
+                body=self.codec.encode(message),
+            )
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"La solicitud RPC ha expirado después de {timeout} segundos."
+            ) from None
+        finally:
+            self._pending.pop(corr_id, None)
+
+    def pending_calls(self):
+        return len(self._pending)
+
+    async def close(self):
+        """Cierra la conexión; las llamadas pendientes fallan con ConnectionError."""
+        if self.connection is None or self.connection.is_closed:
+            return
+        print("[AsyncRpcClient] Cerrando conexión...", flush=True)
+        if not self.connection.is_closing:
+            self.connection.close()
+        await self._closed
+        print("[AsyncRpcClient] ✓ Conexión cerrada", flush=True)
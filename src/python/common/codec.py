@@ -0,0 +1,117 @@
+"""Codificación de los mensajes AMQP según la propiedad `content_type`.
+
+- application/json: orjson si está instalado, si no el json de la stdlib.
+  Es lo que hablan el ServidorCentral Java y cualquier mensaje sin
+  `content_type`, así que es siempre el formato por defecto.
+- application/msgpack: msgpack, sólo entre procesos Python.
+
+orjson y msgpack son opcionales: si faltan se usa JSON. Los workers
+responden en el mismo formato en que llegó la petición, de modo que un
+par que sólo habla JSON nunca recibe otra cosa.
+"""
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+
+class CodecError(ValueError):
+    """El cuerpo no se pudo decodificar con el formato indicado."""
+
+
+def _default(obj):
+    # Decimal (saldos de PostgreSQL) viaja como número; el resto como texto
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+
+class Codec:
+    """Par encode/decode de un formato; `encode` devuelve siempre bytes."""
+
+    __slots__ = ("name", "content_type", "_dumps", "_loads")
+
+    def __init__(self, name, content_type, dumps, loads):
+        self.name = name
+        self.content_type = content_type
+        self._dumps = dumps
+        self._loads = loads
+
+    def encode(self, obj):
+        return self._dumps(obj)
+
+    def decode(self, body):
+        try:
+            return self._loads(body)
+        except Exception as e:
+            raise CodecError(f"Cuerpo {self.name} inválido: {e}") from e
+
+    def __repr__(self):
+        return f"Codec({self.name!r}, {self.content_type!r})"
+
+
+STDLIB_JSON = Codec(
+    "json",
+    JSON_CONTENT_TYPE,
+    lambda obj: json.dumps(obj, default=_default).encode("utf-8"),
+    json.loads,
+)
+
+ORJSON = None
+if orjson is not None:
+    ORJSON = Codec(
+        "orjson",
+        JSON_CONTENT_TYPE,
+        # Claves no textuales (p. ej. id_cuenta) como en json.dumps
+        lambda obj: orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads,
+    )
+
+MSGPACK = None
+if msgpack is not None:
+    MSGPACK = Codec(
+        "msgpack",
+        MSGPACK_CONTENT_TYPE,
+        lambda obj: msgpack.packb(obj, default=_default, use_bin_type=True),
+        lambda body: msgpack.unpackb(body, raw=False, strict_map_key=False),
+    )
+
+# JSON más rápido disponible: el que se usa para leer y escribir JSON
+JSON = ORJSON or STDLIB_JSON
+
+CODECS = {"json": STDLIB_JSON, "orjson": JSON, "msgpack": MSGPACK or JSON}
+
+
+def get_codec(name):
+    """Codec por nombre; si su librería no está instalada, JSON."""
+    if name not in CODECS:
+        raise ValueError(f"Codec desconocido: {name} (opciones: {', '.join(CODECS)})")
+    return CODECS[name]
+
+
+def for_content_type(content_type):
+    """Codec con el que leer (y responder) un mensaje con ese `content_type`.
+
+    Sin `content_type` o con uno desconocido se asume JSON, que es lo que
+    envían el ServidorCentral y los clientes antiguos.
+    """
+    if content_type in (MSGPACK_CONTENT_TYPE, "application/x-msgpack"):
+        if MSGPACK is None:
+            raise CodecError("Mensaje msgpack recibido pero msgpack no está instalado")
+        return MSGPACK
+    return JSON
+
+
+def decode(body, content_type=None):
+    return for_content_type(content_type).decode(body)
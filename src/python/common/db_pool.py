@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+
+
+class PoolAgotadoError(Exception):
+    """Se lanza cuando no se obtiene una conexión antes del timeout."""
+
+
+class _ConexionPool:
+    """Conexión física junto con su contador de usos."""
+
+    __slots__ = ("conn", "usos", "ultimo_uso")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.usos = 0
+        self.ultimo_uso = time.monotonic()
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones PostgreSQL compartido por los handlers.
+
+    - Mantiene entre `min_size` y `max_size` conexiones abiertas.
+    - Verifica la salud de la conexión al entregarla (SELECT 1 si estuvo
+      inactiva más de `health_check_interval` segundos).
+    - Recicla la conexión tras `max_uses` usos o cuando el handler falla.
+    - Lleva estadísticas de espera en el checkout y de saturación.
+    """
+
+    def __init__(
+        self,
+        db_config,
+        min_size=1,
+        max_size=10,
+        max_uses=1000,
+        checkout_timeout=5.0,
+        health_check_interval=30.0,
+        connection_factory=None,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.connection_factory = connection_factory
+
+        self._idle = deque()
+        self._size = 0  # Conexiones vivas (libres + prestadas)
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "discarded_on_error": 0,
+            "failed_health_checks": 0,
+            "saturated_checkouts": 0,
+            "timeouts": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+        self._prefill()
+
+    def _prefill(self):
+        """Abre las conexiones mínimas. Si la BD no responde se abrirán bajo demanda."""
+        for _ in range(self.min_size):
+            try:
+                entry = self._create()
+            except psycopg2.Error as e:
+                print(f"[ConnectionPool] ✗ No se pudo precargar conexión: {e}", flush=True)
+                return
+            with self._cond:
+                self._size += 1
+                self._idle.append(entry)
+
+    def _create(self):
+        if self.connection_factory is not None:
+            conn = psycopg2.connect(
+                **self.db_config, connection_factory=self.connection_factory
+            )
+        else:
+            conn = psycopg2.connect(**self.db_config)
+        self._incr("created")
+        return _ConexionPool(conn)
+
+    def _incr(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    def _is_healthy(self, entry):
+        if entry.conn.closed:
+            return False
+        if time.monotonic() - entry.ultimo_uso < self.health_check_interval:
+            return True
+        try:
+            with entry.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            entry.conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _checkout(self):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        with self._cond:
+            if self._closed:
+                raise PoolAgotadoError("El pool está cerrado")
+            if not self._idle and self._size >= self.max_size:
+                self._stats["saturated_checkouts"] += 1
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolAgotadoError(
+                        f"Sin conexiones libres tras {self.checkout_timeout}s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._size += 1  # Reservar el hueco antes de conectar fuera del lock
+
+        if entry is None:
+            try:
+                entry = self._create()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        elif not self._is_healthy(entry):
+            self._incr("failed_health_checks")
+            self._discard(entry)
+            return self._checkout()
+
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            if wait_ms > self._stats["max_wait_ms"]:
+                self._stats["max_wait_ms"] = wait_ms
+        return entry
+
+    def _checkin(self, entry, failed):
+        entry.usos += 1
+        entry.ultimo_uso = time.monotonic()
+
+        if failed or entry.conn.closed:
+            self._incr("discarded_on_error")
+            self._discard(entry)
+            return
+        if self.max_uses and entry.usos >= self.max_uses:
+            self._incr("recycled")
+            self._discard(entry)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                entry.conn.close()
+                return
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión con la misma semántica que `with psycopg2.connect()`:
+        commit si el bloque termina bien, rollback si lanza excepción."""
+        entry = self._checkout()
+        failed = False
+        try:
+            yield entry.conn
+            entry.conn.commit()
+        except Exception as e:
+            # Un error de BD puede dejar la sesión en mal estado: se recicla.
+            failed = isinstance(e, psycopg2.Error)
+            try:
+                entry.conn.rollback()
+            except psycopg2.Error:
+                failed = True
+            raise
+        finally:
+            self._checkin(entry, failed)
+
+    def stats(self):
+        """Devuelve una instantánea de las métricas del pool."""
+        with self._cond:
+            stats = dict(self._stats)
+            in_use = self._size - len(self._idle)
+            stats.update(
+                {
+                    "size": self._size,
+                    "idle": len(self._idle),
+                    "in_use": in_use,
+                    "min_size": self.min_size,
+                    "max_size": self.max_size,
+                    "saturation": round(in_use / self.max_size, 3),
+                    "avg_wait_ms": round(
+                        stats["total_wait_ms"] / stats["checkouts"], 3
+                    )
+                    if stats["checkouts"]
+                    else 0.0,
+                }
+            )
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        return stats
+
+    def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                entry = self._idle.pop()
+                self._size -= 1
+                try:
+                    entry.conn.close()
+                except psycopg2.Error:
+                    pass
+            self._cond.notify_all()
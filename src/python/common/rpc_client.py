@@ -1,22 +1,74 @@
-import json
+import functools
+import threading
 import time
 import uuid
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 import pika
 
+from src.python.common import codec
+
+# Cuentas por mensaje en consultar_cuentas (el worker acepta hasta 5000)
+BATCH_CHUNK_SIZE = 1000
+
+# DNIs por mensaje en validar_dnis (el ReniecWorker acepta hasta 5000)
+DNI_BATCH_CHUNK_SIZE = 1000
+
+# Cada cuánto el hilo de E/S sale de process_data_events para ver si debe parar
+IO_POLL_SECONDS = 1.0
+
+
+def _resolve(future, result=None, error=None):
+    """Completa un Future salvo que ya esté cancelado (p. ej. por timeout)."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def decode_response(body, content_type):
+    """Decodifica una respuesta RPC; si no se puede, devuelve un ERROR con el cuerpo."""
+    try:
+        return codec.decode(body, content_type)
+    except codec.CodecError as e:
+        print(f"[RpcClient] ✗ Error al parsear respuesta: {e}", flush=True)
+        return {
+            "status": "ERROR",
+            "error": f"Respuesta inválida del servidor: {body.decode(errors='replace')}",
+        }
+
 
 class RpcClient:
-    """Cliente RPC genérico para RabbitMQ."""
+    """Cliente RPC genérico para RabbitMQ.
+
+    `codec_name` elige el formato de las peticiones ("json", "orjson" o
+    "msgpack"; ver common/codec.py). El ServidorCentral sólo habla JSON,
+    así que msgpack sólo sirve para llamar directamente a workers Python.
+
+    Es seguro usarlo desde varios hilos a la vez y admite muchas llamadas
+    en vuelo: un hilo de E/S es el único que toca la conexión de pika
+    (publica y consume la cola de respuestas) y cada llamada pendiente es
+    un Future en `_pending`, indexado por correlation_id. `call_async()`
+    devuelve el Future y `call()` espera su resultado con timeout. No se
+    debe llamar a `call()` desde el propio hilo de E/S (callbacks de pika).
+    """
 
-    def __init__(self):
+    def __init__(self, codec_name="orjson"):
         self.connection = None
         self.channel = None
         self.callback_queue = None
-        self.response = None
-        self.corr_id = None
+        self.codec = codec.get_codec(codec_name)
+        self._pending = {}  # correlation_id -> Future
+        self._pending_lock = threading.Lock()
+        self._io_thread = None
+        self._stopping = False
 
     def connect(self):
-        """Establece la conexión y el canal. Lanza excepción si falla."""
+        """Establece la conexión y el canal y arranca el hilo de E/S. Lanza excepción si falla."""
         if self.connection and self.connection.is_open:
             return
 
@@ -39,74 +91,204 @@ class RpcClient:
             auto_ack=True,
         )
 
+        # A partir de aquí sólo el hilo de E/S usa la conexión
+        self._stopping = False
+        self._io_thread = threading.Thread(
+            target=self._io_loop, name="rpc-client-io", daemon=True
+        )
+        self._io_thread.start()
+
         print(
             f"[RpcClient] ✓ Conectado. Cola de respuesta: {self.callback_queue}",
             flush=True,
         )
 
+    def _io_loop(self):
+        """Atiende la conexión: respuestas, publicaciones encoladas y heartbeats."""
+        error = None
+        try:
+            while not self._stopping:
+                self.connection.process_data_events(time_limit=IO_POLL_SECONDS)
+        except Exception as e:
+            error = e
+            print(f"[RpcClient] ✗ Conexión perdida: {e!r}", flush=True)
+        finally:
+            if self.connection.is_open:
+                try:
+                    self.connection.close()
+                except Exception:
+                    pass
+            self._fail_pending(
+                ConnectionError(f"Conexión con RabbitMQ cerrada: {error!r}")
+                if error
+                else ConnectionError("Conexión con RabbitMQ cerrada.")
+            )
+
+    def _fail_pending(self, error):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            _resolve(future, error=error)
+
     def on_response(self, ch, method, props, body):
-        """Callback que se ejecuta cuando se recibe una respuesta."""
-        if self.corr_id == props.correlation_id:
-            self.response = body
-            print(
-                f"[RpcClient] ✓ Respuesta recibida (correlation_id: {props.correlation_id})",
-                flush=True,
+        """Callback (hilo de E/S) que resuelve la llamada de cada respuesta."""
+        with self._pending_lock:
+            future = self._pending.pop(props.correlation_id, None)
+        # Sin llamada pendiente: expiró o la respuesta llegó duplicada
+        if future is not None:
+            _resolve(future, result=decode_response(body, props.content_type))
+
+    def _publish(self, corr_id, routing_key, body):
+        """Publica desde el hilo de E/S (vía add_callback_threadsafe)."""
+        try:
+            self.channel.basic_publish(
+                exchange="",
+                routing_key=routing_key,
+                properties=pika.BasicProperties(
+                    reply_to=self.callback_queue,
+                    correlation_id=corr_id,
+                    content_type=self.codec.content_type,
+                ),
+                body=body,
+            )
+        except Exception as e:
+            self._forget(corr_id, e)
+
+    def _forget(self, corr_id, error=None):
+        with self._pending_lock:
+            future = self._pending.pop(corr_id, None)
+        if future is not None and error is not None:
+            _resolve(future, error=error)
+
+    def call_async(self, message, routing_key="client_requests_queue"):
+        """Envía un mensaje RPC y devuelve un Future con la respuesta ya decodificada.
+
+        El Future no expira solo: quien espere con `result(timeout)` y se
+        rinda debe llamar a `cancel_call(future)` para liberar la entrada.
+        """
+        if (
+            not self.connection
+            or not self.connection.is_open
+            or self._io_thread is None
+            or not self._io_thread.is_alive()
+        ):
+            raise ConnectionError("No hay conexión con el servidor RabbitMQ.")
+
+        corr_id = str(uuid.uuid4())
+        future = Future()
+        future.correlation_id = corr_id
+        body = self.codec.encode(message)
+        with self._pending_lock:
+            self._pending[corr_id] = future
+        try:
+            self.connection.add_callback_threadsafe(
+                functools.partial(self._publish, corr_id, routing_key, body)
             )
+        except Exception as e:
+            self._forget(corr_id)
+            raise ConnectionError(f"No se pudo enviar la solicitud: {e}") from e
+        return future
+
+    def cancel_call(self, future):
+        """Olvida una llamada pendiente; una respuesta tardía se descarta."""
+        self._forget(future.correlation_id)
+        future.cancel()
 
     def call(self, message, routing_key="client_requests_queue", timeout=30):
         """Envía un mensaje RPC y espera la respuesta."""
-        if not self.connection or not self.connection.is_open:
-            raise ConnectionError("No hay conexión con el servidor RabbitMQ.")
+        future = self.call_async(message, routing_key=routing_key)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.cancel_call(future)
+            raise TimeoutError(
+                f"La solicitud RPC ha expirado después de {timeout} segundos."
+            ) from None
 
-        # Reset estado
-        self.response = None
-        self.corr_id = str(uuid.uuid4())
-
-        print(f"[RpcClient] Enviando: {message.get('type', 'UNKNOWN')}", flush=True)
-        print(f"[RpcClient] correlation_id: {self.corr_id}", flush=True)
-
-        # Publicar mensaje
-        self.channel.basic_publish(
-            exchange="",
-            routing_key=routing_key,
-            properties=pika.BasicProperties(
-                reply_to=self.callback_queue,
-                correlation_id=self.corr_id,
-                content_type="application/json",
-            ),
-            body=json.dumps(message),
-        )
+    def _call_chunks(self, messages, routing_key, timeout):
+        """Envía todos los mensajes a la vez y devuelve las respuestas en orden."""
+        futures = [self.call_async(msg, routing_key=routing_key) for msg in messages]
+        deadline = time.monotonic() + timeout
+        try:
+            return [
+                future.result(timeout=max(0.0, deadline - time.monotonic()))
+                for future in futures
+            ]
+        except FutureTimeoutError:
+            raise TimeoutError(
+                f"La solicitud RPC ha expirado después de {timeout} segundos."
+            ) from None
+        finally:
+            for future in futures:
+                if not future.done():
+                    self.cancel_call(future)
 
-        print(f"[RpcClient] Esperando respuesta (timeout: {timeout}s)...", flush=True)
+    def consultar_cuentas(self, accounts, routing_key, chunk_size=BATCH_CHUNK_SIZE, timeout=30):
+        """Saldos de muchas cuentas con CONSULTAR_CUENTAS_BATCH, en trozos de `chunk_size`.
 
-        # ✅ CORRECCIÓN: Procesar eventos de RabbitMQ mientras espera
-        start_time = time.time()
-        while self.response is None:
-            # Procesar eventos durante 1 segundo
-            self.connection.process_data_events(time_limit=1)
+        `routing_key` es la cola del worker de la partición (p. ej.
+        "worker_queue_2"). Los trozos se envían todos a la vez. Devuelve
+        `balances` (cuenta -> saldo) y `missing` de todos los trozos, o el
+        primer error recibido.
+        """
+        accounts = list(dict.fromkeys(int(acc) for acc in accounts))
+        responses = self._call_chunks(
+            [
+                {"type": "CONSULTAR_CUENTAS_BATCH", "accounts": accounts[i : i + chunk_size]}
+                for i in range(0, len(accounts), chunk_size)
+            ],
+            routing_key,
+            timeout,
+        )
+        balances, missing = {}, []
+        for response in responses:
+            if response.get("status") != "OK":
+                return response
+            balances.update(
+                (int(acc), saldo) for acc, saldo in response.get("balances", {}).items()
+            )
+            missing.extend(response.get("missing", []))
+        return {"status": "OK", "balances": balances, "missing": missing}
 
-            # Verificar timeout
-            elapsed = time.time() - start_time
-            if elapsed >= timeout:
-                raise TimeoutError(
-                    f"La solicitud RPC ha expirado después de {timeout} segundos."
-                )
+    def validar_dnis(self, dnis, chunk_size=DNI_BATCH_CHUNK_SIZE, timeout=30):
+        """Valida muchos DNIs con VALIDAR_DNI_BATCH, en trozos de `chunk_size`.
 
-        # Parsear y retornar respuesta
-        try:
-            result = json.loads(self.response.decode())
-            print("[RpcClient] ✓ Respuesta parseada exitosamente", flush=True)
-            return result
-        except json.JSONDecodeError as e:
-            print(f"[RpcClient] ✗ Error al parsear respuesta: {e}", flush=True)
-            return {
-                "status": "ERROR",
-                "error": f"Respuesta inválida del servidor: {self.response.decode()}",
-            }
+        Los trozos se envían todos a la vez. Devuelve `personas`
+        (dni -> datos) y `missing` de todos los trozos, o el primer error
+        recibido.
+        """
+        dnis = list(dict.fromkeys(str(dni) for dni in dnis))
+        responses = self._call_chunks(
+            [
+                {"type": "VALIDAR_DNI_BATCH", "dnis": dnis[i : i + chunk_size]}
+                for i in range(0, len(dnis), chunk_size)
+            ],
+            "reniec_queue",
+            timeout,
+        )
+        personas, missing = {}, []
+        for response in responses:
+            if response.get("status") != "OK":
+                return response
+            personas.update(response.get("personas", {}))
+            missing.extend(response.get("missing", []))
+        return {"status": "OK", "personas": personas, "missing": missing}
+
+    def pending_calls(self):
+        with self._pending_lock:
+            return len(self._pending)
 
     def close(self):
         """Cierra la conexión con RabbitMQ."""
-        if self.connection and self.connection.is_open:
-            print("[RpcClient] Cerrando conexión...", flush=True)
-            self.connection.close()
-            print("[RpcClient] ✓ Conexión cerrada", flush=True)
+        if self._io_thread is None or not self._io_thread.is_alive():
+            return
+        print("[RpcClient] Cerrando conexión...", flush=True)
+        self._stopping = True
+        try:
+            # Despertar al hilo de E/S para que vea _stopping y cierre
+            self.connection.add_callback_threadsafe(lambda: None)
+        except Exception:
+            pass
+        if self._io_thread is not threading.current_thread():
+            self._io_thread.join(timeout=IO_POLL_SECONDS * 5)
+        print("[RpcClient] ✓ Conexión cerrada", flush=True)
@@ -0,0 +1,187 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class BloomFilter:
+    """Filtro de Bloom de tamaño fijo sobre cadenas.
+
+    Usa doble hashing (h1 + i*h2) a partir de un único blake2b de 128 bits,
+    así cada consulta calcula un solo hash aunque haya `k` posiciones.
+    """
+
+    def __init__(self, capacity, fp_rate):
+        if not 0 < fp_rate < 1:
+            raise ValueError("La tasa de falsos positivos debe estar entre 0 y 1")
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key):
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def memory_bytes(self):
+        return len(self._bits)
+
+
+class DniFilter:
+    """Filtro de Bloom con los DNIs de Personas para descartar DNIs inexistentes.
+
+    Si el filtro dice que un DNI no está, seguro que no está y se responde
+    sin consultar SQLite. Si dice que puede estar se consulta igual; cuando
+    la consulta no lo encuentra es un falso positivo y se cuenta con
+    `note_false_positive()`. `load()` construye un filtro nuevo y lo publica
+    con una sola asignación; los contadores se conservan entre recargas.
+    """
+
+    def __init__(self, fp_rate=0.01):
+        self.fp_rate = fp_rate
+        self._bloom = BloomFilter(1, fp_rate)
+        self.signature = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "rejected": 0,
+            "passed": 0,
+            "false_positives": 0,
+            "reloads": 0,
+            "last_reload": None,
+            "load_seconds": None,
+        }
+
+    def load(self, conn, signature=None):
+        start = time.monotonic()
+        count = conn.execute("SELECT COUNT(*) FROM Personas").fetchone()[0]
+        # Margen para altas posteriores sin pasarse de la tasa objetivo
+        bloom = BloomFilter(int(count * 1.1) + 1, self.fp_rate)
+        for (dni,) in conn.execute("SELECT dni FROM Personas"):
+            bloom.add(str(dni))
+        self._bloom = bloom
+        self.signature = signature
+        with self._lock:
+            self._stats["reloads"] += 1
+            self._stats["last_reload"] = time.time()
+            self._stats["load_seconds"] = round(time.monotonic() - start, 3)
+
+    def might_contain(self, dni):
+        found = str(dni) in self._bloom
+        with self._lock:
+            self._stats["passed" if found else "rejected"] += 1
+        return found
+
+    def note_false_positive(self):
+        with self._lock:
+            self._stats["false_positives"] += 1
+
+    def stats(self):
+        bloom = self._bloom
+        with self._lock:
+            stats = dict(self._stats)
+        # Entre los DNIs inexistentes consultados, cuántos pasó el filtro
+        absent = stats["rejected"] + stats["false_positives"]
+        stats.update(
+            {
+                "false_positive_rate": (
+                    round(stats["false_positives"] / absent, 4) if absent else 0.0
+                ),
+                "target_fp_rate": self.fp_rate,
+                "dnis": bloom.count,
+                "bits": bloom.num_bits,
+                "hashes": bloom.num_hashes,
+                "memory_bytes": bloom.memory_bytes(),
+            }
+        )
+        return stats
+
+
+class PersonaCache:
+    """Caché LRU con TTL de las personas encontradas (resultados positivos).
+
+    Los negativos no se guardan: los descarta el filtro de Bloom. `clear()`
+    se llama al repoblar la BD; igual que en BalanceCache, `put()` recibe la
+    versión tomada antes de consultar y se descarta si hubo un `clear()` en
+    medio, para no guardar una persona leída de la BD anterior.
+    """
+
+    def __init__(self, max_entries=100000, ttl=300.0):
+        if max_entries < 1:
+            raise ValueError("La caché necesita al menos una entrada")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # dni -> (persona, vence_en)
+        self._version = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "clears": 0,
+            "stale_puts": 0,
+        }
+
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def get(self, dni):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(dni)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[1] <= now:
+                del self._entries[dni]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(dni)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, dni, persona, version):
+        with self._lock:
+            if version != self._version:
+                self._stats["stale_puts"] += 1
+                return
+            self._entries[dni] = (persona, time.monotonic() + self.ttl)
+            self._entries.move_to_end(dni)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._stats["clears"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
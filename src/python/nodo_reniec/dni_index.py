@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+# Separadores del registro empaquetado (no aparecen en datos de RENIEC)
+FIELD_SEP = "\x1f"
+NULL_FIELD = "\x00"
+
+
+def db_signature(path):
+    """(mtime, tamaño) de la BD y de su -wal: cambia cuando alguien escribe.
+
+    En modo WAL las escrituras van primero al -wal y el fichero principal no
+    se toca hasta el checkpoint, por eso hay que mirar los dos.
+    """
+    signature = []
+    for name in (path, path + "-wal"):
+        try:
+            st = os.stat(name)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _is_numeric_dni(dni):
+    return isinstance(dni, str) and len(dni) == 8 and dni.isdigit()
+
+
+class _Snapshot:
+    """Contenido inmutable del índice; se reemplaza entero al recargar."""
+
+    __slots__ = ("columns", "keys", "offsets", "data", "extra")
+
+    def __init__(self, columns, keys, offsets, data, extra):
+        self.columns = columns  # Columnas de Personas sin el dni
+        self.keys = keys  # array('I') de DNIs numéricos ordenados
+        self.offsets = offsets  # array('I'): inicio del registro i en data (+1 final)
+        self.data = data  # bytes: registros UTF-8, campos separados por FIELD_SEP
+        self.extra = extra  # {dni: tupla} para DNIs que no son 8 dígitos
+
+
+class DniIndex:
+    """Tabla Personas completa en memoria, para responder VALIDAR_DNI sin disco.
+
+    Los DNIs de 8 dígitos se guardan como enteros en un `array('I')`
+    ordenado (4 bytes) y el resto de columnas en un único bloque de bytes
+    con una tabla de offsets (4 bytes más por persona); no hay un objeto
+    Python por persona. Los DNIs con otro formato, que no deberían existir,
+    van a un diccionario aparte.
+
+    `load()` construye un snapshot nuevo y lo publica con una sola
+    asignación: las consultas concurrentes ven el anterior o el nuevo.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._snap = _Snapshot((), array("I"), array("I", [0]), b"", {})
+        self.signature = None
+        self._stats = {"reloads": 0, "last_reload": None, "load_seconds": None}
+
+    def load(self, conn, signature=None):
+        """Lee Personas de `conn` (ordenada por dni) y reemplaza el índice."""
+        start = time.monotonic()
+        cursor = conn.execute("SELECT * FROM Personas ORDER BY dni")
+        names = [d[0] for d in cursor.description]
+        dni_col = names.index("dni")
+        columns = tuple(n for i, n in enumerate(names) if i != dni_col)
+
+        keys = array("I")
+        offsets = array("I", [0])
+        data = bytearray()
+        extra = {}
+        for row in cursor:
+            dni = row[dni_col]
+            fields = tuple(v for i, v in enumerate(row) if i != dni_col)
+            if not _is_numeric_dni(dni):
+                extra[str(dni)] = fields
+                continue
+            # ORDER BY sobre TEXT de 8 dígitos coincide con el orden numérico
+            keys.append(int(dni))
+            data += FIELD_SEP.join(
+                NULL_FIELD if v is None else str(v) for v in fields
+            ).encode("utf-8")
+            offsets.append(len(data))
+
+        self._snap = _Snapshot(columns, keys, offsets, bytes(data), extra)
+        self.signature = signature
+        self._stats["reloads"] += 1
+        self._stats["last_reload"] = time.time()
+        self._stats["load_seconds"] = round(time.monotonic() - start, 3)
+
+    def get(self, dni):
+        """Registro de la persona como dict (igual que una fila de SQLite) o None."""
+        snap = self._snap
+        dni = str(dni)
+        if not _is_numeric_dni(dni):
+            fields = snap.extra.get(dni)
+        else:
+            key = int(dni)
+            i = bisect_left(snap.keys, key)
+            if i == len(snap.keys) or snap.keys[i] != key:
+                return None
+            raw = snap.data[snap.offsets[i] : snap.offsets[i + 1]].decode("utf-8")
+            fields = [None if v == NULL_FIELD else v for v in raw.split(FIELD_SEP)]
+        if fields is None:
+            return None
+        persona = {"dni": dni}
+        persona.update(zip(snap.columns, fields))
+        return persona
+
+    def __contains__(self, dni):
+        return self.get(dni) is not None
+
+    def __len__(self):
+        snap = self._snap
+        return len(snap.keys) + len(snap.extra)
+
+    def memory_bytes(self):
+        snap = self._snap
+        return (
+            sys.getsizeof(snap.keys)
+            + sys.getsizeof(snap.offsets)
+            + sys.getsizeof(snap.data)
+            + sys.getsizeof(snap.extra)
+            + sum(sys.getsizeof(v) for v in snap.extra.values())
+        )
+
+    def stats(self):
+        stats = dict(self._stats)
+        persons = len(self)
+        memory = self.memory_bytes()
+        stats.update(
+            {
+                "persons": persons,
+                "memory_bytes": memory,
+                "mib_per_million": (
+                    round(memory / persons * 1_000_000 / (1024 * 1024), 2) if persons else None
+                ),
+            }
+        )
+        return stats
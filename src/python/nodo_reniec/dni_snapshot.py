@@ -0,0 +1,191 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+from src.python.nodo_reniec.dni_index import FIELD_SEP, NULL_FIELD
+
+SNAPSHOT_PATH = os.path.join("db_reniec", "reniec.snap")
+
+# Cabecera (little-endian, 64 bytes):
+#   magic, versión de formato, nº de personas, creado (ns desde epoch),
+#   y los offsets de las secciones columnas | registros | claves | offsets
+MAGIC = b"RNSNAP\x00\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sI4xQQQQQQ")
+
+
+def _align(f, boundary=8):
+    pad = -f.tell() % boundary
+    f.write(b"\x00" * pad)
+    return f.tell()
+
+
+def build_snapshot(conn, path):
+    """Exporta Personas de `conn` a un snapshot binario en `path`.
+
+    Secciones:
+    - columnas: JSON con los nombres de columna (sin el dni);
+    - registros: campos UTF-8 separados por FIELD_SEP, uno tras otro;
+    - claves: DNI de 8 dígitos como uint32, ordenados (ancho fijo);
+    - offsets: uint64 por persona (+1 final) relativos al inicio de registros.
+
+    Se escribe en `path + ".tmp"` y se publica con `os.replace`, así los
+    lectores ven el snapshot anterior o el nuevo completo. Devuelve
+    (personas exportadas, DNIs omitidos por no tener 8 dígitos).
+    """
+    cursor = conn.execute("SELECT * FROM Personas ORDER BY dni")
+    names = [d[0] for d in cursor.description]
+    dni_col = names.index("dni")
+    columns = [n for i, n in enumerate(names) if i != dni_col]
+
+    tmp_path = path + ".tmp"
+    keys = array("I")
+    offsets = array("Q", [0])
+    skipped = 0
+    with open(tmp_path, "wb") as f:
+        f.write(b"\x00" * HEADER.size)
+        columns_off = f.tell()
+        f.write(json.dumps(columns).encode("utf-8"))
+        data_off = _align(f)
+        size = 0
+        for row in cursor:
+            dni = row[dni_col]
+            if not (isinstance(dni, str) and len(dni) == 8 and dni.isdigit()):
+                skipped += 1
+                continue
+            record = FIELD_SEP.join(
+                NULL_FIELD if v is None else str(v) for i, v in enumerate(row) if i != dni_col
+            ).encode("utf-8")
+            f.write(record)
+            size += len(record)
+            keys.append(int(dni))
+            offsets.append(size)
+        if sys.byteorder != "little":
+            keys.byteswap()
+            offsets.byteswap()
+        keys_off = _align(f)
+        keys.tofile(f)
+        offsets_off = _align(f)
+        offsets.tofile(f)
+        f.seek(0)
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                len(keys),
+                time.time_ns(),
+                columns_off,
+                data_off,
+                keys_off,
+                offsets_off,
+            )
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(keys), skipped
+
+
+class _Mapped:
+    """Un snapshot abierto: el mmap y las vistas sobre sus secciones."""
+
+    __slots__ = ("mm", "keys", "offsets", "data_off", "columns", "count", "built_at", "signature")
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            # Las vistas se leen en el orden nativo
+            raise ValueError("Los snapshots sólo se pueden leer en máquinas little-endian")
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.count,
+            built_ns,
+            columns_off,
+            self.data_off,
+            keys_off,
+            offsets_off,
+        ) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es un snapshot de RENIEC")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Versión de snapshot no soportada: {version}")
+        self.built_at = built_ns / 1e9
+        self.columns = tuple(json.loads(self.mm[columns_off : self.data_off].rstrip(b"\x00")))
+        view = memoryview(self.mm)
+        self.keys = view[keys_off : keys_off + 4 * self.count].cast("I")
+        self.offsets = view[offsets_off : offsets_off + 8 * (self.count + 1)].cast("Q")
+
+
+class DniSnapshot:
+    """Consultas de DNI por búsqueda binaria sobre un snapshot mapeado en memoria.
+
+    Abrir el fichero sólo lee la cabecera, así que el arranque es
+    inmediato, y las páginas del mmap (sólo lectura) las comparte el page
+    cache entre todos los procesos que usen el mismo snapshot.
+    `reload_if_changed()` abre el fichero nuevo cuando se reconstruye; el
+    anterior se libera cuando deja de usarse.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._stats = {"reloads": 0, "last_reload": None}
+        self._snap = None
+        self._open()
+
+    def _open(self):
+        self._snap = _Mapped(self.path)
+        self._stats["reloads"] += 1
+        self._stats["last_reload"] = time.time()
+
+    def reload_if_changed(self):
+        """True si el fichero cambió y se abrió la nueva versión."""
+        st = os.stat(self.path)
+        if (st.st_ino, st.st_mtime_ns, st.st_size) == self._snap.signature:
+            return False
+        self._open()
+        return True
+
+    def get(self, dni):
+        """Registro de la persona como dict (igual que una fila de SQLite) o None."""
+        dni = str(dni)
+        if not (len(dni) == 8 and dni.isdigit()):
+            return None
+        snap = self._snap
+        key = int(dni)
+        i = bisect_left(snap.keys, key)
+        if i == snap.count or snap.keys[i] != key:
+            return None
+        start = snap.data_off + snap.offsets[i]
+        end = snap.data_off + snap.offsets[i + 1]
+        raw = snap.mm[start:end].decode("utf-8")
+        persona = {"dni": dni}
+        persona.update(
+            zip(snap.columns, (None if v == NULL_FIELD else v for v in raw.split(FIELD_SEP)))
+        )
+        return persona
+
+    def __len__(self):
+        return self._snap.count
+
+    def stats(self):
+        snap = self._snap
+        stats = dict(self._stats)
+        stats.update(
+            {
+                "path": self.path,
+                "format_version": FORMAT_VERSION,
+                "built_at": snap.built_at,
+                "persons": snap.count,
+                "file_bytes": snap.signature[2],
+            }
+        )
+        return stats
@@ -1,21 +1,121 @@
-import json
+import argparse
+import functools
 import os
-import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pika
 
 # Simplificar la modificación del path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 
+from src.python.common import codec
+from src.python.common.adaptive_prefetch import AdaptivePrefetch
+from src.python.common.async_log import INFO, LEVELS, AsyncLogger
+from src.python.nodo_reniec.dni_filter import DniFilter, PersonaCache
+from src.python.nodo_reniec.dni_index import DniIndex, db_signature
+from src.python.nodo_reniec.dni_snapshot import SNAPSHOT_PATH, DniSnapshot
+from src.python.nodo_reniec.sqlite_readers import (
+    CACHE_SIZE_KIB,
+    MMAP_SIZE,
+    ReaderPool,
+    connect_readonly,
+)
+
 DB_PATH = os.path.join("db_reniec", "reniec.db")
 RENIEC_QUEUE = "reniec_queue"
 
+# Texto fijo: sqlite3 reutiliza la sentencia compilada de su caché por conexión
+SQL_PERSONA = "SELECT * FROM Personas WHERE dni = ?"
+
+# VALIDAR_DNI_BATCH: DNIs máximos por mensaje y por consulta `IN (...)`
+# (SQLite antiguo no admite más de 999 parámetros por sentencia)
+DNI_BATCH_MAX = 5000
+DNI_IN_CHUNK = 500
+
+# Prefetch adaptativo (AIMD) según la latencia de las consultas
+ADAPTIVE_PREFETCH_MAX = 128
+ADAPTIVE_TARGET_LATENCY_MS = 20.0
+ADAPTIVE_INTERVAL = 0.5
+
+# Estructuras en memoria (índice, filtro, caché): cada cuánto se mira si la
+# BD cambió para reconstruirlas (segundos)
+DB_CHECK_INTERVAL = 5.0
+
+# Filtro de Bloom de DNIs existentes y caché de personas encontradas
+BLOOM_FP_RATE = 0.01
+PERSONA_CACHE_SIZE = 100000
+PERSONA_CACHE_TTL = 300.0
+
 
 class ReniecWorker:
-    def __init__(self):
+    def __init__(
+        self,
+        log_level=INFO,
+        log_sample=1.0,
+        prefetch=1,
+        adaptive_prefetch=False,
+        prefetch_max=ADAPTIVE_PREFETCH_MAX,
+        target_latency_ms=ADAPTIVE_TARGET_LATENCY_MS,
+        readers=1,
+        mmap_size=MMAP_SIZE,
+        cache_size_kib=CACHE_SIZE_KIB,
+        dni_index=False,
+        bloom_filter=False,
+        bloom_fp_rate=BLOOM_FP_RATE,
+        persona_cache=False,
+        persona_cache_size=PERSONA_CACHE_SIZE,
+        persona_cache_ttl=PERSONA_CACHE_TTL,
+        dni_batch_max=DNI_BATCH_MAX,
+        dni_snapshot=None,
+    ):
         self.db_path = DB_PATH
+        self.log = AsyncLogger("ReniecWorker", level=log_level, sample_rate=log_sample)
+        # Conexiones de sólo lectura abiertas una vez; con varios lectores los
+        # mensajes se atienden en un pool de hilos, uno por conexión
+        self.readers = ReaderPool(self.db_path, readers, mmap_size, cache_size_kib)
+        self.executor = ThreadPoolExecutor(max_workers=readers) if readers > 1 else None
+        # Sin al menos un mensaje en vuelo por lector, los hilos quedarían ociosos
+        self.prefetch = max(prefetch, readers)
+        self.dni_batch_max = dni_batch_max
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+
+        if dni_index and dni_snapshot:
+            raise ValueError("El índice en memoria y el snapshot son excluyentes")
+        self.dni_index = DniIndex(self.db_path) if dni_index else None
+        # dni_snapshot: None o la ruta del snapshot de scripts/construir_snapshot_reniec.py
+        self.dni_snapshot = DniSnapshot(dni_snapshot) if dni_snapshot else None
+        # Dónde se buscan las personas en memoria (None: en SQLite)
+        self.persona_source = (
+            self.dni_index if self.dni_index is not None else self.dni_snapshot
+        )
+        self.dni_filter = DniFilter(bloom_fp_rate) if bloom_filter else None
+        self.persona_cache = (
+            PersonaCache(persona_cache_size, persona_cache_ttl) if persona_cache else None
+        )
+        self._db_signature = None
+        if self.dni_snapshot is not None:
+            self._log_snapshot("Snapshot de DNIs abierto")
+        if any(
+            x is not None
+            for x in (self.dni_index, self.dni_snapshot, self.dni_filter, self.persona_cache)
+        ):
+            self._reload_from_db()
+            threading.Thread(
+                target=self._db_watch_loop, name="reniec-db-watch", daemon=True
+            ).start()
+
+        self.prefetch_ctl = None
+        if adaptive_prefetch:
+            self.prefetch_ctl = AdaptivePrefetch(
+                self.prefetch,
+                minimum=readers,
+                maximum=max(prefetch_max, self.prefetch),
+                target_latency_ms=target_latency_ms,
+            )
         self._init_rabbitmq()
 
     def _init_rabbitmq(self):
@@ -57,34 +157,75 @@ class ReniecWorker:
                     sys.exit(1)
 
     def on_message(self, ch, method, props, body):
+        if self.executor is not None:
+            self.executor.submit(self._on_message_threaded, ch, method, props, body)
+            return
+        start = time.perf_counter()
+        req, response_data = self._process(body, props.content_type)
+        self._finish(ch, method.delivery_tag, props, req, response_data, start)
+
+    def _on_message_threaded(self, ch, method, props, body):
+        """Procesa un mensaje en el pool de lectores (--readers > 1).
+
+        La respuesta y el ack se hacen en el hilo de la conexión: pika no es
+        thread-safe.
+        """
+        start = time.perf_counter()
+        req, response_data = self._process(body, props.content_type)
+        self.connection.add_callback_threadsafe(
+            functools.partial(
+                self._finish, ch, method.delivery_tag, props, req, response_data, start
+            )
+        )
+
+    def _process(self, body, content_type):
+        req = {}
         try:
-            message = body.decode("utf-8")
-            print(f"[ReniecWorker] Mensaje recibido: {message}")
-            req = json.loads(message)
+            self.log.debug("Mensaje recibido", body=body)
+            req = codec.decode(body, content_type)
             req_type = req.get("type", "").upper()
 
             if req_type == "VALIDAR_DNI":
-                response_data = self._handle_validar_dni(req)
-            else:
-                response_data = {"status": "ERROR", "error": "TIPO_DESCONOCIDO"}
+                return req, self._handle_validar_dni(req)
+            if req_type == "VALIDAR_DNI_BATCH":
+                return req, self._handle_validar_dni_batch(req)
+            if req_type == "STATS":
+                return req, self._handle_stats()
+            return req, {"status": "ERROR", "error": "TIPO_DESCONOCIDO"}
+        except Exception as e:
+            self.log.error("Inesperado", error=e)
+            return req, None
 
-            if props.reply_to:
+    def _finish(self, ch, delivery_tag, props, req, response_data, start):
+        try:
+            if props.reply_to and response_data is not None:
+                reply_codec = codec.for_content_type(props.content_type)
+                response_body = reply_codec.encode(response_data)
                 ch.basic_publish(
                     exchange="",
                     routing_key=props.reply_to,
                     properties=pika.BasicProperties(
-                        correlation_id=props.correlation_id
+                        correlation_id=props.correlation_id,
+                        content_type=reply_codec.content_type,
                     ),
-                    body=json.dumps(response_data, default=str),
-                )
-                print(
-                    f"[ReniecWorker] Respuesta enviada: {json.dumps(response_data, default=str)}"
+                    body=response_body,
                 )
+                self.log.debug("Respuesta enviada", body=response_body)
 
         except Exception as e:
-            print(f"[ReniecWorker] [ERROR] Inesperado: {e}")
+            self.log.error("Inesperado", error=e)
         finally:
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            ch.basic_ack(delivery_tag=delivery_tag)
+            latency_ms = (time.perf_counter() - start) * 1000
+            if self.prefetch_ctl:
+                self.prefetch_ctl.observe(latency_ms)
+            self.log.info(
+                "Procesado",
+                sampled=True,
+                type=req.get("type") if isinstance(req, dict) else None,
+                dni=req.get("dni") if isinstance(req, dict) else None,
+                latency_ms=latency_ms,
+            )
 
     def _handle_validar_dni(self, req):
         dni = req.get("dni")
@@ -92,40 +233,355 @@ class ReniecWorker:
             return {"status": "ERROR", "error": "DNI no proporcionado"}
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM Personas WHERE dni = ?", (dni,))
-                persona = cursor.fetchone()
-
-                if persona:
-                    return {"status": "OK", "data": dict(persona)}
-                else:
-                    return {"status": "ERROR", "error": "DNI no encontrado"}
+            persona = self._find_persona(dni)
+            if persona:
+                return {"status": "OK", "data": persona}
+            else:
+                return {"status": "ERROR", "error": "DNI no encontrado"}
         except Exception as e:
-            print(f"[ReniecWorker] [ERROR] al consultar DB: {e}")
+            self.log.error("Al consultar DB", dni=dni, error=e)
             return {"status": "ERROR", "error": f"Error en base de datos: {e}"}
 
+    def _handle_validar_dni_batch(self, req):
+        """Valida una lista de DNIs en un solo mensaje.
+
+        Responde `personas` (dni -> datos) y en `missing` los DNIs que no
+        están en RENIEC, en el orden recibido.
+        """
+        dnis = req.get("dnis")
+        if not isinstance(dnis, list) or not all(
+            isinstance(dni, (str, int)) and dni != "" for dni in dnis
+        ):
+            return {"status": "ERROR", "error": "DNIS_INVALIDOS"}
+        dnis = list(dict.fromkeys(str(dni) for dni in dnis))
+        if len(dnis) > self.dni_batch_max:
+            return {
+                "status": "ERROR",
+                "error": "LOTE_DEMASIADO_GRANDE",
+                "max": self.dni_batch_max,
+            }
+
+        try:
+            personas = self._find_personas(dnis)
+        except Exception as e:
+            self.log.error("Al consultar DB (lote)", dnis=len(dnis), error=e)
+            return {"status": "ERROR", "error": f"Error en base de datos: {e}"}
+        return {
+            "status": "OK",
+            "personas": personas,
+            "missing": [dni for dni in dnis if dni not in personas],
+        }
+
+    def _find_personas(self, dnis):
+        """Como `_find_persona` para muchos DNIs: lo que no resuelven el filtro,
+        la caché o el índice se busca con `IN (...)` de DNI_IN_CHUNK en DNI_IN_CHUNK.
+        """
+        if self.dni_filter is not None:
+            dnis = [dni for dni in dnis if self.dni_filter.might_contain(dni)]
+        found = {}
+        pending = dnis
+        if self.persona_cache is not None:
+            version = self.persona_cache.version()
+            pending = []
+            for dni in dnis:
+                persona = self.persona_cache.get(dni)
+                if persona is None:
+                    pending.append(dni)
+                else:
+                    found[dni] = persona
+
+        fetched = {}
+        if self.persona_source is not None:
+            for dni in pending:
+                persona = self.persona_source.get(dni)
+                if persona is not None:
+                    fetched[dni] = persona
+        elif pending:
+            with self.readers.connection() as conn:
+                for i in range(0, len(pending), DNI_IN_CHUNK):
+                    chunk = pending[i : i + DNI_IN_CHUNK]
+                    rows = conn.execute(
+                        "SELECT * FROM Personas WHERE dni IN (%s)"
+                        % ",".join("?" * len(chunk)),
+                        chunk,
+                    )
+                    fetched.update((row["dni"], dict(row)) for row in rows)
+
+        if self.dni_filter is not None:
+            for _ in range(len(pending) - len(fetched)):
+                self.dni_filter.note_false_positive()
+        if self.persona_cache is not None:
+            for dni, persona in fetched.items():
+                self.persona_cache.put(dni, persona, version)
+        found.update(fetched)
+        return found
+
+    def _find_persona(self, dni):
+        """Persona como dict o None.
+
+        Orden: filtro de Bloom (descarta inexistentes sin E/S), caché de
+        positivos, y después el índice o snapshot en memoria si hay uno o SQLite.
+        """
+        if self.dni_filter is not None and not self.dni_filter.might_contain(dni):
+            return None
+        if self.persona_cache is not None:
+            persona = self.persona_cache.get(dni)
+            if persona is not None:
+                return persona
+            version = self.persona_cache.version()
+
+        if self.persona_source is not None:
+            persona = self.persona_source.get(dni)
+        else:
+            with self.readers.connection() as conn:
+                row = conn.execute(SQL_PERSONA, (dni,)).fetchone()
+            persona = dict(row) if row else None
+
+        if persona is None:
+            if self.dni_filter is not None:
+                self.dni_filter.note_false_positive()
+        elif self.persona_cache is not None:
+            self.persona_cache.put(dni, persona, version)
+        return persona
+
+    def _handle_stats(self):
+        return {
+            "status": "OK",
+            "readers": self.readers.stats(),
+            "dni_index": self.dni_index.stats() if self.dni_index else None,
+            "dni_snapshot": self.dni_snapshot.stats() if self.dni_snapshot else None,
+            "bloom_filter": self.dni_filter.stats() if self.dni_filter else None,
+            "persona_cache": self.persona_cache.stats() if self.persona_cache else None,
+            "prefetch": self.prefetch_ctl.stats() if self.prefetch_ctl else self.prefetch,
+        }
+
+    def _reload_from_db(self):
+        """(Re)construye índice y filtro con una conexión propia y vacía la caché."""
+        # La firma se toma antes de leer: si la BD cambia durante la carga, la
+        # siguiente comprobación vuelve a cargar
+        signature = db_signature(self.db_path)
+        if self.dni_index is not None or self.dni_filter is not None:
+            conn = connect_readonly(self.db_path, self.mmap_size, self.cache_size_kib)
+            try:
+                if self.dni_index is not None:
+                    self.dni_index.load(conn, signature)
+                if self.dni_filter is not None:
+                    self.dni_filter.load(conn, signature)
+            finally:
+                conn.close()
+        if self.persona_cache is not None and self._db_signature is not None:
+            self.persona_cache.clear()
+        self._db_signature = signature
+
+        if self.dni_index is not None:
+            stats = self.dni_index.stats()
+            self.log.info(
+                "Índice de DNIs cargado",
+                persons=stats["persons"],
+                memory_bytes=stats["memory_bytes"],
+                mib_per_million=stats["mib_per_million"],
+                load_seconds=stats["load_seconds"],
+            )
+        if self.dni_filter is not None:
+            stats = self.dni_filter.stats()
+            self.log.info(
+                "Filtro de Bloom cargado",
+                dnis=stats["dnis"],
+                memory_bytes=stats["memory_bytes"],
+                hashes=stats["hashes"],
+                load_seconds=stats["load_seconds"],
+            )
+
+    def _db_watch_loop(self):
+        """Reconstruye las estructuras en memoria cuando se repuebla reniec.db
+        y abre el snapshot nuevo cuando se reconstruye."""
+        while True:
+            time.sleep(DB_CHECK_INTERVAL)
+            try:
+                if db_signature(self.db_path) != self._db_signature:
+                    self._reload_from_db()
+            except Exception as e:
+                self.log.error("Recargando desde la BD", error=e)
+            try:
+                if self.dni_snapshot is not None and self.dni_snapshot.reload_if_changed():
+                    self._log_snapshot("Snapshot de DNIs recargado")
+            except Exception as e:
+                self.log.error("Recargando el snapshot de DNIs", error=e)
+
+    def _log_snapshot(self, msg):
+        stats = self.dni_snapshot.stats()
+        self.log.info(
+            msg,
+            path=stats["path"],
+            persons=stats["persons"],
+            file_bytes=stats["file_bytes"],
+            built_at=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stats["built_at"])),
+        )
+
+    def _adapt_prefetch(self):
+        new = self.prefetch_ctl.update()
+        if new is not None:
+            self.prefetch = new
+            self.channel.basic_qos(prefetch_count=new)
+            self.log.debug("Prefetch ajustado", prefetch=new)
+        self.connection.call_later(ADAPTIVE_INTERVAL, self._adapt_prefetch)
+
     def start(self):
-        self.channel.basic_qos(prefetch_count=1)
+        self.channel.basic_qos(prefetch_count=self.prefetch)
         self.channel.basic_consume(
             queue=RENIEC_QUEUE, on_message_callback=self.on_message
         )
+        if self.prefetch_ctl:
+            self.connection.call_later(ADAPTIVE_INTERVAL, self._adapt_prefetch)
         try:
             self.channel.start_consuming()
         except KeyboardInterrupt:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                # Entregar las respuestas que los hilos dejaron encoladas
+                self.connection.process_data_events(time_limit=0)
             self.connection.close()
             print("[ReniecWorker] Conexión cerrada.")
+        finally:
+            self.readers.close()
+            self.log.close()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker RENIEC (validación de DNI).")
+    parser.add_argument(
+        "--log-level",
+        choices=list(LEVELS),
+        default="INFO",
+        help="Nivel de log (DEBUG muestra cada mensaje y respuesta completos)",
+    )
+    parser.add_argument(
+        "--log-sample",
+        type=float,
+        default=1.0,
+        help="Fracción de mensajes procesados que se registran (0-1, por defecto 1)",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=1,
+        help="Prefetch de la cola (valor inicial si es adaptativo, por defecto 1)",
+    )
+    parser.add_argument(
+        "--adaptive-prefetch",
+        action="store_true",
+        help="Ajustar el prefetch (AIMD) según la latencia de las consultas",
+    )
+    parser.add_argument(
+        "--prefetch-max",
+        type=int,
+        default=ADAPTIVE_PREFETCH_MAX,
+        help=f"Prefetch máximo del modo adaptativo (por defecto {ADAPTIVE_PREFETCH_MAX})",
+    )
+    parser.add_argument(
+        "--target-latency-ms",
+        type=float,
+        default=ADAPTIVE_TARGET_LATENCY_MS,
+        help=f"Latencia a partir de la cual se reduce el prefetch (por defecto {ADAPTIVE_TARGET_LATENCY_MS})",
+    )
+    parser.add_argument(
+        "--readers",
+        type=int,
+        default=1,
+        help="Conexiones de lectura a SQLite, cada una con su hilo (por defecto 1)",
+    )
+    parser.add_argument(
+        "--mmap-size",
+        type=int,
+        default=MMAP_SIZE,
+        help=f"Bytes de la BD mapeados en memoria por conexión (por defecto {MMAP_SIZE})",
+    )
+    parser.add_argument(
+        "--cache-size-kib",
+        type=int,
+        default=CACHE_SIZE_KIB,
+        help=f"Caché de páginas de SQLite por conexión en KiB (por defecto {CACHE_SIZE_KIB})",
+    )
+    parser.add_argument(
+        "--dni-index",
+        action="store_true",
+        help="Cargar Personas en memoria y responder VALIDAR_DNI sin consultar SQLite; "
+        "se recarga sola cuando cambia la BD",
+    )
+    parser.add_argument(
+        "--bloom-filter",
+        action="store_true",
+        help="Descartar DNIs inexistentes con un filtro de Bloom, sin consultar la BD",
+    )
+    parser.add_argument(
+        "--bloom-fp-rate",
+        type=float,
+        default=BLOOM_FP_RATE,
+        help=f"Tasa de falsos positivos objetivo del filtro (por defecto {BLOOM_FP_RATE})",
+    )
+    parser.add_argument(
+        "--persona-cache",
+        action="store_true",
+        help="Cachear (LRU con TTL) las personas encontradas",
+    )
+    parser.add_argument(
+        "--persona-cache-size",
+        type=int,
+        default=PERSONA_CACHE_SIZE,
+        help=f"Entradas máximas de la caché de personas (por defecto {PERSONA_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--persona-cache-ttl",
+        type=float,
+        default=PERSONA_CACHE_TTL,
+        help=f"Segundos que vive una persona en la caché (por defecto {PERSONA_CACHE_TTL})",
+    )
+    parser.add_argument(
+        "--dni-batch-max",
+        type=int,
+        default=DNI_BATCH_MAX,
+        help=f"DNIs máximos por VALIDAR_DNI_BATCH (por defecto {DNI_BATCH_MAX})",
+    )
+    parser.add_argument(
+        "--dni-snapshot",
+        nargs="?",
+        const=SNAPSHOT_PATH,
+        default=None,
+        metavar="FICHERO",
+        help="Responder VALIDAR_DNI desde el snapshot mapeado en memoria de "
+        f"scripts/construir_snapshot_reniec.py (por defecto {SNAPSHOT_PATH})",
+    )
+    args = parser.parse_args()
+    if args.dni_index and args.dni_snapshot:
+        parser.error("--dni-index y --dni-snapshot son excluyentes")
+    if args.readers < 1:
+        parser.error("--readers debe ser al menos 1")
+
     print("[ReniecWorker] ========================================", flush=True)
     print("[ReniecWorker] Iniciando ReniecWorker...", flush=True)
     print(f"[ReniecWorker] Base de datos: {DB_PATH}", flush=True)
     print("[ReniecWorker] ========================================", flush=True)
 
     try:
-        worker = ReniecWorker()
+        worker = ReniecWorker(
+            log_level=LEVELS[args.log_level],
+            log_sample=args.log_sample,
+            prefetch=args.prefetch,
+            adaptive_prefetch=args.adaptive_prefetch,
+            prefetch_max=args.prefetch_max,
+            target_latency_ms=args.target_latency_ms,
+            readers=args.readers,
+            mmap_size=args.mmap_size,
+            cache_size_kib=args.cache_size_kib,
+            dni_index=args.dni_index,
+            bloom_filter=args.bloom_filter,
+            bloom_fp_rate=args.bloom_fp_rate,
+            persona_cache=args.persona_cache,
+            persona_cache_size=args.persona_cache_size,
+            persona_cache_ttl=args.persona_cache_ttl,
+            dni_batch_max=args.dni_batch_max,
+            dni_snapshot=args.dni_snapshot,
+        )
         print("[ReniecWorker] ✓ Worker inicializado correctamente", flush=True)
         print("[ReniecWorker] Esperando mensajes... (Ctrl+C para detener)", flush=True)
         worker.start()
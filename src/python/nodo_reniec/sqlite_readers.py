@@ -0,0 +1,100 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# Pragmas por defecto de las conexiones de lectura
+MMAP_SIZE = 256 * 1024 * 1024  # Bytes del fichero mapeados en memoria
+CACHE_SIZE_KIB = 64 * 1024  # Caché de páginas por conexión
+
+
+def enable_wal(path):
+    """Pone la BD en modo WAL (queda guardado en el fichero) y devuelve el modo final.
+
+    Una conexión `mode=ro` no puede cambiar el journal, por eso se hace una
+    vez con una conexión de escritura. Si el fichero no se puede escribir se
+    sigue con el modo que tenga.
+    """
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def connect_readonly(path, mmap_size=MMAP_SIZE, cache_size_kib=CACHE_SIZE_KIB):
+    """Conexión de sólo lectura (URI `mode=ro`) con mmap y caché de páginas.
+
+    `sqlite3` guarda las sentencias ya compiladas por conexión
+    (`cached_statements`), así que repetir el mismo texto SQL no vuelve a
+    prepararlo. Se puede usar desde otros hilos, uno a la vez.
+    """
+    uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=256)
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = -{int(cache_size_kib)}")
+    conn.execute("PRAGMA query_only = 1")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class ReaderPool:
+    """Conexiones de lectura persistentes a SQLite compartidas por hilos.
+
+    Con `size=1` es simplemente la conexión única del worker; con más, cada
+    hilo del pool de mensajes toma una libre (SQLite admite lectores
+    concurrentes, más aún en WAL).
+    """
+
+    def __init__(self, path, size=1, mmap_size=MMAP_SIZE, cache_size_kib=CACHE_SIZE_KIB):
+        if size < 1:
+            raise ValueError("El pool necesita al menos una conexión")
+        if not os.path.exists(path):
+            # enable_wal() crearía una BD vacía y mode=ro no diría qué falta
+            raise FileNotFoundError(f"No existe la base de datos {path}")
+        self.path = path
+        self.size = size
+        self.journal_mode = enable_wal(path)
+        self._idle = queue.LifoQueue()
+        self._all = []
+        for _ in range(size):
+            conn = connect_readonly(path, mmap_size, cache_size_kib)
+            self._all.append(conn)
+            self._idle.put(conn)
+        self._lock = threading.Lock()
+        self._stats = {"checkouts": 0, "total_wait_ms": 0.0}
+
+    @contextmanager
+    def connection(self):
+        start = time.monotonic()
+        conn = self._idle.get()
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        for conn in self._all:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats.update(
+            {"size": self.size, "idle": self._idle.qsize(), "journal_mode": self.journal_mode}
+        )
+        return stats
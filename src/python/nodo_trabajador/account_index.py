@@ -0,0 +1,89 @@
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+# Cuentas añadidas sueltas que se acumulan antes de rehacer el array ordenado
+MAX_PENDING = 1024
+
+
+def read_partition_file(path):
+    """Ids de cuenta de un fichero `data/particionN_replicaM/cuentas_partN.txt`.
+
+    Cada línea es `id_cuenta,saldo`; las líneas vacías o mal formadas se ignoran.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            head = line.split(",", 1)[0].strip()
+            if head.lstrip("-").isdigit():
+                yield int(head)
+
+
+class AccountIndex:
+    """Conjunto compacto de las cuentas que pertenecen al worker.
+
+    Las cuentas se guardan ordenadas en un `array('i')` (4 bytes por
+    cuenta) y se buscan por bisección, así que saber si el worker es dueño
+    de `from`/`to` en un PREPARE no cuesta ninguna consulta. Las altas
+    sueltas van a un conjunto pequeño que se funde con el array al pasar de
+    MAX_PENDING. `load()` reemplaza el índice de una vez: los lectores ven
+    el array anterior o el nuevo, nunca uno a medias.
+    """
+
+    def __init__(self, source):
+        self.source = source  # "db" o la ruta del fichero de la partición
+        self._lock = threading.Lock()  # Sólo para escritores
+        self._ids = array("i")
+        self._pending = set()
+        self._stats = {"refreshes": 0, "added": 0, "last_refresh": None}
+
+    def load(self, ids):
+        ids = array("i", sorted(set(ids)))
+        with self._lock:
+            self._ids, self._pending = ids, set()
+            self._stats["refreshes"] += 1
+            self._stats["last_refresh"] = time.time()
+
+    def __contains__(self, account):
+        ids = self._ids
+        i = bisect_left(ids, account)
+        return (i < len(ids) and ids[i] == account) or account in self._pending
+
+    def __len__(self):
+        return len(self._ids) + len(self._pending)
+
+    def add(self, accounts):
+        """Registra cuentas creadas después de la última carga."""
+        with self._lock:
+            for acc in accounts:
+                if acc not in self:
+                    self._pending.add(acc)
+                    self._stats["added"] += 1
+            if len(self._pending) > MAX_PENDING:
+                merged = array("i", sorted(set(self._ids).union(self._pending)))
+                self._ids, self._pending = merged, set()
+
+    def memory_bytes(self):
+        ids, pending = self._ids, self._pending
+        # El set guarda referencias a int: ~28 bytes por objeto además de la tabla
+        return (
+            sys.getsizeof(ids)
+            + sys.getsizeof(pending)
+            + 28 * len(pending)
+        )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        accounts = len(self)
+        memory = self.memory_bytes()
+        stats.update(
+            {
+                "source": self.source,
+                "accounts": accounts,
+                "memory_bytes": memory,
+                "bytes_per_account": round(memory / accounts, 2) if accounts else None,
+            }
+        )
+        return stats
@@ -0,0 +1,167 @@
+import asyncio
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+
+class AsyncioConsumer:
+    """Consumidor de NodoWorker sobre el adaptador asyncio de pika (modo --async).
+
+    El event loop sólo hace E/S de AMQP, así que los heartbeats y las
+    entregas no se detienen detrás de una consulta lenta. Cada mensaje se
+    procesa como una corrutina que delega el handler (psycopg2, bloqueante)
+    al pool de hilos del worker y, al terminar, publica la respuesta y
+    confirma la entrega desde el propio loop. El protocolo de mensajes es
+    exactamente el del modo síncrono.
+    """
+
+    def __init__(
+        self,
+        worker,
+        exchange,
+        process,
+        finish,
+        max_attempts=5,
+        retry_delay=3,
+        adapt_interval=None,
+    ):
+        self.worker = worker
+        self.exchange = exchange
+        self.process = process  # (body, content_type) -> respuesta, en el pool de hilos
+        self.finish = finish  # (canal, delivery_tag, props, respuesta) en el loop
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.adapt_interval = adapt_interval  # Cada cuánto pedir worker.next_prefetch()
+
+        self.loop = None
+        self.connection = None
+        self.channel = None
+        self._attempt = 0
+        self._stopping = False
+        self._in_flight = set()
+        self._consumer_tag = None
+        self.failed = False  # True si no se pudo conectar tras todos los intentos
+
+    def run(self):
+        """Conecta y bloquea hasta que se detiene el consumidor."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._connect()
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            self.stop()
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def stop(self):
+        """Deja de consumir, espera a los mensajes en vuelo y cierra la conexión."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self.loop.create_task(self._shutdown())
+
+    async def _shutdown(self):
+        if self._consumer_tag and self.channel and self.channel.is_open:
+            self.channel.basic_cancel(self._consumer_tag)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self.connection and not (self.connection.is_closing or self.connection.is_closed):
+            self.connection.close()
+        else:
+            self.loop.stop()
+
+    # --- Conexión y declaración de la topología ---
+
+    def _connect(self):
+        self._attempt += 1
+        print(
+            f"[Nodo-{self.worker.worker_id}] Intento {self._attempt}/{self.max_attempts} "
+            "de conexión a RabbitMQ (asyncio)...",
+            flush=True,
+        )
+        self.connection = AsyncioConnection(
+            pika.ConnectionParameters(host="localhost"),
+            on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_connection_open_error,
+            on_close_callback=self._on_connection_closed,
+            custom_ioloop=self.loop,
+        )
+
+    def _on_connection_open_error(self, _connection, error):
+        print(
+            f"[Nodo-{self.worker.worker_id}] ✗ Error en intento {self._attempt}: {error!r}",
+            flush=True,
+        )
+        if self._attempt < self.max_attempts:
+            self.loop.call_later(self.retry_delay, self._connect)
+        else:
+            print(
+                f"[Nodo-{self.worker.worker_id}] ✗ FALLO CRÍTICO: No se pudo conectar "
+                f"después de {self.max_attempts} intentos",
+                flush=True,
+            )
+            self.failed = True
+            self.loop.stop()
+
+    def _on_connection_closed(self, _connection, reason):
+        if not self._stopping:
+            self.worker.log.error("Conexión con RabbitMQ cerrada", reason=reason)
+        self.loop.stop()
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_channel_open(self, channel):
+        self.channel = channel
+        channel.exchange_declare(
+            exchange=self.exchange,
+            exchange_type="direct",
+            callback=lambda _frame: channel.queue_declare(
+                queue=self.worker.queue_name, durable=True, callback=self._on_queue_declared
+            ),
+        )
+
+    def _on_queue_declared(self, _frame):
+        self.channel.queue_bind(
+            queue=self.worker.queue_name,
+            exchange=self.exchange,
+            routing_key=self.worker.queue_name,
+            callback=lambda _frame: self.channel.basic_qos(
+                prefetch_count=self.worker.prefetch, callback=self._on_qos
+            ),
+        )
+
+    def _on_qos(self, _frame):
+        self._consumer_tag = self.channel.basic_consume(
+            queue=self.worker.queue_name, on_message_callback=self._on_message
+        )
+        print(
+            f"[Nodo-{self.worker.worker_id}] ✓ Escuchando en cola '{self.worker.queue_name}' "
+            f"(asyncio, prefetch {self.worker.prefetch})",
+            flush=True,
+        )
+        if self.adapt_interval:
+            self.loop.call_later(self.adapt_interval, self._adapt_prefetch)
+
+    def _adapt_prefetch(self):
+        if self._stopping or not self.channel.is_open:
+            return
+        new = self.worker.next_prefetch()
+        if new is not None:
+            self.channel.basic_qos(prefetch_count=new)
+        self.loop.call_later(self.adapt_interval, self._adapt_prefetch)
+
+    # --- Mensajes ---
+
+    def _on_message(self, channel, method, props, body):
+        task = self.loop.create_task(self._handle(channel, method, props, body))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _handle(self, channel, method, props, body):
+        response_data = await self.loop.run_in_executor(
+            self.worker.executor, self.process, body, props.content_type
+        )
+        self.finish(channel, method.delivery_tag, props, response_data)
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+
+def _dec(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class BalanceCache:
+    """Caché LRU con TTL de saldos confirmados para CONSULTAR_CUENTA.
+
+    Es de lectura a través: el handler consulta la caché y, si falla, lee
+    de la BD y guarda el resultado. Los COMMIT del propio worker actualizan
+    las entradas con su delta neto; si un COMMIT falla las cuentas se
+    invalidan. Las escrituras externas (préstamos del ServidorCentral) sólo
+    se ven al vencer el TTL, que acota cuánto puede atrasarse un saldo.
+
+    Para que una lectura de la BD que corre en paralelo con un COMMIT no
+    guarde un saldo anterior a él, `put()` recibe la versión tomada antes
+    de la lectura y se descarta si hubo cambios desde entonces.
+    """
+
+    def __init__(self, max_entries=100000, ttl=1.0):
+        if max_entries < 1:
+            raise ValueError("La caché necesita al menos una entrada")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id_cuenta -> (saldo, vence_en)
+        self._version = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_puts": 0,
+        }
+
+    def version(self):
+        """Versión a pasar a `put()` tomada antes de leer de la BD."""
+        with self._lock:
+            return self._version
+
+    def get(self, account):
+        """Saldo cacheado de `account` o None si no está o venció."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[1] <= now:
+                del self._entries[account]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(account)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, account, balance, version):
+        with self._lock:
+            if version != self._version:
+                self._stats["stale_puts"] += 1
+                return
+            self._entries[account] = (_dec(balance), time.monotonic() + self.ttl)
+            self._entries.move_to_end(account)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def apply(self, ops):
+        """Aplica a las entradas presentes el delta de una tx ya confirmada."""
+        deltas = {}
+        for op_type, acc, amount in ops:
+            if op_type == "debit":
+                deltas[acc] = deltas.get(acc, 0) - _dec(amount)
+            elif op_type == "credit":
+                deltas[acc] = deltas.get(acc, 0) + _dec(amount)
+        with self._lock:
+            self._version += 1
+            for acc, delta in deltas.items():
+                entry = self._entries.get(acc)
+                if entry is not None:
+                    self._entries[acc] = (entry[0] + delta, entry[1])
+
+    def invalidate(self, accounts):
+        with self._lock:
+            self._version += 1
+            for acc in accounts:
+                if self._entries.pop(acc, None) is not None:
+                    self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
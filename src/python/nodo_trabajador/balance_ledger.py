@@ -0,0 +1,156 @@
+import threading
+from decimal import Decimal
+
+# Resultados de reserve()
+RESERVADO = "RESERVADO"
+SALDO_INSUFICIENTE = "SALDO_INSUFICIENTE"
+NO_PERTENECE = "NO_PERTENECE"
+
+
+def _dec(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class BalanceLedger:
+    """Saldos de la partición en memoria menos las reservas pendientes del 2PC.
+
+    Permite responder PREPARE_TRANSFER sin consultar PostgreSQL y, a
+    diferencia del chequeo por SELECT, dos PREPARE concurrentes sobre la
+    misma cuenta no pueden gastar el mismo saldo: el segundo ve el saldo
+    disponible ya descontado por la reserva del primero.
+
+    El ledger puede quedar desfasado por escrituras externas (p. ej. los
+    `UPDATE Cuentas SET saldo = saldo + ?` del NodoWorker Java o del
+    ServidorCentral). Por eso una cuenta desconocida se carga bajo demanda,
+    un saldo insuficiente se revalida contra la BD antes de rechazar y el
+    worker relee todos los saldos periódicamente: un débito externo puede
+    pasar inadvertido como mucho durante ese intervalo, y en ese caso el
+    CHECK (saldo >= 0) de la tabla frena el COMMIT.
+
+    Para que una relectura no pise un COMMIT propio que la BD aún no
+    reflejaba, cada COMMIT sube una versión (`snapshot()`) y `update()`
+    ignora las cuentas modificadas después de la versión leída antes del
+    SELECT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._balances = {}  # id_cuenta -> saldo confirmado en BD
+        self._reserved = {}  # id_cuenta -> total reservado por tx preparadas
+        self._reservations = {}  # tx_id -> [(id_cuenta, monto)]
+        self._version = 0  # COMMIT aplicados
+        self._changed = {}  # id_cuenta -> versión de su último COMMIT
+        self._stats = {"reserves": 0, "refused": 0, "refreshes": 0, "drifted": 0}
+
+    def load(self, rows):
+        """Carga (id_cuenta, saldo) de la partición reemplazando lo anterior."""
+        balances = {int(acc): _dec(saldo) for acc, saldo in rows}
+        with self._lock:
+            self._balances = balances
+
+    def snapshot(self):
+        """Versión a tomar antes de leer saldos de la BD para `update()`."""
+        with self._lock:
+            return self._version
+
+    def update(self, rows, version=None):
+        """Inserta o refresca saldos leídos de la BD (cuentas nuevas o desfasadas).
+
+        Con `version`, salta las cuentas con un COMMIT posterior: su saldo
+        en memoria ya es más reciente que el leído. Devuelve cuántos saldos
+        conocidos cambiaron.
+        """
+        drifted = 0
+        with self._lock:
+            for acc, saldo in rows:
+                acc, saldo = int(acc), _dec(saldo)
+                if version is not None and self._changed.get(acc, 0) > version:
+                    continue
+                previous = self._balances.get(acc)
+                if previous is not None and previous != saldo:
+                    drifted += 1
+                self._balances[acc] = saldo
+            self._stats["refreshes"] += 1
+            self._stats["drifted"] += drifted
+        return drifted
+
+    def owns(self, account):
+        with self._lock:
+            return account in self._balances
+
+    def missing(self, accounts):
+        """Devuelve las cuentas de `accounts` que el ledger aún no conoce."""
+        with self._lock:
+            return [acc for acc in accounts if acc not in self._balances]
+
+    def available(self, account):
+        with self._lock:
+            return self._available(account)
+
+    def _available(self, account):
+        return self._balances[account] - self._reserved.get(account, Decimal(0))
+
+    def reserve(self, tx_id, account, amount):
+        """Reserva `amount` de `account` para `tx_id` si hay saldo disponible."""
+        amount = _dec(amount)
+        with self._lock:
+            if account not in self._balances:
+                return NO_PERTENECE
+            if self._available(account) < amount:
+                self._stats["refused"] += 1
+                return SALDO_INSUFICIENTE
+            self._reserved[account] = self._reserved.get(account, Decimal(0)) + amount
+            self._reservations.setdefault(tx_id, []).append((account, amount))
+            self._stats["reserves"] += 1
+            return RESERVADO
+
+    def restore(self, prepared_ops):
+        """Vuelve a reservar los débitos de tx en duda (p. ej. tras replay del log)."""
+        for tx_id, ops in prepared_ops.items():
+            for op_type, acc, amount in ops:
+                if op_type == "debit":
+                    amount = _dec(amount)
+                    with self._lock:
+                        self._reserved[acc] = self._reserved.get(acc, Decimal(0)) + amount
+                        self._reservations.setdefault(tx_id, []).append((acc, amount))
+
+    def release(self, tx_id):
+        """Libera las reservas de una tx (ABORT o COMMIT fallido)."""
+        with self._lock:
+            self._release(tx_id)
+
+    def _release(self, tx_id):
+        for acc, amount in self._reservations.pop(tx_id, []):
+            remaining = self._reserved.get(acc, Decimal(0)) - amount
+            if remaining > 0:
+                self._reserved[acc] = remaining
+            else:
+                self._reserved.pop(acc, None)
+
+    def commit(self, tx_id, ops):
+        """Aplica al saldo confirmado las ops de una tx ya escrita en la BD."""
+        with self._lock:
+            self._release(tx_id)
+            self._version += 1
+            for op_type, acc, amount in ops:
+                if acc not in self._balances:
+                    continue
+                self._changed[acc] = self._version
+                if op_type == "debit":
+                    self._balances[acc] -= _dec(amount)
+                elif op_type == "credit":
+                    self._balances[acc] += _dec(amount)
+
+    def invalidate(self, accounts):
+        """Olvida saldos que pueden no coincidir con la BD; se recargan bajo demanda."""
+        with self._lock:
+            for acc in accounts:
+                self._balances.pop(acc, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["accounts"] = len(self._balances)
+            stats["pending_tx"] = len(self._reservations)
+            stats["reserved_total"] = float(sum(self._reserved.values(), Decimal(0)))
+        return stats
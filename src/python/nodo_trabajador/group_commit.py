@@ -0,0 +1,114 @@
+import time
+
+
+class GroupCommitter:
+    """Agrupa mensajes COMMIT del 2PC para aplicarlos en una sola transacción.
+
+    Los COMMIT que llegan dentro de una ventana de `window_ms` milisegundos
+    (o hasta juntar `max_batch`) se aplican con un único `conn.commit()`, y sus
+    entregas se confirman juntas con `basic_ack(multiple=True)`.
+
+    Se ejecuta siempre en el hilo de pika: el temporizador se programa con
+    `connection.call_later`, por lo que no necesita locks.
+    """
+
+    def __init__(self, connection, channel, apply_batch, window_ms=5.0, max_batch=64):
+        if max_batch < 1:
+            raise ValueError("max_batch debe ser >= 1")
+        self.connection = connection
+        self.channel = channel
+        self.apply_batch = apply_batch
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+
+        self._pending = []
+        self._pending_accounts = set()
+        self._pending_tx = set()
+        self._timer = None
+
+        self._stats = {
+            "batches": 0,
+            "commits": 0,
+            "max_batch_size": 0,
+            "total_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "size_triggered": 0,
+            "window_triggered": 0,
+        }
+
+    def submit(self, delivery_tag, tx_id, ops):
+        """Encola un COMMIT; la entrega se confirma cuando se aplique el lote."""
+        self._pending.append((delivery_tag, tx_id, ops))
+        self._pending_accounts.update(acc for _, acc, _ in ops)
+        self._pending_tx.add(tx_id)
+        if len(self._pending) >= self.max_batch:
+            self._stats["size_triggered"] += 1
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.connection.call_later(
+                self.window_ms / 1000.0, self._on_window
+            )
+
+    def is_pending(self, tx_id):
+        """True si la tx espera en el lote: ya no está preparada ni resuelta."""
+        return tx_id in self._pending_tx
+
+    def flush_if_touches(self, accounts):
+        """Aplica el lote antes de una lectura que dependa de sus cuentas.
+
+        Con `accounts=None` se vacía siempre (lecturas de toda la partición).
+        """
+        if not self._pending:
+            return
+        if accounts is None or not self._pending_accounts.isdisjoint(accounts):
+            self.flush()
+
+    def _on_window(self):
+        self._timer = None
+        if self._pending:
+            self._stats["window_triggered"] += 1
+            self.flush()
+
+    def flush(self):
+        """Aplica el lote pendiente y confirma sus entregas de una vez."""
+        if self._timer is not None:
+            self.connection.remove_timeout(self._timer)
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self._pending_accounts = set()
+        self._pending_tx = set()
+        start = time.monotonic()
+        try:
+            self.apply_batch([(tx_id, ops) for _, tx_id, ops in batch])
+        finally:
+            latency_ms = (time.monotonic() - start) * 1000
+            # La entrega se confirma aunque falle el commit: `apply_batch` deja
+            # las tx fallidas decididas y pendientes de reintento.
+            last_tag = max(tag for tag, _, _ in batch)
+            self.channel.basic_ack(delivery_tag=last_tag, multiple=True)
+            self._record(len(batch), latency_ms)
+
+    def _record(self, size, latency_ms):
+        stats = self._stats
+        stats["batches"] += 1
+        stats["commits"] += size
+        stats["total_latency_ms"] += latency_ms
+        stats["max_batch_size"] = max(stats["max_batch_size"], size)
+        stats["max_latency_ms"] = max(stats["max_latency_ms"], latency_ms)
+
+    def stats(self):
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["pending"] = len(self._pending)
+        stats["window_ms"] = self.window_ms
+        stats["max_batch"] = self.max_batch
+        stats["avg_batch_size"] = round(stats["commits"] / batches, 2) if batches else 0.0
+        stats["avg_latency_ms"] = (
+            round(stats["total_latency_ms"] / batches, 3) if batches else 0.0
+        )
+        stats["total_latency_ms"] = round(stats["total_latency_ms"], 3)
+        stats["max_latency_ms"] = round(stats["max_latency_ms"], 3)
+        return stats
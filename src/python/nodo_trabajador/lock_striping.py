@@ -0,0 +1,34 @@
+import threading
+from contextlib import contextmanager
+
+
+class StripedLocks:
+    """Locks particionados por id de cuenta.
+
+    Dos operaciones sólo se serializan si tocan cuentas que caen en la misma
+    franja. Las franjas se adquieren siempre en orden ascendente, así que una
+    transferencia A->B y otra B->A no pueden bloquearse mutuamente.
+    """
+
+    def __init__(self, stripes=64):
+        if stripes < 1:
+            raise ValueError("stripes debe ser >= 1")
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _stripe(self, account):
+        return hash(account) % self.stripes
+
+    @contextmanager
+    def locked(self, accounts):
+        """Adquiere las franjas de `accounts` (iterable de ids) en orden fijo."""
+        indices = sorted({self._stripe(acc) for acc in accounts})
+        acquired = []
+        try:
+            for idx in indices:
+                self._locks[idx].acquire()
+                acquired.append(idx)
+            yield
+        finally:
+            for idx in reversed(acquired):
+                self._locks[idx].release()
@@ -1,9 +1,41 @@
-import json
+import argparse
+import functools
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pika
-import psycopg2
-import psycopg2.extras
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+from src.python.common import codec
+from src.python.common.adaptive_prefetch import AdaptivePrefetch
+from src.python.common.async_log import DEBUG, INFO, LEVELS, WARNING, AsyncLogger
+from src.python.common.db_pool import ConnectionPool
+from src.python.nodo_trabajador.account_index import AccountIndex, read_partition_file
+from src.python.nodo_trabajador.async_consumer import AsyncioConsumer
+from src.python.nodo_trabajador.balance_cache import BalanceCache
+from src.python.nodo_trabajador.balance_ledger import (
+    NO_PERTENECE,
+    RESERVADO,
+    SALDO_INSUFICIENTE,
+    BalanceLedger,
+)
+from src.python.nodo_trabajador.group_commit import GroupCommitter
+from src.python.nodo_trabajador.lock_striping import StripedLocks
+from src.python.nodo_trabajador.partition_total import PartitionTotal
+from src.python.nodo_trabajador.prepare_log import PrepareLog
+from src.python.nodo_trabajador.prepared_expiry import PreparedExpiry
+from src.python.nodo_trabajador.recent_tx import (
+    ABORTED,
+    COMMITTED,
+    EXPIRED,
+    REFUSED,
+    RecentTxTable,
+)
+from src.python.nodo_trabajador import sql_banco
 
 # --- Configuración ---
 WORKER_EXCHANGE = "worker_exchange"
@@ -17,17 +49,358 @@ DB_CONFIG = {
     "port": "5432",
 }
 
+# Pool de conexiones compartido por todos los handlers del worker
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
+POOL_MAX_USES = 1000  # Reciclar la conexión tras N préstamos
+POOL_CHECKOUT_TIMEOUT = 5.0
+
+# Group commit: COMMITs dentro de la ventana (o hasta N) van en una sola transacción
+GROUP_COMMIT_WINDOW_MS = 5.0
+GROUP_COMMIT_MAX_BATCH = 64
+
+# SUM_PARTITION: cada cuánto se corrige el total incremental con un SUM(saldo) de la BD
+# (otros procesos también escriben en Cuentas). Cada corrección recorre la tabla,
+# así que por defecto no hay total incremental y SUM_PARTITION lee la BD
+PARTITION_TOTAL_RECONCILE = 0.0
+
+# Modo concurrente: mensajes en un pool de hilos, serializando sólo por cuenta
+CONCURRENT_THREADS = 8
+CONCURRENT_PREFETCH = 32
+ACCOUNT_LOCK_STRIPES = 64
+
+# Prefetch adaptativo (AIMD) según la latencia de los handlers y la saturación del pool
+ADAPTIVE_PREFETCH_MAX = 256
+ADAPTIVE_TARGET_LATENCY_MS = 50.0
+ADAPTIVE_INTERVAL = 0.5
+
+# Ledger: cada cuánto se releen todos los saldos de la BD. Acota cuánto tarda en
+# verse un débito de otro proceso (NodoWorker Java, ServidorCentral)
+LEDGER_REFRESH = 30.0
+
+# Índice de cuentas propias: cada cuánto se recarga (BD) o se revisa el fichero
+ACCOUNT_INDEX_REFRESH = 60.0
+
+# Log de PREPARE/COMMIT/ABORT para sobrevivir a reinicios entre fases del 2PC
+PREPARE_LOG_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../..", "data", "wal")
+)
+PREPARE_LOG_COMPACT_EVERY = 10000
+
+# Una tx preparada sin COMMIT/ABORT en este plazo se da por abandonada y se aborta.
+# Desactivado por defecto: abortar por plazo rompe el voto READY si el COMMIT llega tarde
+PREPARED_TIMEOUT = 0.0
+PREPARED_EXPIRY_CHECK = 1.0
+
+# COMMIT que la BD rechazó: ya están decididos, se reintentan cada N segundos
+COMMIT_RETRY_INTERVAL = 5.0
+
+# tx_id resueltas que se recuerdan para responder duplicados desde memoria
+RECENT_TX_MAX = 100000
+RECENT_TX_TTL = 600.0
+
+# Caché de saldos de CONSULTAR_CUENTA (el TTL acota el retraso ante escrituras externas)
+BALANCE_CACHE_SIZE = 100000
+BALANCE_CACHE_TTL = 1.0
+
+# Máximo de cuentas por CONSULTAR_CUENTAS_BATCH (RpcClient trocea listas mayores)
+QUERY_BATCH_MAX = 5000
+
 
 class NodoWorker:
-    def __init__(self, worker_id):
+    def __init__(
+        self,
+        worker_id,
+        group_commit=False,
+        group_commit_window_ms=GROUP_COMMIT_WINDOW_MS,
+        group_commit_max_batch=GROUP_COMMIT_MAX_BATCH,
+        concurrent=False,
+        threads=CONCURRENT_THREADS,
+        prefetch=CONCURRENT_PREFETCH,
+        partition_total_reconcile=PARTITION_TOTAL_RECONCILE,
+        prepare_log=False,
+        ledger=False,
+        ledger_refresh=LEDGER_REFRESH,
+        log_level=INFO,
+        log_sample=1.0,
+        async_mode=False,
+        shard=None,
+        shards=1,
+        balance_cache=False,
+        balance_cache_size=BALANCE_CACHE_SIZE,
+        balance_cache_ttl=BALANCE_CACHE_TTL,
+        dedup_file=False,
+        prepared_timeout=PREPARED_TIMEOUT,
+        adaptive_prefetch=False,
+        prefetch_max=ADAPTIVE_PREFETCH_MAX,
+        target_latency_ms=ADAPTIVE_TARGET_LATENCY_MS,
+        account_index=None,
+    ):
+        if group_commit and (concurrent or async_mode):
+            raise ValueError(
+                "El group commit no se puede combinar con los modos concurrente o asyncio"
+            )
+        if balance_cache and shards > 1:
+            # Los COMMIT de los otros procesos de la partición no invalidarían la caché
+            raise ValueError("La caché de saldos no se puede usar con varios procesos por partición")
+
         self.worker_id = worker_id
-        self.queue_name = f"worker_queue_{worker_id}"
+        self.shard = shard
+        self.shards = shards
+        # Con supervisor cada proceso atiende su sub-cola worker_queue_<id>.<shard>
+        suffix = f".{shard}" if shard is not None else ""
+        self.log = AsyncLogger(
+            f"Nodo-{worker_id}{suffix}", level=log_level, sample_rate=log_sample
+        )
+        self.queue_name = f"worker_queue_{worker_id}{suffix}"
+        file_prefix = f"nodo_{worker_id}_{shard}" if shard is not None else f"nodo_{worker_id}"
+        self.recent_tx = RecentTxTable(
+            RECENT_TX_MAX,
+            RECENT_TX_TTL,
+            path=os.path.join(PREPARE_LOG_DIR, f"{file_prefix}.recent") if dedup_file else None,
+        )
         self.prepared_ops = {}
-        self._init_rabbitmq()
+        self._commit_retry = {}  # tx_id -> ops con el COMMIT decidido pero sin aplicar
+        self.prepared_expiry = PreparedExpiry(prepared_timeout) if prepared_timeout else None
+        self.prepare_log = None
+        if prepare_log:
+            self.prepare_log = PrepareLog(
+                os.path.join(PREPARE_LOG_DIR, f"{file_prefix}.wal"),
+                compact_every=PREPARE_LOG_COMPACT_EVERY,
+            )
+            self.prepared_ops.update(self.prepare_log.replay())
+            decided = self.prepare_log.decided()
+            self._commit_retry.update((tx_id, self.prepared_ops[tx_id]) for tx_id in decided)
+            if self.prepared_expiry:
+                # Se desconoce su antigüedad: el plazo cuenta desde el arranque.
+                # Las que ya tienen el COMMIT decidido no pueden expirar.
+                self.prepared_expiry.track(
+                    tx_id for tx_id in self.prepared_ops if tx_id not in decided
+                )
+            print(
+                f"[Nodo-{worker_id}] ✓ Log de PREPARE recuperado: "
+                f"{len(self.prepared_ops)} tx en duda ({len(decided)} con COMMIT pendiente)",
+                flush=True,
+            )
+        self.db_pool = ConnectionPool(
+            DB_CONFIG,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_uses=POOL_MAX_USES,
+            checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+            connection_factory=sql_banco.PreparedConnection,
+        )
+        # Sin reconciliación, o si los demás procesos de la partición también
+        # confirman, el total incremental no basta y SUM_PARTITION lee la BD
+        self.partition_total = None
+        self._verify_lock = threading.Lock()
+        if partition_total_reconcile and shards == 1:
+            self.partition_total = PartitionTotal()
+            self._load_partition_total()
+            threading.Thread(
+                target=self._reconcile_loop,
+                args=(partition_total_reconcile,),
+                name=f"nodo-{worker_id}-partition-total",
+                daemon=True,
+            ).start()
+
+        # account_index: None, "db" o la ruta de cuentas_partN.txt de la partición
+        self.account_index = None
+        if account_index:
+            self.account_index = AccountIndex(account_index)
+            self._account_index_mtime = None
+            self._load_account_index()
+            threading.Thread(
+                target=self._account_index_loop,
+                name=f"nodo-{worker_id}-account-index",
+                daemon=True,
+            ).start()
+
+        self.ledger = None
+        if ledger:
+            self.ledger = BalanceLedger()
+            self._load_ledger()
+            if ledger_refresh:
+                threading.Thread(
+                    target=self._ledger_refresh_loop,
+                    args=(ledger_refresh,),
+                    name=f"nodo-{worker_id}-ledger",
+                    daemon=True,
+                ).start()
+
+        self.balance_cache = None
+        if balance_cache:
+            self.balance_cache = BalanceCache(balance_cache_size, balance_cache_ttl)
+
+        if self.prepared_expiry:
+            threading.Thread(
+                target=self._expiry_loop, name=f"nodo-{worker_id}-expiry", daemon=True
+            ).start()
+        threading.Thread(
+            target=self._commit_retry_loop, name=f"nodo-{worker_id}-commit-retry", daemon=True
+        ).start()
+
+        self.async_mode = async_mode
+        if not async_mode:
+            # En modo asyncio la conexión la abre AsyncioConsumer dentro de start()
+            self._init_rabbitmq()
+
+        self.group_committer = None
+        if group_commit:
+            self.group_committer = GroupCommitter(
+                self.connection,
+                self.channel,
+                self._commit_batch,
+                window_ms=group_commit_window_ms,
+                max_batch=group_commit_max_batch,
+            )
+
+        self.executor = None
+        self.prefetch = 1
+        if concurrent or async_mode:
+            # El prefetch acota los mensajes en vuelo y, por tanto, la cola del pool
+            self.executor = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix=f"nodo-{worker_id}"
+            )
+            self.account_locks = StripedLocks(ACCOUNT_LOCK_STRIPES)
+            self.prefetch = max(prefetch, threads)
+        elif self.group_committer:
+            # Con group commit hace falta tener varios COMMIT sin confirmar a la vez
+            self.prefetch = self.group_committer.max_batch
+        elif self.prepare_log:
+            # Varias entregas en vuelo para que sus PREPARE compartan un fsync
+            self.prefetch = prefetch
+
+        # En el hilo de pika los PREPARE de un mismo lote de entregas esperan
+        # juntos al fsync del log (ver `_flush_prepares`)
+        self._wal_pending = [] if self.prepare_log and self.executor is None else None
+        self._wal_lsn = 0
+        self._wal_timer = None
+
+        self.prefetch_ctl = None
+        if adaptive_prefetch:
+            # El prefetch fijo pasa a ser el valor inicial; nunca por debajo de un lote
+            self.prefetch_ctl = AdaptivePrefetch(
+                self.prefetch,
+                minimum=self.group_committer.max_batch if self.group_committer else 1,
+                maximum=max(prefetch_max, self.prefetch),
+                target_latency_ms=target_latency_ms,
+            )
+
+    def _sum_from_db(self):
+        with self._get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                sql_banco.execute(cursor, "nw_suma_particion")
+                return cursor.fetchone()[0]
+
+    def _load_partition_total(self):
+        """Inicializa el total de la partición; si la BD no responde se reintenta en SUM_PARTITION."""
+        try:
+            self.partition_total.load(self._sum_from_db())
+        except Exception as e:
+            print(
+                f"[Nodo-{self.worker_id}] ✗ No se pudo cargar el total de la partición: {e}",
+                flush=True,
+            )
+
+    def _load_ledger(self):
+        """Carga los saldos de la partición y re-reserva las tx en duda."""
+        with self._get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                sql_banco.execute(cursor, "nw_saldos_particion")
+                self.ledger.load(cursor.fetchall())
+        self.ledger.restore(self.prepared_ops)
+        print(
+            f"[Nodo-{self.worker_id}] ✓ Ledger de saldos cargado: "
+            f"{self.ledger.stats()['accounts']} cuentas",
+            flush=True,
+        )
+
+    def _load_account_index(self):
+        """Carga el índice de cuentas propias desde la BD o el fichero de la partición."""
+        source = self.account_index.source
+        if source == "db":
+            with self._get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql_banco.execute(cursor, "nw_ids_particion")
+                    self.account_index.load(row[0] for row in cursor)
+        else:
+            mtime = os.path.getmtime(source)
+            if mtime == self._account_index_mtime:
+                return
+            self.account_index.load(read_partition_file(source))
+            self._account_index_mtime = mtime
+        stats = self.account_index.stats()
+        self.log.info(
+            "Índice de cuentas cargado",
+            source=source,
+            accounts=stats["accounts"],
+            memory_bytes=stats["memory_bytes"],
+        )
+
+    def _account_index_loop(self):
+        """Recoge las cuentas creadas después del arranque."""
+        while True:
+            time.sleep(ACCOUNT_INDEX_REFRESH)
+            try:
+                self._load_account_index()
+            except Exception as e:
+                self.log.error("Recargando el índice de cuentas", error=e)
+
+    def _owns(self, account):
+        """True si el índice dice que la cuenta es de este worker (o si no hay índice)."""
+        return self.account_index is None or account in self.account_index
+
+    def _confirm_owns(self, account):
+        """Como `_owns`, pero confirma las cuentas que no están en el índice.
+
+        Una cuenta creada después de la última carga no está en el índice
+        hasta la siguiente recarga; si no se comprobara, el PREPARE se
+        saltaría su abono o, peor, su débito y crearía dinero. Con el índice
+        cargado de la BD de la partición basta con que exista en ella (y se
+        añade al índice); con fichero manda el fichero, que se relee si
+        cambió, porque la BD puede tener cuentas de otras particiones.
+        """
+        if self._owns(account):
+            return True
+        if self.account_index.source != "db":
+            self._load_account_index()
+            return account in self.account_index
+        with self._get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                sql_banco.execute(cursor, "nw_existe_cuenta", (account,))
+                exists = cursor.fetchone()[0]
+        if exists:
+            self.account_index.add([account])
+        return exists
+
+    def _refresh_ledger(self, accounts):
+        """Relee de la BD el saldo de `accounts` (cuentas nuevas o desfasadas)."""
+        version = self.ledger.snapshot()
+        with self._get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                sql_banco.execute(cursor, "nw_saldos_cuentas", (list(accounts),))
+                self.ledger.update(cursor.fetchall(), version)
+
+    def _ledger_refresh_loop(self, interval):
+        """Recoge en el ledger las escrituras de otros procesos sobre Cuentas."""
+        while True:
+            time.sleep(interval)
+            try:
+                version = self.ledger.snapshot()
+                with self._get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        sql_banco.execute(cursor, "nw_saldos_particion")
+                        drifted = self.ledger.update(cursor.fetchall(), version)
+                self.log.log(
+                    INFO if drifted else DEBUG, "Ledger releído de la BD", drifted=drifted
+                )
+            except Exception as e:
+                self.log.error("Releyendo el ledger", error=e)
 
     def _get_db_connection(self):
-        """Establece y devuelve una conexión a la base de datos."""
-        return psycopg2.connect(**DB_CONFIG)
+        """Presta una conexión del pool (commit/rollback y devolución al salir del `with`)."""
+        return self.db_pool.connection()
 
     def _init_rabbitmq(self):
         """Inicializa la conexión y el canal de RabbitMQ con reintentos."""
@@ -86,194 +459,967 @@ class NodoWorker:
 
     def on_message(self, ch, method, props, body):
         """Callback que se ejecuta al recibir un mensaje."""
+        if self.executor is not None:
+            self.executor.submit(self._on_message_concurrent, ch, method, props, body)
+            return
+
+        ack_now = True
+        start = time.perf_counter()
+        req = {}
+        self._wal_lsn = 0
         try:
-            message = body.decode("utf-8")
-            print(f"[Nodo-{self.worker_id}] Mensaje recibido: {message}")
-            req = json.loads(message)
+            self.log.debug("Mensaje recibido", body=body)
+            req = codec.decode(body, props.content_type)
             req_type = req.get("type", "").upper()
 
-            response_data = None
-            if "PREPARE" in req_type:
-                response_data = self._handle_prepare(req)
-            elif req_type == "COMMIT":
-                self._handle_commit(req)
-            elif req_type == "ABORT":
-                self._handle_abort(req)
-            elif req_type == "CONSULTAR_CUENTA":
-                response_data = self._handle_query(req)
-            elif req_type == "SUM_PARTITION":
-                response_data = self._handle_sum(req)
-            else:
-                response_data = {"status": "ERROR", "error": "TIPO_DESCONOCIDO"}
+            if self.group_committer:
+                # Las lecturas deben ver los COMMIT que aún esperan en el lote
+                self.group_committer.flush_if_touches(self._accounts_read_by(req))
 
-            if props.reply_to and response_data:
-                ch.basic_publish(
-                    exchange="",
-                    routing_key=props.reply_to,
-                    properties=pika.BasicProperties(
-                        correlation_id=props.correlation_id
-                    ),
-                    body=json.dumps(response_data),
-                )
-                print(
-                    f"[Nodo-{self.worker_id}] Respuesta enviada: {json.dumps(response_data)}"
-                )
+            if req_type == "COMMIT" and self.group_committer:
+                # Su ack múltiple no debe adelantarse al de los PREPARE aplazados
+                self._flush_prepares()
+                tx_id = req.get("tx_id")
+                ops = self.prepared_ops.pop(tx_id, None)
+                if ops is not None:
+                    self.group_committer.submit(method.delivery_tag, tx_id, ops)
+                    ack_now = False
+                else:
+                    self._commit_unprepared(tx_id)
+                return
+
+            response_data = self._dispatch(req)
+            if self._wal_lsn:
+                self._defer_until_durable(ch, method.delivery_tag, props, response_data)
+                ack_now = False
+            elif props.reply_to and response_data:
+                self._reply(ch, props, response_data)
 
-        except json.JSONDecodeError:
-            print(f"[Nodo-{self.worker_id}] [ERROR] JSON mal formado: {body.decode()}")
+        except codec.CodecError:
+            self.log.error("Mensaje mal formado", body=body)
         except Exception as e:
-            print(f"[Nodo-{self.worker_id}] [ERROR] Inesperado: {e}")
+            self.log.error("Inesperado", error=e, tx_id=req.get("tx_id"))
         finally:
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            if ack_now:
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+            self._log_processed(req, start)
+
+    def _defer_until_durable(self, ch, delivery_tag, props, response_data):
+        """Aplaza respuesta y ack de un PREPARE hasta el fsync del lote en curso."""
+        self._wal_pending.append((self._wal_lsn, ch, delivery_tag, props, response_data))
+        self._wal_lsn = 0
+        if self._wal_timer is None:
+            # Los temporizadores de pika corren tras despachar las entregas ya recibidas
+            self._wal_timer = self.connection.call_later(0, self._on_wal_timer)
+
+    def _on_wal_timer(self):
+        self._wal_timer = None
+        self._flush_prepares()
+
+    def _flush_prepares(self):
+        """Un solo fsync para los PREPARE aplazados; después, sus respuestas y acks."""
+        if self._wal_timer is not None:
+            self.connection.remove_timeout(self._wal_timer)
+            self._wal_timer = None
+        if not self._wal_pending:
+            return
+
+        batch, self._wal_pending = self._wal_pending, []
+        try:
+            self.prepare_log.sync(max(entry[0] for entry in batch))
+        except Exception as e:
+            self.log.error("Fallo en fsync del log de PREPARE", batch_size=len(batch), error=e)
+            batch = [
+                (lsn, ch, tag, props, self._unprepare(response_data["tx_id"], e))
+                for lsn, ch, tag, props, response_data in batch
+            ]
+        for _, ch, delivery_tag, props, response_data in batch:
+            self._finish_concurrent(ch, delivery_tag, props, response_data)
+
+    def _unprepare(self, tx_id, error):
+        """Deshace un PREPARE que no llegó a ser durable y devuelve la respuesta de error."""
+        if self.prepared_ops.pop(tx_id, None) is not None:
+            if self.ledger:
+                self.ledger.release(tx_id)
+            if self.prepared_expiry:
+                self.prepared_expiry.forget([tx_id])
+        return {"status": "ERROR", "tx_id": tx_id, "error": str(error)}
+
+    def _on_message_concurrent(self, ch, method, props, body):
+        """Procesa un mensaje en el pool de hilos (modo --concurrent).
+
+        La respuesta y el ack vuelven al hilo de pika, que es el dueño del canal.
+        """
+        response_data = self._process_locked(body, props.content_type)
+        self.connection.add_callback_threadsafe(
+            functools.partial(
+                self._finish_concurrent, ch, method.delivery_tag, props, response_data
+            )
+        )
+
+    def _process_locked(self, body, content_type=None):
+        """Ejecuta un mensaje serializando sólo las operaciones sobre las mismas cuentas.
+
+        Lo usan los modos --concurrent y --async desde el pool de hilos.
+        """
+        response_data = None
+        start = time.perf_counter()
+        req = {}
+        try:
+            self.log.debug("Mensaje recibido", body=body)
+            req = codec.decode(body, content_type)
+            with self.account_locks.locked(self._accounts_locked_by(req)):
+                response_data = self._dispatch(req)
+        except codec.CodecError:
+            self.log.error("Mensaje mal formado", body=body)
+        except Exception as e:
+            self.log.error("Inesperado", error=e, tx_id=req.get("tx_id"))
+        finally:
+            self._log_processed(req, start)
+        return response_data
+
+    def _finish_concurrent(self, ch, delivery_tag, props, response_data):
+        """Publica la respuesta y confirma la entrega desde el hilo (o loop) de pika."""
+        try:
+            if props.reply_to and response_data:
+                self._reply(ch, props, response_data)
+        except Exception as e:
+            self.log.error("Al responder", error=e)
+        finally:
+            ch.basic_ack(delivery_tag=delivery_tag)
+
+    def _log_processed(self, req, start):
+        """Registro muestreado por mensaje: tipo, tx y latencia del handler."""
+        latency_ms = (time.perf_counter() - start) * 1000
+        if self.prefetch_ctl:
+            self.prefetch_ctl.observe(latency_ms)
+        self.log.info(
+            "Procesado",
+            sampled=True,
+            type=req.get("type"),
+            tx_id=req.get("tx_id"),
+            latency_ms=latency_ms,
+        )
+
+    def _dispatch(self, req):
+        """Ejecuta el handler del tipo de mensaje y devuelve la respuesta (o None)."""
+        req_type = req.get("type", "").upper()
+        if "PREPARE" in req_type:
+            return self._handle_prepare(req)
+        elif req_type == "COMMIT":
+            self._handle_commit(req)
+        elif req_type == "ABORT":
+            self._handle_abort(req)
+        elif req_type == "CONSULTAR_CUENTA":
+            return self._handle_query(req)
+        elif req_type == "CONSULTAR_CUENTAS_BATCH":
+            return self._handle_query_batch(req)
+        elif req_type == "SUM_PARTITION":
+            return self._handle_sum(req)
+        elif req_type == "STATS":
+            return self._handle_stats(req)
+        else:
+            return {"status": "ERROR", "error": "TIPO_DESCONOCIDO"}
+        return None
+
+    def _reply(self, ch, props, response_data):
+        # Se responde en el formato de la petición (JSON para el ServidorCentral)
+        reply_codec = codec.for_content_type(props.content_type)
+        body = reply_codec.encode(response_data)
+        ch.basic_publish(
+            exchange="",
+            routing_key=props.reply_to,
+            properties=pika.BasicProperties(
+                correlation_id=props.correlation_id,
+                content_type=reply_codec.content_type,
+            ),
+            body=body,
+        )
+        self.log.debug("Respuesta enviada", body=body)
+
+    def _accounts_locked_by(self, req):
+        """Cuentas cuyas franjas debe bloquear un mensaje en modo concurrente."""
+        if req.get("type", "").upper() == "COMMIT":
+            ops = self.prepared_ops.get(req.get("tx_id"), [])
+            return {acc for _, acc, _ in ops}
+        return self._accounts_read_by(req) or set()
+
+    def _accounts_read_by(self, req):
+        """Cuentas que lee un mensaje; None si lee toda la partición."""
+        req_type = req.get("type", "").upper()
+        try:
+            if "PREPARE" in req_type:
+                return {int(req["from"]), int(req["to"])}
+            if req_type == "CONSULTAR_CUENTA":
+                return {int(req["account"])}
+            if req_type == "CONSULTAR_CUENTAS_BATCH":
+                return {int(acc) for acc in req["accounts"]}
+        except (KeyError, TypeError, ValueError):
+            return None  # El handler responderá el error; por si acaso se vacía todo
+        if req_type == "SUM_PARTITION":
+            return None
+        return set()
+
+    def _duplicate_prepare(self, tx_id):
+        """Respuesta desde memoria a un PREPARE reentregado; None si la tx es nueva."""
+        if not isinstance(tx_id, (str, int)):
+            return None
+        if tx_id in self.prepared_ops or (
+            self.group_committer and self.group_committer.is_pending(tx_id)
+        ):
+            # Preparada o con el COMMIT esperando en el lote del group commit
+            self.recent_tx.note_duplicate()
+            return {"status": "READY", "tx_id": tx_id}
+        outcome = self.recent_tx.seen(tx_id)
+        if outcome == COMMITTED:
+            return {"status": "READY", "tx_id": tx_id}
+        if outcome == REFUSED:
+            return {"status": "ERROR", "tx_id": tx_id, "error": "Saldo insuficiente"}
+        if outcome in (ABORTED, EXPIRED):
+            return {"status": "ERROR", "tx_id": tx_id, "error": "TX_ABORTADA"}
+        return None
+
+    def _refuse(self, tx_id):
+        self.recent_tx.record([tx_id], REFUSED)
+        return {"status": "ERROR", "tx_id": tx_id, "error": "Saldo insuficiente"}
 
     def _handle_prepare(self, req):
         tx_id = req.get("tx_id")
+        duplicate = self._duplicate_prepare(tx_id)
+        if duplicate:
+            return duplicate
+        if self.ledger:
+            return self._handle_prepare_ledger(req)
         try:
             req_type = req.get("type", "").lower()
             ops_to_prepare = []
 
+            if "transfer" in req_type:
+                from_acc, to_acc, amount = (
+                    int(req["from"]),
+                    int(req["to"]),
+                    float(req["amount"]),
+                )
+                saldo_origen, existe_destino = self._prepare_lookup(from_acc, to_acc)
+
+                # Si la cuenta de origen está en este nodo, verificar saldo
+                if saldo_origen is not None and saldo_origen < amount:
+                    return self._refuse(tx_id)
+
+                if saldo_origen is not None:
+                    ops_to_prepare.append(("debit", from_acc, amount))
+
+                if existe_destino:
+                    ops_to_prepare.append(("credit", to_acc, amount))
+
+            self._log_prepare(tx_id, ops_to_prepare)
+            self._mark_prepared(tx_id, ops_to_prepare)
+            return {"status": "READY", "tx_id": tx_id}
+        except Exception as e:
+            return {"status": "ERROR", "tx_id": tx_id, "error": str(e)}
+
+    def _prepare_lookup(self, from_acc, to_acc):
+        """(saldo de origen o None, existe el destino) de un PREPARE_TRANSFER.
+
+        Con índice de cuentas la propiedad se resuelve en memoria y sólo se
+        lee de la BD el saldo de un origen propio; las cuentas que no están
+        en el índice se confirman con `_confirm_owns`, porque pueden haberse
+        creado después de la última carga. Sin índice, las dos cosas en un
+        solo viaje.
+        """
+        if self.account_index is not None:
+            owns_to = self._confirm_owns(to_acc)
+            if not self._confirm_owns(from_acc):
+                return None, owns_to
             with self._get_db_connection() as conn:
                 with conn.cursor() as cursor:
-                    if "transfer" in req_type:
-                        from_acc, to_acc, amount = (
-                            int(req["from"]),
-                            int(req["to"]),
-                            float(req["amount"]),
-                        )
-
-                        # Verificar si la cuenta de origen pertenece a este nodo y si tiene saldo
-                        cursor.execute(
-                            "SELECT saldo FROM Cuentas WHERE id_cuenta = %s",
-                            (from_acc,),
-                        )
-                        result = cursor.fetchone()
-                        if result and result[0] < amount:
-                            return {
-                                "status": "ERROR",
-                                "tx_id": tx_id,
-                                "error": "Saldo insuficiente",
-                            }
-
-                        if result:  # La cuenta de origen está en este nodo
-                            ops_to_prepare.append(("debit", from_acc, amount))
-
-                        # Verificar si la cuenta de destino pertenece a este nodo
-                        cursor.execute(
-                            "SELECT 1 FROM Cuentas WHERE id_cuenta = %s", (to_acc,)
-                        )
-                        if cursor.fetchone():
-                            ops_to_prepare.append(("credit", to_acc, amount))
-
-            self.prepared_ops[tx_id] = ops_to_prepare
+                    sql_banco.execute(cursor, "nw_saldo_cuenta", (from_acc,))
+                    row = cursor.fetchone()
+            return (row[0] if row else None), owns_to
+
+        with self._get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                sql_banco.execute(cursor, "nw_prepare_transfer", (from_acc, to_acc))
+                return cursor.fetchone()
+
+    def _handle_prepare_ledger(self, req):
+        """PREPARE contra el ledger en memoria: reserva fondos sin tocar la BD."""
+        tx_id = req.get("tx_id")
+        try:
+            ops_to_prepare = []
+            if "transfer" in req.get("type", "").lower():
+                from_acc, to_acc, amount = (
+                    int(req["from"]),
+                    int(req["to"]),
+                    float(req["amount"]),
+                )
+                # Con índice, una cuenta ajena no se carga en el ledger
+                owns_from = self._confirm_owns(from_acc)
+                owns_to = self._confirm_owns(to_acc)
+                owned = [from_acc] if owns_from else []
+                if owns_to:
+                    owned.append(to_acc)
+                missing = self.ledger.missing(owned)
+                if missing:
+                    self._refresh_ledger(missing)
+
+                result = (
+                    self.ledger.reserve(tx_id, from_acc, amount)
+                    if owns_from
+                    else NO_PERTENECE
+                )
+                if result == SALDO_INSUFICIENTE:
+                    # Puede haber créditos externos aún no vistos: revalidar una vez
+                    self._refresh_ledger([from_acc])
+                    result = self.ledger.reserve(tx_id, from_acc, amount)
+                if result == SALDO_INSUFICIENTE:
+                    return self._refuse(tx_id)
+                if result == RESERVADO:
+                    ops_to_prepare.append(("debit", from_acc, amount))
+                if owns_to and self.ledger.owns(to_acc):
+                    ops_to_prepare.append(("credit", to_acc, amount))
+
+            try:
+                self._log_prepare(tx_id, ops_to_prepare)
+            except Exception:
+                self.ledger.release(tx_id)
+                raise
+            self._mark_prepared(tx_id, ops_to_prepare)
             return {"status": "READY", "tx_id": tx_id}
         except Exception as e:
             return {"status": "ERROR", "tx_id": tx_id, "error": str(e)}
 
+    def _log_prepare(self, tx_id, ops):
+        """Registra el PREPARE en el log; READY sólo cuando sea durable.
+
+        Un PREPARE sin ops no deja nada que rehacer y no se registra. En el
+        hilo de pika no se espera al fsync aquí: `on_message` aplaza la
+        respuesta hasta `_flush_prepares`.
+        """
+        if not self.prepare_log or not ops:
+            return
+        if self._wal_pending is None:
+            self.prepare_log.log_prepare(tx_id, ops)
+        else:
+            self._wal_lsn = self.prepare_log.log_prepare(tx_id, ops, sync=False)
+
+    def _mark_prepared(self, tx_id, ops):
+        self.prepared_ops[tx_id] = ops
+        if self.prepared_expiry:
+            self.prepared_expiry.track([tx_id])
+
     def _handle_commit(self, req):
         tx_id = req.get("tx_id")
-        if tx_id not in self.prepared_ops:
+        # pop atómico: el hilo de expiración puede abortar la tx a la vez
+        ops = self.prepared_ops.pop(tx_id, None)
+        if ops is None:
+            self._commit_unprepared(tx_id)
             return
 
-        ops = self.prepared_ops.pop(tx_id, [])
         try:
             with self._get_db_connection() as conn:
                 with conn.cursor() as cursor:
-                    for op_type, acc, amount in ops:
-                        if op_type == "debit":
-                            cursor.execute(
-                                "UPDATE Cuentas SET saldo = saldo - %s WHERE id_cuenta = %s",
-                                (amount, acc),
-                            )
-                            cursor.execute(
-                                "INSERT INTO Transacciones(id_cuenta, tipo_transaccion, monto) VALUES (%s, %s, %s)",
-                                (acc, "DEBITO", -amount),
-                            )
-                        elif op_type == "credit":
-                            cursor.execute(
-                                "UPDATE Cuentas SET saldo = saldo + %s WHERE id_cuenta = %s",
-                                (amount, acc),
-                            )
-                            cursor.execute(
-                                "INSERT INTO Transacciones(id_cuenta, tipo_transaccion, monto) VALUES (%s, %s, %s)",
-                                (acc, "CREDITO", amount),
-                            )
+                    self._apply_ops(cursor, [ops])
                     conn.commit()
         except Exception as e:
-            print(f"[Nodo-{self.worker_id}] [ERROR] Fallo en commit: {e}")
+            self._commit_failed(tx_id, ops, e)
+            return
+        self._committed([(tx_id, ops)])
+
+    def _commit_unprepared(self, tx_id):
+        """COMMIT de una tx que no está preparada.
+
+        Si ya se confirmó es un duplicado y no hay nada que hacer, sin tocar
+        la BD. Si se abortó, el coordinador y este worker discrepan sobre el
+        resultado: no se puede arreglar aquí, pero no debe pasar en silencio.
+        """
+        outcome = self.recent_tx.seen(tx_id)
+        if outcome == EXPIRED:
+            if self.prepared_expiry:
+                self.prepared_expiry.note_late_commit()
+            self.log.error("COMMIT de una tx abortada por plazo vencido", tx_id=tx_id)
+        elif outcome == ABORTED:
+            self.log.error("COMMIT de una tx ya abortada", tx_id=tx_id)
+
+    def _commit_batch(self, batch):
+        """Aplica un lote de (tx_id, ops) en una sola transacción.
+
+        Si el lote falla (p. ej. un débito viola el CHECK de saldo), se
+        reintenta tx por tx para que un commit inválido no arrastre al resto;
+        las que vuelven a fallar quedan pendientes de reintento (ver `_commit_failed`).
+        """
+        try:
+            with self._get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    self._apply_ops(cursor, [ops for _, ops in batch])
+        except Exception as e:
+            self.log.error(
+                "Fallo en commit agrupado, reintentando individualmente",
+                batch_size=len(batch),
+                error=e,
+            )
+        else:
+            # Fuera del try: el lote ya está en la BD y no debe reintentarse
+            self._committed(batch)
+            return
+
+        for tx_id, ops in batch:
+            try:
+                with self._get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        self._apply_ops(cursor, [ops])
+            except Exception as e:
+                self._commit_failed(tx_id, ops, e)
+            else:
+                self._committed([(tx_id, ops)])
+
+    def _committed(self, batch):
+        """Da por confirmadas las tx de `batch`, ya escritas en la BD."""
+        self._log_resolved([tx_id for tx_id, _ in batch], committed=True)
+        for tx_id, ops in batch:
+            try:
+                self._after_commit(tx_id, ops)
+            except Exception as e:
+                self.log.error("Fallo reflejando el commit en memoria", tx_id=tx_id, error=e)
+                self._ledger_failed(tx_id, ops)
+
+    def _commit_failed(self, tx_id, ops, error):
+        """Deja pendiente de reintento una tx cuyo COMMIT no llegó a la BD.
+
+        La entrega del COMMIT ya se confirmó a RabbitMQ, así que nadie lo
+        reenviará: la tx vuelve a `prepared_ops` (conserva sus reservas del
+        ledger), deja de expirar y `_commit_retry_loop` la reintenta hasta
+        que la BD la acepte. El registro DECIDED del log hace que el replay
+        tras un reinicio la reintente en lugar de abortarla.
+        """
+        self.log.error("Fallo en commit, se reintentará", tx_id=tx_id, error=error)
+        self.prepared_ops[tx_id] = ops
+        if self.prepared_expiry:
+            self.prepared_expiry.forget([tx_id])
+        if self.prepare_log:
+            try:
+                self.prepare_log.log_decided([tx_id])
+            except Exception as e:
+                self.log.error("Registrando el COMMIT decidido", tx_id=tx_id, error=e)
+        self._commit_retry[tx_id] = ops
+
+    def _commit_retry_loop(self):
+        """Reintenta los COMMIT decididos que la BD rechazó."""
+        while True:
+            time.sleep(COMMIT_RETRY_INTERVAL)
+            for tx_id in list(self._commit_retry):
+                # Si falla otra vez, _commit_failed la vuelve a encolar
+                if self._commit_retry.pop(tx_id, None) is None:
+                    continue
+                req = {"type": "COMMIT", "tx_id": tx_id}
+                try:
+                    if self.executor is not None:
+                        with self.account_locks.locked(self._accounts_locked_by(req)):
+                            self._handle_commit(req)
+                    else:
+                        self._handle_commit(req)
+                except Exception as e:
+                    self.log.error("Reintentando commit", tx_id=tx_id, error=e)
+
+    def _after_commit(self, tx_id, ops):
+        """Refleja en memoria una tx ya confirmada en la BD."""
+        if self.partition_total:
+            self.partition_total.apply(ops)
+        if self.balance_cache:
+            self.balance_cache.apply(ops)
+        if self.ledger:
+            self.ledger.commit(tx_id, ops)
+
+    def _ledger_failed(self, tx_id, ops):
+        if self.balance_cache:
+            self.balance_cache.invalidate(acc for _, acc, _ in ops)
+        if self.ledger:
+            # El estado en memoria quedó a medias: liberar y recargar esas cuentas bajo demanda
+            self.ledger.release(tx_id)
+            self.ledger.invalidate(acc for _, acc, _ in ops)
+
+    def _log_resolved(self, tx_ids, committed, outcome=None):
+        self.recent_tx.record(tx_ids, outcome or (COMMITTED if committed else ABORTED))
+        if self.prepared_expiry:
+            self.prepared_expiry.forget(tx_ids)
+        if self.prepare_log:
+            self.prepare_log.log_resolved(tx_ids, committed=committed)
+
+    def _apply_ops(self, cursor, ops_list):
+        """Aplica las operaciones de varias tx en un solo viaje a la BD."""
+        sql_banco.aplicar_ops(cursor, ops_list)
 
     def _handle_abort(self, req):
         tx_id = req.get("tx_id")
-        self.prepared_ops.pop(tx_id, None)
+        if not isinstance(tx_id, (str, int)):
+            return
+        if self._abort_prepared(tx_id):
+            return
+        if self.recent_tx.seen(tx_id) is None:
+            # ABORT antes que su PREPARE: recordarlo para rechazar el PREPARE tardío
+            self.recent_tx.record([tx_id], ABORTED)
+
+    def _abort_prepared(self, tx_id, outcome=ABORTED):
+        """Aborta una tx preparada; False si ya no lo estaba (p. ej. la confirmó otro hilo)."""
+        if self.prepared_ops.pop(tx_id, None) is None:
+            return False
+        if self.ledger:
+            self.ledger.release(tx_id)
+        self._log_resolved([tx_id], committed=False, outcome=outcome)
+        return True
+
+    def _expiry_loop(self):
+        """Aborta las tx preparadas cuyo coordinador no respondió a tiempo."""
+        while True:
+            time.sleep(PREPARED_EXPIRY_CHECK)
+            try:
+                expired = [
+                    tx_id
+                    for tx_id in self.prepared_expiry.pop_expired()
+                    if self._abort_prepared(tx_id, outcome=EXPIRED)
+                ]
+                if expired:
+                    self.prepared_expiry.note_expired(len(expired))
+                    self.log.warning(
+                        "Tx preparadas abortadas por plazo vencido",
+                        count=len(expired),
+                        timeout_s=self.prepared_expiry.timeout,
+                        tx_ids=",".join(map(str, expired[:10])),
+                    )
+            except Exception as e:
+                self.log.error("Expirando tx preparadas", error=e)
 
     def _handle_query(self, req):
         acc = int(req["account"])
+        if self.balance_cache:
+            saldo = self.balance_cache.get(acc)
+            if saldo is not None:
+                return {"status": "OK", "account": acc, "balance": float(saldo)}
+            version = self.balance_cache.version()
         try:
             with self._get_db_connection() as conn:
-                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-                    cursor.execute("SELECT * FROM Cuentas WHERE id_cuenta = %s", (acc,))
+                with conn.cursor() as cursor:
+                    sql_banco.execute(cursor, "nw_saldo_cuenta", (acc,))
                     cuenta = cursor.fetchone()
                     if cuenta:
+                        if self.balance_cache:
+                            self.balance_cache.put(acc, cuenta[0], version)
                         return {
                             "status": "OK",
                             "account": acc,
-                            "balance": float(cuenta["saldo"]),
+                            "balance": float(cuenta[0]),
                         }
             return {"status": "ERROR", "error": "NO_EXISTE_CUENTA"}
         except Exception as e:
             return {"status": "ERROR", "error": str(e)}
 
-    def _handle_sum(self, req):
-        total_sum = 0
+    def _handle_query_batch(self, req):
+        """Saldos de varias cuentas con un solo `id_cuenta = ANY(...)`.
+
+        Responde `balances` (cuenta -> saldo; las claves JSON son texto) y
+        en `missing` las cuentas que no están en esta partición.
+        """
+        try:
+            accounts = sorted({int(acc) for acc in req["accounts"]})
+        except (KeyError, TypeError, ValueError):
+            return {"status": "ERROR", "error": "CUENTAS_INVALIDAS"}
+        if len(accounts) > QUERY_BATCH_MAX:
+            return {
+                "status": "ERROR",
+                "error": "LOTE_DEMASIADO_GRANDE",
+                "max": QUERY_BATCH_MAX,
+            }
         try:
             with self._get_db_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT SUM(saldo) FROM Cuentas")
-                    result = cursor.fetchone()
-                    if result and result[0] is not None:
-                        total_sum = float(result[0])
-            return {"status": "OK", "sum": total_sum}
+                    sql_banco.execute(cursor, "nw_saldos_cuentas", (accounts,))
+                    balances = {acc: float(saldo) for acc, saldo in cursor.fetchall()}
+            return {
+                "status": "OK",
+                "balances": balances,
+                "missing": [acc for acc in accounts if acc not in balances],
+            }
+        except Exception as e:
+            return {"status": "ERROR", "error": str(e)}
+
+    def _handle_sum(self, req):
+        try:
+            if self.partition_total is None:
+                return {"status": "OK", "sum": float(self._sum_from_db() or 0)}
+            if not self.partition_total.loaded:
+                self.partition_total.load(self._sum_from_db())
+            response = {"status": "OK", "sum": float(self.partition_total.value())}
+            if req.get("verify"):
+                response["verify"] = self._start_verify()
+            return response
         except Exception as e:
             return {"status": "ERROR", "error": str(e)}
 
+    def _start_verify(self):
+        """Lanza en segundo plano el recálculo del total contra la BD."""
+        if not self._verify_lock.acquire(blocking=False):
+            return "EN_CURSO"
+        threading.Thread(
+            target=self._verify_partition_total,
+            name=f"nodo-{self.worker_id}-verify",
+            daemon=True,
+        ).start()
+        return "PROGRAMADA"
+
+    def _reconcile_loop(self, interval):
+        """Corrige la deriva del total que dejan las escrituras de otros procesos."""
+        while True:
+            time.sleep(interval)
+            # Si hay una verificación pedida en curso, ya hace este trabajo
+            if self._verify_lock.acquire(blocking=False):
+                self._verify_partition_total(periodic=True)
+
+    def _verify_partition_total(self, attempts=3, periodic=False):
+        try:
+            for _ in range(attempts):
+                _, version = self.partition_total.snapshot()
+                drift = self.partition_total.reconcile(self._sum_from_db(), version)
+                if drift is None:
+                    continue  # Hubo COMMIT durante el SUM: repetir
+                # La deriva periódica es esperable (escrituras de otros procesos)
+                if periodic:
+                    level = INFO if drift else DEBUG
+                else:
+                    level = WARNING if drift else INFO
+                self.log.log(
+                    level,
+                    "Verificación de SUM_PARTITION",
+                    drift=drift,
+                )
+                return
+            self.log.log(
+                DEBUG if periodic else WARNING,
+                "Verificación de SUM_PARTITION no concluyente",
+                attempts=attempts,
+            )
+        except Exception as e:
+            self.log.error("Verificando SUM_PARTITION", error=e)
+        finally:
+            self._verify_lock.release()
+
+    def _handle_stats(self, req):
+        return {
+            "status": "OK",
+            "worker_id": self.worker_id,
+            "shard": self.shard,
+            "prepared": len(self.prepared_ops),
+            "commit_retry": len(self._commit_retry),
+            "recent_tx": self.recent_tx.stats(),
+            "prepared_expiry": self.prepared_expiry.stats() if self.prepared_expiry else None,
+            "prefetch": self.prefetch,
+            "adaptive_prefetch": self.prefetch_ctl.stats() if self.prefetch_ctl else None,
+            "concurrent": self.executor is not None,
+            "db_pool": self.db_pool.stats(),
+            "prepare_log": self.prepare_log.stats() if self.prepare_log else None,
+            "ledger": self.ledger.stats() if self.ledger else None,
+            "account_index": self.account_index.stats() if self.account_index else None,
+            "balance_cache": self.balance_cache.stats() if self.balance_cache else None,
+            "partition_total": self.partition_total.stats() if self.partition_total else None,
+            "log": self.log.stats(),
+            "group_commit": self.group_committer.stats()
+            if self.group_committer
+            else None,
+        }
+
+    def next_prefetch(self):
+        """Nuevo prefetch según el control adaptativo, o None si no cambia.
+
+        Lo llama periódicamente el hilo (o loop) dueño del canal, que aplica
+        el `basic_qos`.
+        """
+        new = self.prefetch_ctl.update(self.db_pool.stats()["saturation"])
+        if new is not None:
+            self.prefetch = new
+            self.log.debug("Prefetch ajustado", prefetch=new)
+        return new
+
+    def _adapt_prefetch(self):
+        new = self.next_prefetch()
+        if new is not None:
+            self.channel.basic_qos(prefetch_count=new)
+        self.connection.call_later(ADAPTIVE_INTERVAL, self._adapt_prefetch)
+
     def start(self):
         """Inicia el consumidor de RabbitMQ."""
-        self.channel.basic_qos(prefetch_count=1)
+        if self.async_mode:
+            self._start_async()
+            return
+
+        self.channel.basic_qos(prefetch_count=self.prefetch)
         self.channel.basic_consume(
             queue=self.queue_name, on_message_callback=self.on_message
         )
+        if self.prefetch_ctl:
+            self.connection.call_later(ADAPTIVE_INTERVAL, self._adapt_prefetch)
         try:
             self.channel.start_consuming()
         except KeyboardInterrupt:
             print("Cerrando conexión...")
+            if self._wal_pending is not None:
+                self._flush_prepares()
+            if self.group_committer:
+                self.group_committer.flush()
+            if self.executor:
+                self.executor.shutdown(wait=True)
+                # Entregar las respuestas y acks que dejaron encolados los hilos
+                self.connection.process_data_events(time_limit=0)
             self.connection.close()
+        finally:
+            self.db_pool.close()
+            if self.prepare_log:
+                self.prepare_log.close()
+            self.recent_tx.close()
+            self.log.close()
+
+    def _start_async(self):
+        consumer = AsyncioConsumer(
+            self,
+            WORKER_EXCHANGE,
+            process=self._process_locked,
+            finish=self._finish_concurrent,
+            adapt_interval=ADAPTIVE_INTERVAL if self.prefetch_ctl else None,
+        )
+        try:
+            consumer.run()
+        finally:
+            self.executor.shutdown(wait=True)
+            self.db_pool.close()
+            if self.prepare_log:
+                self.prepare_log.close()
+            self.recent_tx.close()
+            self.log.close()
+        if consumer.failed:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Uso: python3 src/python/nodo_trabajador/nodo_worker.py <worker-id>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Nodo trabajador Python de una partición del banco."
+    )
+    parser.add_argument("worker_id", type=int, help="ID del trabajador (cola worker_queue_<id>)")
+    parser.add_argument(
+        "--group-commit",
+        action="store_true",
+        help="Agrupar los COMMIT del 2PC en una sola transacción de BD",
+    )
+    parser.add_argument(
+        "--group-commit-window-ms",
+        type=float,
+        default=GROUP_COMMIT_WINDOW_MS,
+        help=f"Ventana de agrupación en ms (por defecto {GROUP_COMMIT_WINDOW_MS})",
+    )
+    parser.add_argument(
+        "--group-commit-max-batch",
+        type=int,
+        default=GROUP_COMMIT_MAX_BATCH,
+        help=f"Máximo de COMMIT por lote (por defecto {GROUP_COMMIT_MAX_BATCH})",
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Procesar mensajes en un pool de hilos con locks por cuenta",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=CONCURRENT_THREADS,
+        help=f"Hilos del modo concurrente (por defecto {CONCURRENT_THREADS})",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=CONCURRENT_PREFETCH,
+        help=f"Prefetch del modo concurrente y del secuencial con --wal (por defecto {CONCURRENT_PREFETCH})",
+    )
+    parser.add_argument(
+        "--adaptive-prefetch",
+        action="store_true",
+        help="Ajustar el prefetch (AIMD) según la latencia de los handlers y la saturación del pool",
+    )
+    parser.add_argument(
+        "--prefetch-max",
+        type=int,
+        default=ADAPTIVE_PREFETCH_MAX,
+        help=f"Prefetch máximo del modo adaptativo (por defecto {ADAPTIVE_PREFETCH_MAX})",
+    )
+    parser.add_argument(
+        "--target-latency-ms",
+        type=float,
+        default=ADAPTIVE_TARGET_LATENCY_MS,
+        help=f"Latencia de handler a partir de la cual se reduce el prefetch (por defecto {ADAPTIVE_TARGET_LATENCY_MS})",
+    )
+    parser.add_argument(
+        "--wal",
+        action="store_true",
+        help="Registrar PREPARE/COMMIT/ABORT en disco (data/wal) y recuperarlos al arrancar",
+    )
+    parser.add_argument(
+        "--partition-total-reconcile",
+        type=float,
+        default=PARTITION_TOTAL_RECONCILE,
+        help="Mantener un total incremental para SUM_PARTITION y corregirlo contra la BD "
+        "cada N segundos (por defecto 0: SUM_PARTITION lee siempre la BD)",
+    )
+    parser.add_argument(
+        "--ledger",
+        action="store_true",
+        help="Responder PREPARE desde un ledger de saldos en memoria con reservas",
+    )
+    parser.add_argument(
+        "--ledger-refresh",
+        type=float,
+        default=LEDGER_REFRESH,
+        help=f"Segundos entre relecturas completas del ledger (por defecto {LEDGER_REFRESH}; 0 = sólo bajo demanda)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=list(LEVELS),
+        default="INFO",
+        help="Nivel de log (DEBUG muestra cada mensaje y respuesta completos)",
+    )
+    parser.add_argument(
+        "--log-sample",
+        type=float,
+        default=1.0,
+        help="Fracción de mensajes procesados que se registran (0-1, por defecto 1)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="Usar el adaptador asyncio de pika (usa --threads y --prefetch para los mensajes en vuelo)",
+    )
+    parser.add_argument(
+        "--prepared-timeout",
+        type=float,
+        default=PREPARED_TIMEOUT,
+        help="Segundos tras los que se aborta una tx preparada sin COMMIT/ABORT "
+        "(por defecto 0 = nunca; un COMMIT posterior ya no se puede aplicar)",
+    )
+    parser.add_argument(
+        "--account-index",
+        nargs="?",
+        const="db",
+        default=None,
+        metavar="FICHERO",
+        help="Resolver en memoria qué cuentas son del worker en PREPARE; se cargan de la BD "
+        "o, si se indica, de data/particionN_replicaM/cuentas_partN.txt",
+    )
+    parser.add_argument(
+        "--dedup-file",
+        action="store_true",
+        help="Guardar en data/wal las tx resueltas recientes para detectar duplicados tras reiniciar",
+    )
+    parser.add_argument(
+        "--balance-cache",
+        action="store_true",
+        help="Responder CONSULTAR_CUENTA desde una caché LRU de saldos",
+    )
+    parser.add_argument(
+        "--balance-cache-size",
+        type=int,
+        default=BALANCE_CACHE_SIZE,
+        help=f"Cuentas en la caché de saldos (por defecto {BALANCE_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--balance-cache-ttl",
+        type=float,
+        default=BALANCE_CACHE_TTL,
+        help=f"Segundos que vive un saldo en la caché (por defecto {BALANCE_CACHE_TTL})",
+    )
+    parser.add_argument(
+        "--shard",
+        type=int,
+        default=None,
+        help="Sub-cola a atender (la asigna supervisor.py)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Procesos que comparten la partición (lo asigna supervisor.py; el estado "
+        "local de cada uno sólo cubre las cuentas de origen que le enruta)",
+    )
+    args = parser.parse_args()
+    if args.group_commit and (args.concurrent or args.async_mode):
+        parser.error("--group-commit no se puede combinar con --concurrent ni --async")
+    if args.balance_cache and args.shards > 1:
+        parser.error("--balance-cache no se puede usar con el supervisor multiproceso")
+    worker_id = args.worker_id
 
     try:
-        worker_id = int(sys.argv[1])
         print(
             f"[Nodo-{worker_id}] ========================================", flush=True
         )
         print(f"[Nodo-{worker_id}] Iniciando NodoWorker {worker_id}...", flush=True)
-        print(f"[Nodo-{worker_id}] Cola: worker_queue_{worker_id}", flush=True)
+        if args.shard is not None:
+            print(
+                f"[Nodo-{worker_id}] Cola: worker_queue_{worker_id}.{args.shard} "
+                f"(proceso {args.shard + 1}/{args.shards})",
+                flush=True,
+            )
+        else:
+            print(f"[Nodo-{worker_id}] Cola: worker_queue_{worker_id}", flush=True)
+        if args.group_commit:
+            print(
+                f"[Nodo-{worker_id}] Group commit: ventana {args.group_commit_window_ms} ms, "
+                f"lote máximo {args.group_commit_max_batch}",
+                flush=True,
+            )
+        if args.async_mode:
+            print(
+                f"[Nodo-{worker_id}] Modo asyncio: {args.threads} hilos, "
+                f"prefetch {args.prefetch}",
+                flush=True,
+            )
+        elif args.concurrent:
+            print(
+                f"[Nodo-{worker_id}] Modo concurrente: {args.threads} hilos, "
+                f"prefetch {args.prefetch}",
+                flush=True,
+            )
         print(
             f"[Nodo-{worker_id}] ========================================", flush=True
         )
 
-        worker = NodoWorker(worker_id)
+        worker = NodoWorker(
+            worker_id,
+            group_commit=args.group_commit,
+            group_commit_window_ms=args.group_commit_window_ms,
+            group_commit_max_batch=args.group_commit_max_batch,
+            concurrent=args.concurrent,
+            threads=args.threads,
+            prefetch=args.prefetch,
+            partition_total_reconcile=args.partition_total_reconcile,
+            prepare_log=args.wal,
+            ledger=args.ledger,
+            ledger_refresh=args.ledger_refresh,
+            log_level=LEVELS[args.log_level],
+            log_sample=args.log_sample,
+            async_mode=args.async_mode,
+            shard=args.shard,
+            shards=args.shards,
+            balance_cache=args.balance_cache,
+            balance_cache_size=args.balance_cache_size,
+            balance_cache_ttl=args.balance_cache_ttl,
+            dedup_file=args.dedup_file,
+            prepared_timeout=args.prepared_timeout,
+            adaptive_prefetch=args.adaptive_prefetch,
+            prefetch_max=args.prefetch_max,
+            target_latency_ms=args.target_latency_ms,
+            account_index=args.account_index,
+        )
         print(f"[Nodo-{worker_id}] ✓ Worker inicializado correctamente", flush=True)
         print(
             f"[Nodo-{worker_id}] Esperando mensajes... (Ctrl+C para detener)",
             flush=True,
         )
         worker.start()
-    except ValueError:
-        print("Error: El ID del trabajador debe ser un número entero.")
-        sys.exit(1)
     except KeyboardInterrupt:
         print(f"\n[Nodo-{worker_id}] Interrumpido por usuario", flush=True)
         sys.exit(0)
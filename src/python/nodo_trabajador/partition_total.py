@@ -0,0 +1,89 @@
+import threading
+import time
+from decimal import Decimal
+
+
+def _dec(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class PartitionTotal:
+    """Suma de saldos de la partición mantenida de forma incremental.
+
+    Se inicializa con un SUM(saldo) y después cada COMMIT de este proceso
+    aplica su delta neto, así SUM_PARTITION se responde en O(1). En
+    bd1_banco escriben también otros procesos (workers Java, desembolsos de
+    préstamos del ServidorCentral...) que no pasan por `apply()`: el worker
+    llama periódicamente a `reconcile()` con un SUM(saldo) de la BD, así
+    que el total puede ir como mucho un periodo de reconciliación por
+    detrás de esas escrituras.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = None  # None hasta la primera carga
+        self._version = 0  # Cambia con cada COMMIT aplicado
+        self._stats = {
+            "verifications": 0,
+            "inconclusive_verifications": 0,
+            "last_drift": 0.0,
+            "max_abs_drift": 0.0,
+            "last_verified_at": None,
+        }
+
+    @property
+    def loaded(self):
+        return self._total is not None
+
+    def load(self, total):
+        with self._lock:
+            self._total = _dec(total or 0)
+            self._version += 1
+
+    def value(self):
+        with self._lock:
+            return self._total
+
+    def apply(self, ops):
+        """Suma el delta neto de las ops de una tx ya confirmada en la BD."""
+        delta = Decimal(0)
+        for op_type, _, amount in ops:
+            if op_type == "debit":
+                delta -= _dec(amount)
+            elif op_type == "credit":
+                delta += _dec(amount)
+        with self._lock:
+            if self._total is not None:
+                self._total += delta
+            self._version += 1
+
+    def snapshot(self):
+        """(total, versión) para comparar con un SUM hecho en paralelo."""
+        with self._lock:
+            return self._total, self._version
+
+    def reconcile(self, db_total, version):
+        """Compara con un SUM(saldo) leído de la BD y corrige la deriva.
+
+        Si hubo COMMIT entre el snapshot y ahora la comparación no es
+        fiable: devuelve None y no toca el total.
+        """
+        db_total = _dec(db_total or 0)
+        with self._lock:
+            if version != self._version:
+                self._stats["inconclusive_verifications"] += 1
+                return None
+            # Si la carga inicial falló, la primera reconciliación hace de carga
+            drift = db_total - self._total if self._total is not None else Decimal(0)
+            self._total = db_total
+            self._stats["verifications"] += 1
+            self._stats["last_drift"] = float(drift)
+            self._stats["max_abs_drift"] = max(self._stats["max_abs_drift"], float(abs(drift)))
+            self._stats["last_verified_at"] = time.time()
+            return drift
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["total"] = float(self._total) if self._total is not None else None
+        return stats
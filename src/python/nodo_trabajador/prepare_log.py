@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+
+# Tipos de registro del log
+PREPARE = "P"
+DECIDED = "D"  # COMMIT recibido pero aún no aplicado en la BD
+COMMIT = "C"
+ABORT = "A"
+
+
+class PrepareLog:
+    """Log append-only en disco de las fases PREPARE/COMMIT/ABORT del 2PC.
+
+    - Cada registro es una línea JSON; un PREPARE no se confirma al
+      coordinador hasta que su registro está en disco.
+    - El fsync es agrupado: el primer hilo que necesita durabilidad hace un
+      único fsync que cubre todo lo escrito hasta ese momento, y el resto de
+      hilos que llegan mientras tanto esperan al siguiente. Un solo hilo
+      puede agrupar también: `log_prepare(..., sync=False)` y después un
+      `sync()` con el último número de secuencia.
+    - Al arrancar, `replay()` reconstruye las tx en duda (preparadas sin
+      COMMIT/ABORT). Las que además tienen un registro DECIDED ya recibieron
+      el COMMIT del coordinador: no se pueden abortar, sólo reintentar
+      (ver `decided()`). Cada `compact_every` registros el log se reescribe con
+      sólo esas tx y se reemplaza de forma atómica.
+    """
+
+    def __init__(self, path, compact_every=10000):
+        self.path = path
+        self.compact_every = compact_every
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._live = {}  # tx_id -> ops de las tx en duda
+        self._decided = set()  # tx en duda cuyo COMMIT ya se decidió
+        self._written_lsn = 0
+        self._synced_lsn = 0
+        self._syncing = False
+        self._since_compact = 0
+
+        self._stats = {
+            "records": 0,
+            "fsyncs": 0,
+            "fsync_total_ms": 0.0,
+            "compactions": 0,
+        }
+
+        self._file = None
+
+    def replay(self):
+        """Lee el log y devuelve {tx_id: ops} de las tx preparadas sin resolver.
+
+        Una última línea incompleta (escritura cortada por una caída) se ignora.
+        Debe llamarse una vez, antes de registrar nada.
+        """
+        live = {}
+        decided = set()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    kind, tx_id = record.get("k"), record.get("tx")
+                    if kind == PREPARE:
+                        live[tx_id] = [tuple(op) for op in record.get("ops", [])]
+                    elif kind == DECIDED:
+                        decided.add(tx_id)
+                    elif kind in (COMMIT, ABORT):
+                        live.pop(tx_id, None)
+                        decided.discard(tx_id)
+
+        with self._cond:
+            self._live = dict(live)
+            self._decided = decided & live.keys()
+            # Reescribir en limpio descarta registros resueltos y colas cortadas
+            self._rewrite()
+        return live
+
+    def _append(self, record):
+        """Escribe un registro (sin fsync) y devuelve su número de secuencia."""
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._written_lsn += 1
+        self._since_compact += 1
+        self._stats["records"] += 1
+        return self._written_lsn
+
+    def log_prepare(self, tx_id, ops, sync=True):
+        """Registra un PREPARE y espera a que sea durable.
+
+        Con `sync=False` no espera: devuelve el número de secuencia que hay
+        que pasar a `sync()` antes de responder READY.
+        """
+        with self._cond:
+            self._ensure_open()
+            self._live[tx_id] = [tuple(op) for op in ops]
+            lsn = self._append({"k": PREPARE, "tx": tx_id, "ops": ops})
+        if sync:
+            self.sync(lsn)
+        return lsn
+
+    def log_decided(self, tx_ids):
+        """Registra que el coordinador confirmó estas tx aunque aún no estén en la BD."""
+        lsn = 0
+        with self._cond:
+            self._ensure_open()
+            for tx_id in tx_ids:
+                if tx_id in self._live and tx_id not in self._decided:
+                    self._decided.add(tx_id)
+                    lsn = self._append({"k": DECIDED, "tx": tx_id})
+        if lsn:
+            self.sync(lsn)
+
+    def decided(self):
+        """tx_id en duda con el COMMIT ya decidido (tras `replay()`, a reintentar)."""
+        with self._cond:
+            return set(self._decided)
+
+    def log_resolved(self, tx_ids, committed=True):
+        """Registra el COMMIT o ABORT de una o varias tx con un solo fsync."""
+        kind = COMMIT if committed else ABORT
+        lsn = 0
+        with self._cond:
+            self._ensure_open()
+            for tx_id in tx_ids:
+                self._live.pop(tx_id, None)
+                self._decided.discard(tx_id)
+                lsn = self._append({"k": kind, "tx": tx_id})
+            if self.compact_every and self._since_compact >= self.compact_every:
+                self._compact_locked()
+        if lsn:
+            self.sync(lsn)
+
+    def sync(self, lsn):
+        """Bloquea hasta que el registro `lsn` esté en disco (fsync agrupado)."""
+        with self._cond:
+            while self._synced_lsn < lsn:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written_lsn
+                self._file.flush()
+                fd = self._file.fileno()
+                self._cond.release()
+                start = time.monotonic()
+                ok = False
+                try:
+                    os.fsync(fd)
+                    ok = True
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    if ok:
+                        self._synced_lsn = max(self._synced_lsn, target)
+                        self._stats["fsyncs"] += 1
+                        self._stats["fsync_total_ms"] += (time.monotonic() - start) * 1000
+                    self._cond.notify_all()
+
+    def _compact_locked(self):
+        while self._syncing:
+            self._cond.wait()
+        self._rewrite()
+        self._stats["compactions"] += 1
+
+    def _rewrite(self):
+        """Reescribe el log con sólo las tx en duda y lo reemplaza atómicamente."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for tx_id, ops in self._live.items():
+                f.write(
+                    json.dumps({"k": PREPARE, "tx": tx_id, "ops": ops}, separators=(",", ":"))
+                    + "\n"
+                )
+                if tx_id in self._decided:
+                    f.write(json.dumps({"k": DECIDED, "tx": tx_id}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._fsync_dir()
+
+        self._since_compact = 0
+        # Todo lo vivo quedó en disco con el fsync del fichero nuevo
+        self._synced_lsn = self._written_lsn
+        self._ensure_open()
+
+    def _fsync_dir(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return  # p. ej. Windows no permite abrir directorios
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _ensure_open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["in_doubt"] = len(self._live)
+            stats["decided"] = len(self._decided)
+            stats["path"] = self.path
+        fsyncs = stats["fsyncs"]
+        stats["avg_fsync_ms"] = round(stats["fsync_total_ms"] / fsyncs, 3) if fsyncs else 0.0
+        stats["fsync_total_ms"] = round(stats["fsync_total_ms"], 3)
+        return stats
+
+    def close(self):
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
@@ -0,0 +1,83 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class PreparedExpiry:
+    """Plazos de las tx preparadas, en un heap ordenado por vencimiento.
+
+    Si el coordinador cae después del PREPARE, la tx se queda en
+    `prepared_ops` (y con reservas de fondos en el ledger) para siempre.
+    Cada PREPARE registra aquí su plazo y el worker aborta las que vencen.
+
+    Al resolverse una tx sólo se borra su plazo del diccionario; la entrada
+    del heap se descarta al llegar a la cima. Si las entradas muertas
+    superan a las vivas, el heap se reconstruye para acotar la memoria.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._heap = []  # (vence_en, secuencia, tx_id)
+        self._deadlines = {}  # tx_id -> vence_en de las tx aún preparadas
+        self._seq = itertools.count()
+        self._expirations = 0
+        self._late_commits = 0
+
+    def track(self, tx_ids):
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            for tx_id in tx_ids:
+                self._deadlines[tx_id] = deadline
+                heapq.heappush(self._heap, (deadline, next(self._seq), tx_id))
+
+    def forget(self, tx_ids):
+        with self._lock:
+            for tx_id in tx_ids:
+                self._deadlines.pop(tx_id, None)
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._heap = [
+                    entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]
+                ]
+                heapq.heapify(self._heap)
+
+    def _drop_dead_locked(self):
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def pop_expired(self):
+        """Saca y devuelve las tx cuyo plazo ya venció."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            self._drop_dead_locked()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, tx_id = heapq.heappop(self._heap)
+                del self._deadlines[tx_id]
+                expired.append(tx_id)
+                self._drop_dead_locked()
+        return expired
+
+    def note_expired(self, count):
+        with self._lock:
+            self._expirations += count
+
+    def note_late_commit(self):
+        """Cuenta un COMMIT llegado después de que su tx expirase."""
+        with self._lock:
+            self._late_commits += 1
+
+    def stats(self):
+        with self._lock:
+            self._drop_dead_locked()
+            oldest = self._heap[0][0] - self.timeout if self._heap else None
+            stats = {
+                "in_doubt": len(self._deadlines),
+                "expirations": self._expirations,
+                "late_commits": self._late_commits,
+                "heap_entries": len(self._heap),
+            }
+        stats["timeout"] = self.timeout
+        stats["oldest_age_s"] = round(time.monotonic() - oldest, 3) if oldest is not None else 0.0
+        return stats
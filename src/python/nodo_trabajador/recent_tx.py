@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Resultado con el que se resolvió una tx
+COMMITTED = "C"
+ABORTED = "A"
+REFUSED = "R"  # PREPARE rechazado por saldo insuficiente
+EXPIRED = "E"  # Abortada por el worker al vencer su plazo de preparada
+
+_OUTCOMES = (COMMITTED, ABORTED, REFUSED, EXPIRED)
+
+
+def _key(tx_id):
+    """Clave compacta: los tx_id UUID del ServidorCentral se guardan en 16 bytes.
+
+    El resto se normaliza a texto, igual que al recargar el fichero, para
+    que un tx_id entero (5) y su forma leída del fichero ("5") coincidan.
+    """
+    tx_id = str(tx_id)
+    if len(tx_id) == 36:
+        try:
+            return uuid.UUID(tx_id).bytes
+        except ValueError:
+            pass
+    return tx_id
+
+
+class RecentTxTable:
+    """Tabla acotada de tx_id resueltas recientemente, para idempotencia.
+
+    RabbitMQ puede reentregar PREPARE, COMMIT y ABORT. Con esta tabla el
+    worker responde a los duplicados desde memoria: un PREPARE de una tx ya
+    resuelta no vuelve a reservar ni a consultar la BD, y un COMMIT/ABORT
+    repetido no hace nada. Un ABORT que llega antes que su PREPARE también
+    se recuerda, así el PREPARE tardío se rechaza.
+
+    Las entradas vencen a los `ttl` segundos y, si se supera
+    `max_entries`, se descartan las más antiguas. Con `path` la tabla se
+    guarda en un fichero append-only (sin fsync: es una ayuda, no parte del
+    2PC) y se recarga al arrancar.
+    """
+
+    def __init__(self, max_entries=100000, ttl=600.0, path=None):
+        if max_entries < 1:
+            raise ValueError("La tabla necesita al menos una entrada")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clave -> (resultado, resuelta_en)
+        self._file = None
+        self._lines = 0
+        self._stats = {
+            "recorded": 0,
+            "duplicates": 0,
+            "evicted_size": 0,
+            "evicted_ttl": 0,
+        }
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._load()
+            self._rewrite()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        now = time.time()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 3 or parts[1] not in _OUTCOMES:
+                    continue  # Línea cortada por una caída
+                try:
+                    resolved_at = float(parts[2])
+                except ValueError:
+                    continue
+                if now - resolved_at < self.ttl:
+                    key = _key(parts[0])
+                    self._entries.pop(key, None)
+                    self._entries[key] = (parts[1], resolved_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _rewrite(self):
+        """Reescribe el fichero con sólo las entradas vigentes."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, (outcome, resolved_at) in self._entries.items():
+                tx_id = str(uuid.UUID(bytes=key)) if isinstance(key, bytes) else key
+                f.write(f"{tx_id}\t{outcome}\t{resolved_at:.3f}\n")
+        os.replace(tmp_path, self.path)
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lines = len(self._entries)
+
+    def _evict_locked(self, now):
+        while self._entries:
+            key, (_, resolved_at) = next(iter(self._entries.items()))
+            if now - resolved_at < self.ttl:
+                break
+            del self._entries[key]
+            self._stats["evicted_ttl"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evicted_size"] += 1
+
+    def record(self, tx_ids, outcome):
+        """Marca `tx_ids` como resueltas con `outcome` (COMMITTED/ABORTED/REFUSED/EXPIRED)."""
+        now = time.time()
+        with self._lock:
+            for tx_id in tx_ids:
+                key = _key(tx_id)
+                self._entries.pop(key, None)
+                self._entries[key] = (outcome, now)
+                self._stats["recorded"] += 1
+                if self._file is not None:
+                    self._file.write(f"{tx_id}\t{outcome}\t{now:.3f}\n")
+                    self._lines += 1
+            self._evict_locked(now)
+            if self._file is not None:
+                self._file.flush()
+                if self._lines > 2 * self.max_entries:
+                    self._rewrite()
+
+    def seen(self, tx_id):
+        """Resultado de `tx_id` si se resolvió hace poco (y cuenta el duplicado), o None."""
+        with self._lock:
+            entry = self._entries.get(_key(tx_id))
+            if entry is None or time.time() - entry[1] >= self.ttl:
+                return None
+            self._stats["duplicates"] += 1
+            return entry[0]
+
+    def note_duplicate(self):
+        """Cuenta un duplicado respondido por otra vía (p. ej. PREPARE aún en curso)."""
+        with self._lock:
+            self._stats["duplicates"] += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["persisted"] = self.path is not None
+        return stats
@@ -0,0 +1,101 @@
+import psycopg2.extensions
+
+# Sentencias del worker: nombre -> (tipos de parámetros, SQL con $n).
+# Se preparan en el servidor (PREPARE) la primera vez que una conexión del
+# pool las usa y a partir de ahí sólo viaja el EXECUTE con los parámetros.
+STATEMENTS = {
+    # PREPARE_TRANSFER en un solo viaje: saldo de origen y existencia de destino
+    "nw_prepare_transfer": (
+        "integer, integer",
+        "SELECT (SELECT saldo FROM Cuentas WHERE id_cuenta = $1), "
+        "EXISTS (SELECT 1 FROM Cuentas WHERE id_cuenta = $2)",
+    ),
+    # COMMIT en un solo viaje para cualquier número de ops: un CTE aplica el
+    # delta neto por cuenta y registra cada op en Transacciones
+    "nw_aplicar_ops": (
+        "integer[], text[], numeric[]",
+        "WITH v AS ("
+        "  SELECT * FROM unnest($1, $2, $3) AS v(id_cuenta, tipo, monto)"
+        "), upd AS ("
+        "  UPDATE Cuentas AS c SET saldo = c.saldo + d.delta"
+        "  FROM (SELECT id_cuenta, SUM(monto) AS delta FROM v GROUP BY id_cuenta) AS d"
+        "  WHERE c.id_cuenta = d.id_cuenta"
+        "  RETURNING c.id_cuenta"
+        ") "
+        "INSERT INTO Transacciones (id_cuenta, tipo, monto) "
+        "SELECT v.id_cuenta, v.tipo, v.monto FROM v JOIN upd USING (id_cuenta)",
+    ),
+    "nw_saldo_cuenta": (
+        "integer",
+        "SELECT saldo FROM Cuentas WHERE id_cuenta = $1",
+    ),
+    # Destino que no está en el índice de cuentas (p. ej. creada tras la última carga)
+    "nw_existe_cuenta": (
+        "integer",
+        "SELECT EXISTS (SELECT 1 FROM Cuentas WHERE id_cuenta = $1)",
+    ),
+    # CONSULTAR_CUENTAS_BATCH: todos los saldos pedidos en una sola consulta
+    "nw_saldos_cuentas": (
+        "integer[]",
+        "SELECT id_cuenta, saldo FROM Cuentas WHERE id_cuenta = ANY($1)",
+    ),
+    "nw_suma_particion": (
+        "",
+        "SELECT SUM(saldo) FROM Cuentas",
+    ),
+    # Carga y relectura completa del ledger de saldos
+    "nw_saldos_particion": (
+        "",
+        "SELECT id_cuenta, saldo FROM Cuentas",
+    ),
+    # Índice de cuentas propias cargado desde la BD
+    "nw_ids_particion": (
+        "",
+        "SELECT id_cuenta FROM Cuentas",
+    ),
+}
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Conexión que recuerda qué sentencias tiene preparadas en el servidor.
+
+    Las sentencias preparadas viven lo que dura la sesión, así que al
+    reciclarse la conexión en el pool el registro se va con ella.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def execute(cursor, name, params=()):
+    """Ejecuta la sentencia `name` de STATEMENTS, preparándola si hace falta."""
+    prepared = cursor.connection.prepared  # Requiere PreparedConnection
+    if name not in prepared:
+        arg_types, sql = STATEMENTS[name]
+        types = f"({arg_types})" if arg_types else ""
+        cursor.execute(f"PREPARE {name}{types} AS {sql}")
+        prepared.add(name)
+
+    if params:
+        args = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name}({args})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+
+def aplicar_ops(cursor, ops_list):
+    """Aplica las ops de una o varias tx (débito/crédito + libro) en un viaje."""
+    ids, tipos, montos = [], [], []
+    for ops in ops_list:
+        for op_type, acc, amount in ops:
+            if op_type == "debit":
+                ids.append(acc)
+                tipos.append("DEBITO")
+                montos.append(-amount)
+            elif op_type == "credit":
+                ids.append(acc)
+                tipos.append("CREDITO")
+                montos.append(amount)
+    if ids:
+        execute(cursor, "nw_aplicar_ops", (ids, tipos, montos))
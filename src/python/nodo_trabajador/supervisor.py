@@ -0,0 +1,419 @@
+import argparse
+import functools
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from collections import OrderedDict
+
+import pika
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+from src.python.common import codec
+from src.python.common.async_log import INFO, LEVELS, AsyncLogger
+
+# --- Configuración ---
+WORKER_EXCHANGE = "worker_exchange"
+NODO_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nodo_worker.py")
+
+SUPERVISOR_PREFETCH = 256  # Mensajes sin confirmar que reparte el enrutador
+CHECK_INTERVAL = 1.0  # Cada cuánto se revisa si algún hijo cayó
+MIN_UPTIME = 10.0  # Un hijo que cae antes de esto está en bucle de caídas
+RESTART_BACKOFF_MAX = 30.0
+STATS_TIMEOUT = 2.0  # Espera máxima de las respuestas STATS de los hijos
+MAX_TRACKED_TX = 100000  # tx_id -> hijo recordados para enrutar COMMIT/ABORT
+
+# Campos numéricos de db_pool que se suman entre hijos en STATS
+POOL_FIELDS = ("size", "idle", "in_use", "checkouts", "created", "timeouts", "saturated_checkouts")
+
+
+def sub_queue_name(worker_id, shard):
+    """Cola del hijo `shard` de un worker supervisado."""
+    return f"worker_queue_{worker_id}.{shard}"
+
+
+class _Hijo:
+    """Proceso nodo_worker.py que atiende una sub-cola."""
+
+    __slots__ = ("shard", "proc", "started_at", "restarts", "backoff", "restart_at")
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.proc = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff = 1.0
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    """Reparte la cola de un worker entre N procesos nodo_worker.py.
+
+    El ServidorCentral sigue publicando en `worker_queue_<id>`. El supervisor
+    consume esa cola y reenvía cada mensaje, con sus propiedades intactas
+    (reply_to y correlation_id), a la sub-cola `worker_queue_<id>.<k>`:
+
+    - PREPARE va al hijo `from % N` y CONSULTAR_CUENTA al `account % N`, así
+      los débitos de una misma cuenta siempre los ve un solo proceso y en orden.
+      El estado local de un hijo (reservas del ledger, locks por cuenta) sólo
+      cubre las cuentas de origen que le tocan: el abono al destino lo aplica
+      el hijo del origen, aunque el destino sea de otro. El hijo dueño del
+      destino no lo ve hasta revalidar contra la BD (saldo insuficiente o
+      relectura periódica del ledger), y como un abono no visto sólo hace
+      que subestime el saldo, nunca aprueba un débito de más.
+    - COMMIT y ABORT van al hijo que hizo el PREPARE. Si el tx_id no se
+      recuerda (p. ej. tras reiniciar el supervisor) se envían a todos; los
+      hijos ignoran las tx que no tienen preparadas.
+    - STATS lo responde el propio supervisor agregando el de cada hijo.
+    - El resto (SUM_PARTITION, ...) va al hijo 0.
+
+    Todo el tráfico de la partición pasa por este único proceso, que sólo
+    decodifica y reenvía: con muchos hijos puede ser el cuello de botella
+    (comparar `routed` en STATS con el ritmo de la cola).
+
+    Los hijos que terminan se relanzan, con espera creciente si caen nada
+    más arrancar.
+    """
+
+    def __init__(self, worker_id, processes, child_args=(), log_level=INFO):
+        if processes < 1:
+            raise ValueError("Se necesita al menos un proceso hijo")
+
+        self.worker_id = worker_id
+        self.processes = processes
+        self.child_args = list(child_args)
+        self.queue_name = f"worker_queue_{worker_id}"
+        self.log = AsyncLogger(f"Supervisor-{worker_id}", level=log_level)
+
+        self.children = [_Hijo(shard) for shard in range(processes)]
+        self.tx_shard = OrderedDict()
+        self.pending_stats = {}
+        self.routed = [0] * processes
+        self.broadcasts = 0
+        self._stopping = False
+
+        self._init_rabbitmq()
+
+    def _init_rabbitmq(self):
+        """Declara la cola del worker, las sub-colas y la cola de respuestas de STATS."""
+        max_attempts = 5
+        retry_delay = 3
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                print(
+                    f"[Supervisor-{self.worker_id}] Intento {attempt}/{max_attempts} de conexión a RabbitMQ...",
+                    flush=True,
+                )
+                self.connection = pika.BlockingConnection(
+                    pika.ConnectionParameters(
+                        host="localhost", connection_attempts=3, retry_delay=2
+                    )
+                )
+                self.channel = self.connection.channel()
+                self.channel.exchange_declare(
+                    exchange=WORKER_EXCHANGE, exchange_type="direct"
+                )
+                # Las sub-colas se declaran aquí y no sólo en los hijos para
+                # no perder mensajes enrutados antes de que un hijo arranque.
+                for queue in [self.queue_name] + [
+                    sub_queue_name(self.worker_id, shard) for shard in range(self.processes)
+                ]:
+                    self.channel.queue_declare(queue=queue, durable=True)
+                    self.channel.queue_bind(
+                        queue=queue, exchange=WORKER_EXCHANGE, routing_key=queue
+                    )
+                result = self.channel.queue_declare(queue="", exclusive=True)
+                self.reply_queue = result.method.queue
+                print(
+                    f"[Supervisor-{self.worker_id}] ✓ Conectado exitosamente a RabbitMQ",
+                    flush=True,
+                )
+                return
+            except Exception as e:
+                print(
+                    f"[Supervisor-{self.worker_id}] ✗ Error en intento {attempt}: {e}",
+                    flush=True,
+                )
+                if attempt < max_attempts:
+                    print(
+                        f"[Supervisor-{self.worker_id}] Reintentando en {retry_delay} segundos...",
+                        flush=True,
+                    )
+                    time.sleep(retry_delay)
+                else:
+                    print(
+                        f"[Supervisor-{self.worker_id}] ✗ FALLO CRÍTICO: No se pudo conectar después de {max_attempts} intentos",
+                        flush=True,
+                    )
+                    sys.exit(1)
+
+    # --- Procesos hijos ---
+
+    def _spawn(self, child):
+        cmd = [
+            sys.executable,
+            NODO_WORKER,
+            str(self.worker_id),
+            "--shard",
+            str(child.shard),
+            "--shards",
+            str(self.processes),
+            *self.child_args,
+        ]
+        # Sesión propia: el Ctrl+C de la terminal lo reenvía el supervisor
+        child.proc = subprocess.Popen(cmd, start_new_session=True)
+        child.started_at = time.monotonic()
+        self.log.info("Hijo lanzado", shard=child.shard, pid=child.proc.pid)
+
+    def _check_children(self):
+        """Relanza los hijos caídos y se vuelve a programar en el loop de pika."""
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for child in self.children:
+            if child.proc is not None and child.proc.poll() is not None:
+                uptime = now - child.started_at
+                child.backoff = (
+                    min(child.backoff * 2, RESTART_BACKOFF_MAX) if uptime < MIN_UPTIME else 1.0
+                )
+                child.restart_at = now + child.backoff
+                self.log.error(
+                    "Hijo terminado",
+                    shard=child.shard,
+                    code=child.proc.returncode,
+                    uptime_s=uptime,
+                    restart_in_s=child.backoff,
+                )
+                child.proc = None
+            if child.proc is None and now >= child.restart_at:
+                child.restarts += 1
+                self._spawn(child)
+        self.connection.call_later(CHECK_INTERVAL, self._check_children)
+
+    def _stop_children(self, timeout=10.0):
+        for child in self.children:
+            if child.proc is not None and child.proc.poll() is None:
+                child.proc.send_signal(signal.SIGINT)
+        deadline = time.monotonic() + timeout
+        for child in self.children:
+            if child.proc is None:
+                continue
+            try:
+                child.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                child.proc.kill()
+                child.proc.wait()
+
+    # --- Enrutado ---
+
+    def _shard_of(self, account):
+        return int(account) % self.processes
+
+    def _track(self, tx_id, shard):
+        self.tx_shard[tx_id] = shard
+        self.tx_shard.move_to_end(tx_id)
+        if len(self.tx_shard) > MAX_TRACKED_TX:
+            self.tx_shard.popitem(last=False)
+
+    def _route(self, req):
+        """Hijos a los que se reenvía un mensaje."""
+        if not isinstance(req, dict):
+            return (0,)  # El hijo registrará el error
+        req_type = str(req.get("type", "")).upper()
+        try:
+            if "PREPARE" in req_type:
+                shard = self._shard_of(req["from"])
+                self._track(req.get("tx_id"), shard)
+                return (shard,)
+            if req_type == "CONSULTAR_CUENTA":
+                return (self._shard_of(req["account"]),)
+            if req_type in ("COMMIT", "ABORT"):
+                shard = self.tx_shard.pop(req.get("tx_id"), None)
+                if shard is not None:
+                    return (shard,)
+                self.broadcasts += 1
+                return range(self.processes)
+        except (KeyError, TypeError, ValueError):
+            pass
+        return (0,)
+
+    def on_message(self, ch, method, props, body):
+        try:
+            try:
+                req = codec.decode(body, props.content_type)
+            except codec.CodecError:
+                req = None
+            if isinstance(req, dict) and str(req.get("type", "")).upper() == "STATS":
+                self._collect_stats(props)
+                return
+            for shard in self._route(req):
+                ch.basic_publish(
+                    exchange=WORKER_EXCHANGE,
+                    routing_key=sub_queue_name(self.worker_id, shard),
+                    properties=props,
+                    body=body,
+                )
+                self.routed[shard] += 1
+        except Exception as e:
+            self.log.error("Inesperado al enrutar", error=e)
+        finally:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    # --- STATS agregado ---
+
+    def _collect_stats(self, props):
+        if not props.reply_to:
+            return
+        corr_id = str(uuid.uuid4())
+        pending = {"props": props, "replies": {}}
+        self.pending_stats[corr_id] = pending
+        body = codec.JSON.encode({"type": "STATS"})
+        for shard in range(self.processes):
+            self.channel.basic_publish(
+                exchange=WORKER_EXCHANGE,
+                routing_key=sub_queue_name(self.worker_id, shard),
+                properties=pika.BasicProperties(
+                    reply_to=self.reply_queue,
+                    correlation_id=f"{corr_id}:{shard}",
+                    content_type=codec.JSON_CONTENT_TYPE,
+                ),
+                body=body,
+            )
+        pending["timer"] = self.connection.call_later(
+            STATS_TIMEOUT, functools.partial(self._finish_stats, corr_id)
+        )
+
+    def _on_stats_reply(self, ch, method, props, body):
+        corr_id, _, shard = (props.correlation_id or "").rpartition(":")
+        pending = self.pending_stats.get(corr_id)
+        if pending is None:
+            return  # Respuesta tardía de una petición ya contestada
+        try:
+            pending["replies"][int(shard)] = codec.decode(body, props.content_type)
+        except (codec.CodecError, ValueError):
+            return
+        if len(pending["replies"]) == self.processes:
+            self.connection.remove_timeout(pending["timer"])
+            self._finish_stats(corr_id)
+
+    def _finish_stats(self, corr_id):
+        pending = self.pending_stats.pop(corr_id, None)
+        if pending is None:
+            return
+        props = pending["props"]
+        reply_codec = codec.for_content_type(props.content_type)
+        self.channel.basic_publish(
+            exchange="",
+            routing_key=props.reply_to,
+            properties=pika.BasicProperties(
+                correlation_id=props.correlation_id, content_type=reply_codec.content_type
+            ),
+            body=reply_codec.encode(self._aggregate_stats(pending["replies"])),
+        )
+
+    def _aggregate_stats(self, replies):
+        children = [replies.get(shard) for shard in range(self.processes)]
+        answered = [stats for stats in children if stats]
+        pools = [stats.get("db_pool") or {} for stats in answered]
+        return {
+            "status": "OK",
+            "worker_id": self.worker_id,
+            "processes": self.processes,
+            "answered": len(answered),
+            "prepared": sum(stats.get("prepared", 0) for stats in answered),
+            "db_pool": {
+                field: sum(pool.get(field, 0) for pool in pools) for field in POOL_FIELDS
+            },
+            "supervisor": self.stats(),
+            "children": children,
+        }
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "routed": list(self.routed),
+            "broadcasts": self.broadcasts,
+            "tracked_tx": len(self.tx_shard),
+            "children": [
+                {
+                    "shard": child.shard,
+                    "pid": child.proc.pid if child.proc else None,
+                    "alive": child.proc is not None and child.proc.poll() is None,
+                    "restarts": max(child.restarts - 1, 0),
+                    "uptime_s": round(now - child.started_at, 1) if child.proc else 0.0,
+                }
+                for child in self.children
+            ],
+        }
+
+    def start(self):
+        """Lanza los hijos y empieza a repartir la cola del worker."""
+        self.channel.basic_qos(prefetch_count=SUPERVISOR_PREFETCH)
+        self.channel.basic_consume(
+            queue=self.reply_queue, on_message_callback=self._on_stats_reply, auto_ack=True
+        )
+        self.channel.basic_consume(queue=self.queue_name, on_message_callback=self.on_message)
+        self._check_children()
+        print(
+            f"[Supervisor-{self.worker_id}] ✓ Repartiendo '{self.queue_name}' entre "
+            f"{self.processes} procesos",
+            flush=True,
+        )
+        try:
+            self.channel.start_consuming()
+        except KeyboardInterrupt:
+            print("Cerrando conexión...")
+            self.connection.close()
+        finally:
+            self._stopping = True
+            self._stop_children()
+            self.log.close()
+
+
+def _sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Supervisor multiproceso de un nodo trabajador Python. "
+        "Los argumentos no reconocidos se pasan a cada nodo_worker.py."
+    )
+    parser.add_argument("worker_id", type=int, help="ID del trabajador (cola worker_queue_<id>)")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Procesos nodo_worker.py a lanzar (por defecto, uno por CPU)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=list(LEVELS),
+        default="INFO",
+        help="Nivel de log del supervisor y de los hijos",
+    )
+    args, child_args = parser.parse_known_args()
+
+    signal.signal(signal.SIGTERM, _sigterm)
+    worker_id = args.worker_id
+    try:
+        print(f"[Supervisor-{worker_id}] ========================================", flush=True)
+        print(
+            f"[Supervisor-{worker_id}] Worker {worker_id} con {args.processes} procesos",
+            flush=True,
+        )
+        print(f"[Supervisor-{worker_id}] ========================================", flush=True)
+        supervisor = Supervisor(
+            worker_id,
+            args.processes,
+            child_args=child_args + ["--log-level", args.log_level],
+            log_level=LEVELS[args.log_level],
+        )
+        supervisor.start()
+    except KeyboardInterrupt:
+        print(f"\n[Supervisor-{worker_id}] Interrumpido por usuario", flush=True)
+        sys.exit(0)